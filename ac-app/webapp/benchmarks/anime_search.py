@@ -0,0 +1,100 @@
+"""Search latency of the anime1 catalogue.
+
+linear is what search_anime did per search once the catalogue was
+downloaded: make an Anime of every item and keep those with the keyword in
+their names. indexed searches an AnimeCatalogue. The keywords are substrings
+of 1 to 4 characters of random names, plus some that match nothing. The
+catalogue is made up of --size CJK names, or read from --catalogue, the JSON
+anime1 serves at https://d1zquzjgwo9yb.cloudfront.net/.
+
+    PYTHONPATH=.:../../core-repo python benchmarks/anime_search.py --size 2000
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Callable, List
+
+from core.scraping_service.anime1_catalogue import AnimeCatalogue, to_anime
+
+# common CJK characters, so names share characters like real titles do
+CHARS = [chr(code) for code in range(0x4E00, 0x4E00 + 800)]
+
+
+def make_catalogue(size: int) -> list:
+    return [
+        [
+            idx,
+            "".join(random.choices(CHARS, k=random.randint(3, 16))),
+            "1-12",
+            "2023",
+            "秋",
+            "",
+        ]
+        for idx in range(size)
+    ]
+
+
+def make_keywords(items: list, num: int) -> List[str]:
+    keywords = []
+    for _ in range(num):
+        name = random.choice(items)[1]
+        length = random.randint(1, min(4, len(name)))
+        start = random.randint(0, len(name) - length)
+        keywords.append(name[start : start + length])
+    keywords += ["".join(random.choices(CHARS, k=3)) for _ in range(num // 10)]
+    return keywords
+
+
+def linear_search(items: list) -> Callable[[str], list]:
+    def search(keyword: str) -> list:
+        anime_list = [to_anime(item) for item in items]
+        return [anime for anime in anime_list if keyword in anime.name]
+
+    return search
+
+
+def _run(search: Callable[[str], list], keywords: List[str]) -> tuple:
+    latencies, found = [], 0
+    for keyword in keywords:
+        start = time.perf_counter()
+        found += len(search(keyword))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return found, statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+def main(items: list, num_keywords: int) -> None:
+    keywords = make_keywords(items, num_keywords)
+    start = time.perf_counter()
+    catalogue = AnimeCatalogue(items)
+    build = time.perf_counter() - start
+    print(f"{len(items)} anime, index built in {build * 1000:.1f}ms")
+
+    for name, search in (
+        ("linear", linear_search(items)),
+        ("indexed", catalogue.search),
+    ):
+        found, p50, p99 = _run(search, keywords)
+        print(
+            f"{name:>8}: found={found} "
+            f"search p50={p50 * 1e6:.0f}us p99={p99 * 1e6:.0f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--catalogue", help="a saved copy of the anime1 catalogue")
+    parser.add_argument("--keywords", type=int, default=500)
+    args = parser.parse_args()
+
+    random.seed(0)
+    if args.catalogue:
+        with open(args.catalogue) as f:
+            items = json.load(f)
+    else:
+        items = make_catalogue(args.size)
+    main(items, args.keywords)
@@ -4,12 +4,17 @@ import yaml
 from fastapi import HTTPException
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
 from kink import di
-from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from sqlalchemy import orm
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from urllib.parse import urlparse
 
 from async_service import AsyncService
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.chapter_service import ChapterService
+from core.episode_service import EpisodeService
+from core.meta_service import MetaService
+from core.prefetch_service import PrefetchService
 from core.scraping_service import (
     ScrapingServiceFactory,
     Anime1ScrapingService,
@@ -18,12 +23,13 @@ from core.scraping_service import (
     MangaBatScrapingService,
 )
 from database import DatabaseService, CRUDService
-from download_service import DownloadService
+from download_service import DownloadService, HostLimiter
 from queue_service import EncryptMessage
 from secret_service import SecretService
 from security_service import SecurityService
 from session import RedisBackend, BasicVerifier
-from store_service import FSStoreService
+from store_service import CASStoreService, FSStoreService
+from store_service.store_service import StoreService
 
 
 def _load_config_file() -> dict:
@@ -31,12 +37,12 @@ def _load_config_file() -> dict:
         return yaml.safe_load(f)
 
 
-def create_redis(url: str) -> Redis:
+def create_async_redis(url: str) -> AsyncRedis:
     parsed_url = urlparse(url)
     if parsed_url.hostname is None:
-        return Redis(url)
+        return AsyncRedis(url)
     else:
-        return Redis(
+        return AsyncRedis(
             host=parsed_url.hostname,
             port=parsed_url.port,
             password=parsed_url.password,
@@ -45,34 +51,118 @@ def create_redis(url: str) -> Redis:
         )
 
 
+def create_store_service(store_config: dict, download_path: str) -> StoreService:
+    """cas stores each page content once, the path it was saved to links to it"""
+    if store_config.get("name") == "cas":
+        return CASStoreService(
+            store_config.get("blob_path") or os.path.join(download_path, ".blobs")
+        )
+    return FSStoreService()
+
+
+def create_engine(url: str, db_config: dict) -> AsyncEngine:
+    """Create the process-wide engine, pool settings come from config.yml"""
+    return create_async_engine(
+        url,
+        echo=False,
+        pool_size=db_config.get("pool_size", 5),
+        max_overflow=db_config.get("max_overflow", 10),
+        pool_recycle=db_config.get("pool_recycle", 1800),
+        pool_timeout=db_config.get("pool_timeout", 30),
+        pool_pre_ping=db_config.get("pool_pre_ping", True),
+    )
+
+
+def bootstrap_resources() -> None:
+    """(Re)register services holding connections bound to the running loop"""
+    di[AsyncEngine] = lambda di: create_engine(
+        di[SecretService].get_secret("DB_URL"), di["db_config"]
+    )
+    di[orm.sessionmaker] = lambda di: orm.sessionmaker(
+        autocommit=False,
+        autoflush=False,
+        bind=di[AsyncEngine],
+        expire_on_commit=False,
+        class_=AsyncSession,
+    )
+    di[DatabaseService] = lambda di: DatabaseService(
+        di[AsyncEngine], di[orm.sessionmaker]
+    )
+    di[CRUDService] = lambda di: CRUDService(di[DatabaseService])
+
+    di[AsyncRedis] = lambda di: create_async_redis(
+        di[SecretService].get_secret("REDIS_URL")
+    )
+    di[HostLimiter] = lambda di: HostLimiter(
+        {key: value for key, value in di["host_limits"].items() if key != "default"},
+        di["host_limits"].get("default"),
+    )
+    di[ChapterDownloadCoordinator] = lambda di: ChapterDownloadCoordinator(
+        di[AsyncRedis], di[DatabaseService], di[CRUDService]
+    )
+    di[ChapterService] = lambda di: ChapterService(
+        di[AsyncRedis],
+        di[DatabaseService],
+        di[CRUDService],
+        max_age=di["chapter_config"].get("max_age", 3600),
+        retry_after=di["chapter_config"].get("retry_after", 300),
+    )
+    di[EpisodeService] = lambda di: EpisodeService(
+        di[AsyncRedis],
+        di[DatabaseService],
+        di[CRUDService],
+        max_age=di["episode_config"].get("max_age", 3600),
+        retry_after=di["episode_config"].get("retry_after", 300),
+    )
+    di[MetaService] = lambda di: MetaService(
+        di[AsyncRedis],
+        di[DatabaseService],
+        di[CRUDService],
+        download_path=di["api"]["download_path"],
+        max_age=di["meta_config"].get("max_age", 3600),
+        retry_after=di["meta_config"].get("retry_after", 300),
+    )
+    di[PrefetchService] = lambda di: PrefetchService(
+        di[DatabaseService],
+        di[CRUDService],
+        di[ChapterDownloadCoordinator],
+        di[ScrapingServiceFactory],
+        di[DownloadService],
+        di[AsyncService],
+        di["api"]["download_path"],
+        num_workers=di["prefetch_config"].get("num_workers", 2),
+        max_pending=di["prefetch_config"].get("max_pending", 10),
+        max_chapter_orders=di["prefetch_config"].get("max_chapter_orders", 1000),
+    )
+
+
 def bootstrap_di() -> None:
     config_obj = _load_config_file()
 
     for key, value in config_obj.items():
         di[key] = value
 
-    di["store_service"] = FSStoreService()
+    di["db_config"] = config_obj.get("database", {})
+    di["prefetch_config"] = config_obj.get("prefetch_service", {})
+    di["chapter_config"] = config_obj.get("chapter_service", {})
+    di["meta_config"] = config_obj.get("meta_service", {})
+    di["episode_config"] = config_obj.get("episode_service", {})
+    di["session_config"] = config_obj.get("session", {})
+    di["anime1_config"] = config_obj.get("anime1", {})
+    di["store_config"] = config_obj.get("store_service", {})
+    di["store_service"] = create_store_service(
+        di["store_config"], config_obj["api"]["download_path"]
+    )
     di["algorithm"] = di["security_service"]["algorithm"]
     di[SecretService] = lambda di: SecretService()
     di["public_key"] = di[SecretService].get_secret("jwt.key.pub")
     di[SecurityService] = lambda di: SecurityService(di["public_key"], di["algorithm"])
-    di.factories[AsyncEngine] = lambda di: create_async_engine(
-        di[SecretService].get_secret("DB_URL"), echo=False
-    )
-    di.factories[orm.sessionmaker] = lambda di: orm.sessionmaker(
-        autocommit=False,
-        autoflush=False,
-        bind=di[AsyncEngine],
-        expire_on_commit=False,
-        class_=AsyncSession,
-    )
 
     di["auth_server_url"] = di[SecretService].get_secret("AUTH_SERVER_URL")
     di["auth_server_redirect_url"] = di[SecretService].get_secret(
         "AUTH_SERVER_REDIRECT_URL"
     )
 
-    di[Redis] = lambda di: create_redis(di[SecretService].get_secret("REDIS_URL"))
     di["message_cls"] = EncryptMessage
 
     di["identifier"] = "ac_app"
@@ -81,7 +171,7 @@ def bootstrap_di() -> None:
 
     di.factories[RedisBackend] = di.factories[
         "session_backend"
-    ] = lambda di: RedisBackend(redis=di[Redis], identifier=di["identifier"])
+    ] = lambda di: RedisBackend(redis=di[AsyncRedis], identifier=di["identifier"])
 
     di.factories["verifier"] = lambda di: BasicVerifier(
         identifier=di["identifier"],
@@ -104,26 +194,30 @@ def bootstrap_di() -> None:
         "max_keepalive_connections"
     ]
     di["headers"] = di["download_service"]["headers"]
+    di["host_limits"] = di["download_service"].get("host_limits", {})
     # di["proxy"] = di["download_service"]["proxy"]
 
     di["num_workers"] = di["async_service"]["num_workers"]
     di["delay"] = di["async_service"]["delay"]
 
-    di[AsyncService] = lambda di: AsyncService(di["num_workers"], di["delay"])
+    di[AsyncService] = lambda di: AsyncService(
+        di["num_workers"],
+        di["delay"],
+        launch_interval=di["async_service"].get("launch_interval", 0),
+    )
 
     di.factories[DownloadService] = lambda di: DownloadService(
         di["max_connections"],
         di["max_keepalive_connections"],
         di["headers"],
         di["store_service"],
+        di[HostLimiter],
     )
-    di.factories[DatabaseService] = lambda di: DatabaseService(
-        di[AsyncEngine], di[orm.sessionmaker]
-    )
-    di.factories[CRUDService] = lambda di: CRUDService(di[DatabaseService])
 
     di.factories[Anime1ScrapingService] = lambda di: Anime1ScrapingService(
-        di[DownloadService]
+        di[DownloadService],
+        catalogue_ttl=di["anime1_config"].get("catalogue_ttl", 3600),
+        retry_after=di["anime1_config"].get("retry_after", 300),
     )
     di.factories[CopyMangaScrapingService] = lambda di: CopyMangaScrapingService(
         di[DownloadService]
@@ -141,3 +235,5 @@ def bootstrap_di() -> None:
         manhuaren=di[ManhuarenScrapingService],
         mangabat=di[MangaBatScrapingService],
     )
+
+    bootstrap_resources()
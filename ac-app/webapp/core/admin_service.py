@@ -1,16 +1,17 @@
 import asyncio
 
+from datetime import datetime
 from logging import getLogger
-from pathlib import Path
 from sqlalchemy import select, Table, MetaData, case
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
-from typing import Coroutine, TypeVar
+from typing import Coroutine, Optional, TypeVar
 
 from core.models.chapter import Chapter
 from core.models.manga import MangaWithSite
 from core.models.manga_index_type_enum import MangaIndexTypeEnum, m_types
-from core.models.meta import Meta
+from core.meta_service import current_thum_img, download_thum_img, thum_img_columns
+from core.models.meta import Meta, ThumImg
 from core.scraping_service import ScrapingServiceFactory
 from core.scraping_service.manga_site_scraping_service import MangaSiteScrapingService
 from download_service import DownloadService
@@ -62,6 +63,12 @@ async def get_all_mangas_in_history(db_engine: AsyncEngine) -> list[MangaWithSit
                 joined_table.c.mangas_name.label("manga_name"),
                 joined_table.c.manga_sites_name.label("manga_site_name"),
                 joined_table.c.mangas_id.label("id"),
+                joined_table.c.mangas_thum_img.label("thum_img"),
+                joined_table.c.mangas_thum_img_url.label("thum_img_url"),
+                joined_table.c.mangas_thum_img_etag.label("thum_img_etag"),
+                joined_table.c.mangas_thum_img_last_modified.label(
+                    "thum_img_last_modified"
+                ),
             )
             .select_from(joined_table)
             .group_by(
@@ -69,32 +76,41 @@ async def get_all_mangas_in_history(db_engine: AsyncEngine) -> list[MangaWithSit
                 joined_table.c.mangas_name,
                 joined_table.c.manga_sites_name,
                 joined_table.c.mangas_id,
+                joined_table.c.mangas_thum_img,
+                joined_table.c.mangas_thum_img_url,
+                joined_table.c.mangas_thum_img_etag,
+                joined_table.c.mangas_thum_img_last_modified,
             )
         )
         return [MangaWithSite.model_validate(row) for row in rows]
 
 
 async def get_meta_for_manga(
-    manga_url: str,
-    manga_name: str,
-    manga_id: int,
+    manga: MangaWithSite,
     scraping_service: MangaSiteScrapingService,
     download_service: DownloadService,
-    download_path: str,    
-) -> Meta:
-    try:
-        meta = await scraping_service.get_meta(manga_url)
-
-        download_path = Path(download_path) / scraping_service.site.name / manga_name
-
-        download_result = await download_service.download_img(
-            url=str(meta.thum_img), download_path=download_path, filename="thum_img"
-        )
-        meta.thum_img = download_result["pic_path"]
-        meta.manga_id = manga_id
-    except:
-        return Meta(manga_id=manga_id)    
-    return meta
+    download_path: str,
+) -> tuple[Meta, Optional[ThumImg]]:
+    """Scrape the meta of manga, downloading its thumbnail only if it changed.
+    The meta is kept without a thumbnail if there is none or its download
+    fails."""
+    meta = await scraping_service.get_meta(str(manga.url))
+    thum_img = None
+    if meta.thum_img is not None:
+        try:
+            thum_img = await download_thum_img(
+                download_service,
+                download_path,
+                scraping_service.site.name,
+                manga.manga_name,
+                str(meta.thum_img),
+                current_thum_img(manga),
+            )
+        except Exception as ex:
+            logger.error(f"failed to download the thumbnail of {manga.id=}: {ex=}")
+    thum_img_path = None if thum_img is None else thum_img.path
+    meta = meta.model_copy(update={"thum_img": thum_img_path, "manga_id": manga.id})
+    return meta, thum_img
 
 
 async def get_chapters_for_manga(
@@ -125,25 +141,46 @@ async def update_chapters(
     chapter_list = []
     for manga_id, chapters in chapter_dict.items():
         for m_type, chap_list in chapters.items():
-            for chap in chap_list:
+            for idx, chap in enumerate(chap_list):
                 chapter_list.append(
                     {
                         "title": chap.title,
                         "page_url": str(chap.page_url),
                         "manga_id": manga_id,
                         "type": m_types.index(m_type),
+                        "idx": idx,
                     }
                 )
 
     async with db_engine.begin() as conn:
         chapter_table = await get_table("chapters", conn)
-        stmt = (
-            insert(chapter_table)
-            .values(chapter_list)
-            .on_conflict_do_nothing(index_elements=["page_url"])
-            .returning(chapter_table.c.page_url)
-        )
+        stmt = insert(chapter_table).values(chapter_list)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["page_url"], set_={"idx": stmt.excluded.idx}
+        ).returning(chapter_table.c.page_url)
         await conn.execute(stmt)
+        # as ChapterService._scrape does, chapters dropped from a non-empty
+        # list stay for their pages and history but are no longer listed
+        for manga_id, chapters in chapter_dict.items():
+            page_urls = [
+                str(chap.page_url)
+                for chap_list in chapters.values()
+                for chap in chap_list
+            ]
+            if page_urls:
+                await conn.execute(
+                    chapter_table.update()
+                    .where(chapter_table.c.manga_id == manga_id)
+                    .where(chapter_table.c.page_url.not_in(page_urls))
+                    .values(idx=None)
+                )
+        # /chapters serves these from the db until they are stale again
+        manga_table = await get_table("mangas", conn)
+        await conn.execute(
+            manga_table.update()
+            .values(chapters_last_scraped=datetime.now())
+            .where(manga_table.c.id.in_(list(chapter_dict)))
+        )
 
     return chapter_dict
 
@@ -157,9 +194,7 @@ async def update_meta(
 ) -> list[Meta]:
     tasks = [
         get_meta_for_manga(
-            str(manga.url),
-            manga.manga_name,
-            manga.id,
+            manga,
             getattr(ss_factory, manga.manga_site_name),
             download_service,
             download_path,
@@ -168,24 +203,47 @@ async def update_meta(
     ]
 
     result = await gather_with_concurrency(5, *tasks)
-    result = [meta for meta in result if isinstance(meta, Meta)]
+    result = [item for item in result if isinstance(item, tuple)]
+    metas = [meta for meta, _ in result]
+
+    columns = {
+        "last_update": {
+            meta.manga_id: meta.last_update for meta in metas if meta.last_update
+        },
+        "finished": {
+            meta.manga_id: meta.finished for meta in metas if meta.finished is not None
+        },
+        "latest_chapter_title": {
+            meta.manga_id: meta.latest_chapter.title
+            for meta in metas
+            if meta.latest_chapter
+        },
+        "latest_chapter_url": {
+            meta.manga_id: str(meta.latest_chapter.page_url)
+            for meta in metas
+            if meta.latest_chapter
+        },
+        "meta_last_scraped": {meta.manga_id: datetime.now() for meta in metas},
+    }
+    for meta, thum_img in result:
+        if thum_img is not None:
+            for column, value in thum_img_columns(thum_img).items():
+                columns.setdefault(column, {})[meta.manga_id] = value
 
     async with db_engine.begin() as conn:
-        last_update_map = {
-            meta.manga_id: meta.last_update for meta in result if meta.last_update
-        }        
-        thum_img_map = {meta.manga_id: meta.thum_img for meta in result if meta.thum_img}
-        finished_map = {meta.manga_id: meta.finished for meta in result if meta.finished}
         manga_table = await get_table("mangas", conn)
-        stmt = (
-            manga_table.update()
-            .values(
-                last_update=case(last_update_map, value=manga_table.c.id),
-                thum_img=case(thum_img_map, value=manga_table.c.id),
-                finished=case(finished_map, value=manga_table.c.id),
+        # mangas missing from a map keep what they have
+        values = {
+            column: case(value_map, value=manga_table.c.id, else_=manga_table.c[column])
+            for column, value_map in columns.items()
+            if value_map
+        }
+        if values:
+            stmt = (
+                manga_table.update()
+                .values(**values)
+                .where(manga_table.c.id.in_([manga.id for manga in mangas]))
             )
-            .where(manga_table.c.id.in_([manga.id for manga in mangas]))
-        )
-        await conn.execute(stmt)
+            await conn.execute(stmt)
 
-    return result
+    return metas
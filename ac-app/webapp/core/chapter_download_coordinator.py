@@ -0,0 +1,190 @@
+import asyncio
+import json
+
+from logging import getLogger
+from pathlib import Path
+from redis.asyncio import Redis
+from typing import AsyncGenerator, Dict, Set
+from uuid import uuid4
+
+from async_service import AsyncService
+from core.page_service import download_pages, pages_exist
+from core.scraping_service.manga_site_scraping_service import MangaSiteScrapingService
+from database import CRUDService, DatabaseService
+from database.models import Chapter as DBChapter, Page
+from download_service import DownloadService
+
+logger = getLogger(__name__)
+
+# only delete the lock if this driver still owns it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class ChapterDownloadCoordinator:
+    """Single-flight chapter downloads shared by every worker process.
+
+    The first caller takes a redis lock and drives the download in a background
+    task, appending each page to a redis stream. Every caller, the driver's
+    included, follows that stream from the start, so late subscribers get the
+    pages already downloaded straight away."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        database_service: DatabaseService,
+        crud_service: CRUDService,
+        prefix: str = "ac_app:chapter_download",
+        lock_ttl: int = 300,
+        stream_ttl: int = 600,
+        block_ms: int = 1000,
+    ):
+        self.redis = redis
+        self.database_service = database_service
+        self.crud_service = crud_service
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.stream_ttl = stream_ttl
+        self.block_ms = block_ms
+        self._drivers: Set[asyncio.Task] = set()
+
+    def _lock_key(self, chapter_id: int) -> str:
+        return f"{self.prefix}:{chapter_id}:lock"
+
+    def _stream_key(self, chapter_id: int) -> str:
+        return f"{self.prefix}:{chapter_id}:pages"
+
+    async def stream_pages(
+        self,
+        db_chapter: DBChapter,
+        scraping_service: MangaSiteScrapingService,
+        download_service: DownloadService,
+        async_service: AsyncService,
+        download_path: Path,
+    ) -> AsyncGenerator[Dict, None]:
+        """Yield the pages of a chapter, downloading them once across callers"""
+        chapter_id = db_chapter.id
+        token = uuid4().hex
+        if await self.redis.set(
+            self._lock_key(chapter_id), token, nx=True, ex=self.lock_ttl
+        ):
+            await self.redis.delete(self._stream_key(chapter_id))
+            driver = asyncio.create_task(
+                self._drive(
+                    chapter_id,
+                    token,
+                    scraping_service,
+                    download_service,
+                    async_service,
+                    download_path,
+                )
+            )
+            self._drivers.add(driver)
+            driver.add_done_callback(self._drivers.discard)
+
+        async for page in self._follow(chapter_id):
+            yield page
+
+    async def _drive(
+        self,
+        chapter_id: int,
+        token: str,
+        scraping_service: MangaSiteScrapingService,
+        download_service: DownloadService,
+        async_service: AsyncService,
+        download_path: Path,
+    ) -> None:
+        stream_key = self._stream_key(chapter_id)
+        lock_key = self._lock_key(chapter_id)
+        end_marker = {"done": "1"}
+        try:
+            async with self.database_service.session() as session:
+                async with session.begin():
+                    async for page in self._download(
+                        session,
+                        chapter_id,
+                        scraping_service,
+                        download_service,
+                        async_service,
+                        download_path,
+                    ):
+                        await self.redis.xadd(stream_key, {"page": json.dumps(page)})
+                        await self.redis.expire(lock_key, self.lock_ttl)
+        except Exception as ex:
+            logger.exception(f"failed to download {chapter_id=}")
+            end_marker = {"error": str(ex)}
+        finally:
+            await self.redis.xadd(stream_key, end_marker)
+            await self.redis.expire(stream_key, self.stream_ttl)
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    async def _download(
+        self,
+        session,
+        chapter_id: int,
+        scraping_service: MangaSiteScrapingService,
+        download_service: DownloadService,
+        async_service: AsyncService,
+        download_path: Path,
+    ) -> AsyncGenerator[Dict, None]:
+        # another worker may have finished between our page check and the lock
+        pages = await self.crud_service.get_items_by_same_attr(
+            session, Page, "chapter_id", chapter_id, "idx"
+        )
+        if pages_exist(pages):
+            for db_page in pages:
+                yield {
+                    "pic_path": db_page.pic_path,
+                    "idx": db_page.idx,
+                    "total": db_page.total,
+                }
+            return
+
+        db_chapter = await self.crud_service.get_item_by_id(
+            session, DBChapter, chapter_id
+        )
+        page_urls = await scraping_service.get_page_urls(db_chapter.page_url)
+        async for page in download_pages(
+            download_path,
+            page_urls,
+            db_chapter,
+            session,
+            download_service,
+            async_service,
+            self.crud_service,
+            limit_key=scraping_service.site.name,
+        ):
+            yield page
+
+    async def _follow(self, chapter_id: int) -> AsyncGenerator[Dict, None]:
+        stream_key = self._stream_key(chapter_id)
+        last_id = "0-0"
+        while True:
+            resp = await self.redis.xread(
+                {stream_key: last_id}, count=100, block=self.block_ms
+            )
+            if not resp:
+                if not await self.redis.exists(self._lock_key(chapter_id)):
+                    # the driver died without writing the end marker
+                    logger.warning(f"download of {chapter_id=} was abandoned")
+                    return
+                continue
+            for _, entries in resp:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    if b"page" in fields:
+                        yield json.loads(fields[b"page"])
+                    elif b"error" in fields:
+                        logger.error(f"{chapter_id=}: {fields[b'error'].decode()}")
+                        return
+                    else:
+                        return
+
+    async def close(self) -> None:
+        for driver in self._drivers:
+            driver.cancel()
+        await asyncio.gather(*self._drivers, return_exceptions=True)
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import datetime
+from logging import getLogger
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
+
+from core.models.manga_index_type_enum import MangaIndexTypeEnum, m_types
+from core.refresh_service import RefreshService
+from core.scraping_service.manga_site_scraping_service import MangaSiteScrapingService
+from database.models import Chapter as DBChapter, Manga
+
+logger = getLogger(__name__)
+
+
+def is_listed():
+    """Filter to the chapters in their manga's last scraped list, all of them
+    until it is scraped. Chapters dropped from the list keep their rows, for
+    the pages and history referencing them, with a NULL idx. Needs Manga
+    joined."""
+    return or_(Manga.chapters_last_scraped.is_(None), DBChapter.idx.is_not(None))
+
+
+class ChapterService(RefreshService):
+    """Serve the chapters of a manga from the db.
+
+    A manga's chapter list is scraped the first time it is asked for, then
+    served from the db and scraped again in the background once it is older
+    than max_age seconds."""
+
+    def __init__(self, *args, prefix: str = "ac_app:chapter_refresh", **kwargs):
+        super().__init__(*args, prefix=prefix, **kwargs)
+
+    async def get_chapters(
+        self,
+        session: AsyncSession,
+        db_manga: Manga,
+        scraping_service: MangaSiteScrapingService,
+    ) -> Dict[MangaIndexTypeEnum, List[DBChapter]]:
+        last_scraped = db_manga.chapters_last_scraped
+        if last_scraped is None:
+            await self.refresh(db_manga.id, db_manga.url, scraping_service)
+        elif self.is_stale(last_scraped):
+            self.refresh_in_background(db_manga.id, db_manga.url, scraping_service)
+        return await self.load_chapters(session, db_manga.id)
+
+    async def load_chapters(
+        self, session: AsyncSession, manga_id: int
+    ) -> Dict[MangaIndexTypeEnum, List[DBChapter]]:
+        """Return the chapters of a manga by type, in scraped order"""
+        q = (
+            select(DBChapter)
+            .join(Manga, DBChapter.manga_id == Manga.id)
+            .where(DBChapter.manga_id == manga_id)
+            .where(is_listed())
+            .order_by(DBChapter.type, DBChapter.idx.nulls_last(), DBChapter.id)
+        )
+        result = defaultdict(list)
+        for db_chapter in (await session.execute(q)).scalars():
+            result[m_types[db_chapter.type]].append(db_chapter)
+        return result
+
+    async def _scrape(
+        self,
+        manga_id: int,
+        manga_url: str,
+        scraping_service: MangaSiteScrapingService,
+    ) -> None:
+        chapters = await scraping_service.get_chapters(manga_url)
+        chapters_to_insert = [
+            {
+                "title": chap.title,
+                "page_url": str(chap.page_url),
+                "manga_id": manga_id,
+                "type": m_types.index(m_type),
+                "idx": idx,
+            }
+            for m_type, chap_list in chapters.items()
+            for idx, chap in enumerate(chap_list)
+        ]
+        async with self.database_service.session() as session:
+            async with session.begin():
+                await self.crud_service.bulk_create_objs_with_unique_key(
+                    session,
+                    DBChapter,
+                    chapters_to_insert,
+                    "page_url",
+                    auto_commit=False,
+                    update_attrs=["idx"],
+                )
+                if chapters_to_insert:
+                    # an empty list is more likely a broken scraper than a
+                    # manga without chapters, so nothing is dropped then
+                    await session.execute(
+                        update(DBChapter)
+                        .where(DBChapter.manga_id == manga_id)
+                        .where(
+                            DBChapter.page_url.not_in(
+                                [chap["page_url"] for chap in chapters_to_insert]
+                            )
+                        )
+                        .values(idx=None)
+                    )
+                await self.crud_service.update_object(
+                    session,
+                    Manga,
+                    manga_id,
+                    auto_commit=False,
+                    chapters_last_scraped=datetime.now(),
+                )
+        logger.info(f"refreshed {len(chapters_to_insert)} chapters of {manga_id=}")
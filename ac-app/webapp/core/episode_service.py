@@ -0,0 +1,89 @@
+from datetime import datetime
+from logging import getLogger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from core.models.anime import Anime as AnimeModel
+from core.refresh_service import RefreshService
+from core.scraping_service.anime_site_scraping_service import AnimeSiteScrapingService
+from database.models import Anime, Episode as DBEpisode
+
+logger = getLogger(__name__)
+
+
+class EpisodeService(RefreshService):
+    """Serve the episodes of an anime from the db.
+
+    An anime's episodes are crawled the first time they are asked for, then
+    served from the db and crawled again in the background once they are older
+    than max_age seconds. Only the pages newer than the latest stored episode
+    are crawled again."""
+
+    def __init__(self, *args, prefix: str = "ac_app:episode_refresh", **kwargs):
+        super().__init__(*args, prefix=prefix, **kwargs)
+
+    async def get_episodes(
+        self,
+        session: AsyncSession,
+        db_anime: Anime,
+        scraping_service: AnimeSiteScrapingService,
+    ) -> List[DBEpisode]:
+        last_scraped = db_anime.episodes_last_scraped
+        if last_scraped is None:
+            await self.refresh(db_anime.id, scraping_service)
+        elif self.is_stale(last_scraped):
+            self.refresh_in_background(db_anime.id, scraping_service)
+        return await self.load_episodes(session, db_anime.id)
+
+    async def load_episodes(
+        self, session: AsyncSession, anime_id: int
+    ) -> List[DBEpisode]:
+        """Return the episodes of an anime, newest first"""
+        q = (
+            select(DBEpisode)
+            .where(DBEpisode.anime_id == anime_id)
+            .order_by(DBEpisode.last_update.desc(), DBEpisode.id.desc())
+        )
+        return list((await session.execute(q)).scalars())
+
+    async def _scrape(
+        self, anime_id: int, scraping_service: AnimeSiteScrapingService
+    ) -> None:
+        async with self.database_service.session() as session:
+            db_anime = await self.crud_service.get_item_by_id(session, Anime, anime_id)
+            anime = AnimeModel.model_validate(db_anime)
+            q = select(DBEpisode.title).where(DBEpisode.anime_id == anime_id)
+            known_titles = set((await session.execute(q)).scalars())
+
+        episodes = await scraping_service.get_index_page(anime, known_titles)
+        # oldest first, so later episodes get larger ids
+        episodes_to_insert = [
+            {
+                "title": ep.title,
+                "last_update": ep.last_update,
+                "data": ep.data,
+                "anime_id": anime_id,
+                "manual_key": f"{anime_id}:{ep.title}",
+            }
+            for ep in reversed(episodes)
+        ]
+        async with self.database_service.session() as session:
+            async with session.begin():
+                if episodes_to_insert:
+                    await self.crud_service.bulk_create_objs_with_unique_key(
+                        session,
+                        DBEpisode,
+                        episodes_to_insert,
+                        "manual_key",
+                        auto_commit=False,
+                        update_attrs=["data"],
+                    )
+                await self.crud_service.update_object(
+                    session,
+                    Anime,
+                    anime_id,
+                    auto_commit=False,
+                    episodes_last_scraped=datetime.now(),
+                )
+        logger.info(f"stored {len(episodes_to_insert)} new episodes of {anime_id=}")
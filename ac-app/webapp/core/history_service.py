@@ -0,0 +1,103 @@
+from datetime import datetime
+from sqlalchemy import and_, func, or_, select, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from core.models.anime import AnimeSimple
+from core.models.chapter import Chapter
+from core.models.episode import Episode
+from core.models.manga import MangaSimple
+from database.models import (
+    AHistory,
+    Anime,
+    Chapter as DBChapter,
+    Episode as DBEpisode,
+    History,
+    Manga,
+)
+
+# rows without a timestamp sort after every real one
+NULL_TIME = datetime(1970, 1, 1)
+
+
+def _order_and_page(
+    stmt: Select,
+    sort_col,
+    id_col,
+    limit: Optional[int],
+    cursor_time: Optional[datetime],
+    cursor_id: Optional[int],
+) -> Select:
+    """Order by (sort_col desc, id desc), seeking past (cursor_time, cursor_id)"""
+    sort_key = func.coalesce(sort_col, NULL_TIME)
+    if cursor_id is not None:
+        cursor_key = cursor_time or NULL_TIME
+        stmt = stmt.where(
+            or_(
+                sort_key < cursor_key,
+                and_(sort_key == cursor_key, id_col < cursor_id),
+            )
+        )
+    stmt = stmt.order_by(sort_key.desc(), id_col.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+async def get_manga_history(
+    session: AsyncSession,
+    user_id: int,
+    time_sort: bool = False,
+    limit: Optional[int] = None,
+    cursor_time: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
+) -> list[MangaSimple]:
+    """Return the user's manga history in one query, newest first.
+
+    Sorted by History.last_added, or by Manga.last_update when time_sort is set.
+    The next page starts after the last item's (sort time, id)."""
+    sort_col = Manga.last_update if time_sort else History.last_added
+    stmt = (
+        select(Manga, DBChapter, History.last_added)
+        .join(History, History.manga_id == Manga.id)
+        .outerjoin(DBChapter, DBChapter.id == History.chapter_id)
+        .where(History.user_id == user_id)
+    )
+    stmt = _order_and_page(stmt, sort_col, Manga.id, limit, cursor_time, cursor_id)
+
+    result = []
+    for manga, chapter, last_added in (await session.execute(stmt)).all():
+        simple_manga = MangaSimple.model_validate(manga)
+        if chapter is not None:
+            simple_manga.last_read_chapter = Chapter.model_validate(chapter)
+        simple_manga.last_added = last_added
+        result.append(simple_manga)
+    return result
+
+
+async def get_anime_history(
+    session: AsyncSession,
+    user_id: int,
+    limit: Optional[int] = None,
+    cursor_time: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
+) -> list[AnimeSimple]:
+    """Return the user's anime history in one query, sorted by AHistory.last_added"""
+    stmt = (
+        select(Anime, DBEpisode, AHistory.last_added)
+        .join(AHistory, AHistory.anime_id == Anime.id)
+        .outerjoin(DBEpisode, DBEpisode.id == AHistory.episode_id)
+        .where(AHistory.user_id == user_id)
+    )
+    stmt = _order_and_page(
+        stmt, AHistory.last_added, Anime.id, limit, cursor_time, cursor_id
+    )
+
+    result = []
+    for anime, episode, last_added in (await session.execute(stmt)).all():
+        simple_anime = AnimeSimple.model_validate(anime)
+        if episode is not None:
+            simple_anime.last_read_episode = Episode.model_validate(episode)
+        simple_anime.last_added = last_added
+        result.append(simple_anime)
+    return result
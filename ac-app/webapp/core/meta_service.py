@@ -0,0 +1,163 @@
+from datetime import datetime
+from logging import getLogger
+from pathlib import Path
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from core.models.chapter import Chapter
+from core.models.meta import Meta, ThumImg
+from core.refresh_service import RefreshService
+from core.scraping_service.manga_site_scraping_service import MangaSiteScrapingService
+from database.models import Manga
+from download_service import DownloadService
+
+logger = getLogger(__name__)
+
+
+def current_thum_img(manga) -> Optional[ThumImg]:
+    """Return the thumbnail stored for a Manga row or a MangaWithSite, None if
+    its source is unknown"""
+    if manga.thum_img is None or manga.thum_img_url is None:
+        return None
+    return ThumImg(
+        path=manga.thum_img,
+        url=manga.thum_img_url,
+        etag=manga.thum_img_etag,
+        last_modified=manga.thum_img_last_modified,
+    )
+
+
+async def download_thum_img(
+    download_service: DownloadService,
+    download_path: str,
+    site_name: str,
+    manga_name: str,
+    url: str,
+    current: Optional[ThumImg] = None,
+) -> ThumImg:
+    """Download the thumbnail at url, unless current is a copy of it.
+
+    A copy of the same url is revalidated with If-None-Match/If-Modified-Since
+    and kept on a 304. Without validators to send it is kept as is."""
+    headers = {}
+    if current is not None and current.url == url and Path(current.path).exists():
+        if current.etag:
+            headers["If-None-Match"] = current.etag
+        if current.last_modified:
+            headers["If-Modified-Since"] = current.last_modified
+        if not headers:
+            return current
+
+    result = await download_service.download_img_if_modified(
+        url=url,
+        download_path=Path(download_path) / site_name / manga_name,
+        filename="thum_img",
+        headers=headers,
+    )
+    if result is None:
+        logger.debug(f"thumbnail of {manga_name} not modified")
+        return current
+    return ThumImg(
+        path=str(result["pic_path"]),
+        url=url,
+        etag=result.get("etag"),
+        last_modified=result.get("last_modified"),
+    )
+
+
+def thum_img_columns(thum_img: ThumImg) -> dict:
+    return {
+        "thum_img": thum_img.path,
+        "thum_img_url": thum_img.url,
+        "thum_img_etag": thum_img.etag,
+        "thum_img_last_modified": thum_img.last_modified,
+    }
+
+
+class MetaService(RefreshService):
+    """Serve the meta of a manga from its row in the db.
+
+    The meta is scraped the first time it is asked for, then served from the
+    db and scraped again in the background once it is older than max_age
+    seconds. The thumbnail is only downloaded again if it changed."""
+
+    def __init__(
+        self,
+        *args,
+        download_path: str,
+        prefix: str = "ac_app:meta_refresh",
+        **kwargs,
+    ):
+        super().__init__(*args, prefix=prefix, **kwargs)
+        self.download_path = download_path
+
+    async def get_meta(
+        self,
+        session: AsyncSession,
+        db_manga: Manga,
+        scraping_service: MangaSiteScrapingService,
+        download_service: DownloadService,
+    ) -> Meta:
+        last_scraped = db_manga.meta_last_scraped
+        args = (db_manga.id, scraping_service, download_service)
+        if last_scraped is None:
+            await self.refresh(*args)
+            await session.refresh(db_manga)
+        elif self.is_stale(last_scraped):
+            self.refresh_in_background(*args)
+        return self.meta_from_manga(db_manga)
+
+    @staticmethod
+    def meta_from_manga(db_manga: Manga) -> Meta:
+        latest_chapter = None
+        if db_manga.latest_chapter_url is not None:
+            latest_chapter = Chapter(
+                title=db_manga.latest_chapter_title,
+                page_url=db_manga.latest_chapter_url,
+            )
+        return Meta(
+            manga_id=db_manga.id,
+            last_update=db_manga.last_update,
+            finished=db_manga.finished,
+            thum_img=db_manga.thum_img,
+            latest_chapter=latest_chapter,
+        )
+
+    async def _scrape(
+        self,
+        manga_id: int,
+        scraping_service: MangaSiteScrapingService,
+        download_service: DownloadService,
+    ) -> None:
+        # no transaction is held open across the scraping and the download
+        async with self.database_service.session() as session:
+            db_manga = await self.crud_service.get_item_by_id(session, Manga, manga_id)
+            manga_url, manga_name = db_manga.url, db_manga.name
+            current = current_thum_img(db_manga)
+
+        meta = await scraping_service.get_meta(manga_url)
+        values = {
+            "last_update": meta.last_update,
+            "finished": meta.finished,
+            "meta_last_scraped": datetime.now(),
+        }
+        if meta.latest_chapter is not None:
+            values["latest_chapter_title"] = meta.latest_chapter.title
+            values["latest_chapter_url"] = str(meta.latest_chapter.page_url)
+        if meta.thum_img is not None:
+            thum_img = await download_thum_img(
+                download_service,
+                self.download_path,
+                scraping_service.site.name,
+                manga_name,
+                str(meta.thum_img),
+                current,
+            )
+            values.update(thum_img_columns(thum_img))
+
+        async with self.database_service.session() as session:
+            async with session.begin():
+                await self.crud_service.update_object(
+                    session, Manga, manga_id, auto_commit=False, **values
+                )
+        logger.info(f"refreshed meta of {manga_id=}")
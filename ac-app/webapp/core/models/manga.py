@@ -57,5 +57,9 @@ class MangaWithSite(BaseModel):
     url: HttpUrl
     manga_site_name: str
     manga_name: str
+    thum_img: Optional[str] = None
+    thum_img_url: Optional[str] = None
+    thum_img_etag: Optional[str] = None
+    thum_img_last_modified: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
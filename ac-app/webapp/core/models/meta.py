@@ -11,3 +11,12 @@ class Meta(BaseModel):
     finished: Optional[bool] = None
     thum_img: Optional[Union[HttpUrl, Path]] = None
     latest_chapter: Optional[Chapter] = None
+
+
+class ThumImg(BaseModel):
+    """A downloaded thumbnail, with the validators to re-download it with"""
+
+    path: str
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
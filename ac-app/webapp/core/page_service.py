@@ -0,0 +1,72 @@
+from pathlib import Path
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List
+
+from async_service import AsyncService
+from database import CRUDService
+from database.models import Chapter as DBChapter, Page
+from download_service import DownloadService
+
+
+def get_chapter_download_path(
+    download_path: str, site_name: str, manga_name: str, chapter_title: str
+) -> Path:
+    return Path(download_path) / site_name / manga_name / chapter_title
+
+
+async def save_pages(
+    pages: List[Dict],
+    chapter_id: int,
+    session: AsyncSession,
+    crud_service: CRUDService,
+) -> bool:
+    num_pages = len(pages)
+
+    pages = [
+        {
+            "pic_path": page["pic_path"],
+            "idx": page["idx"],
+            "chapter_id": chapter_id,
+            "total": num_pages,
+        }
+        for page in pages
+    ]
+
+    return await crud_service.bulk_create_objs_with_unique_key(
+        session, Page, pages, "pic_path"
+    )
+
+
+def pages_exist(pages: Iterable[Page]) -> bool:
+    if not pages:
+        return False
+    for db_page in pages:
+        if not Path(db_page.pic_path).exists():
+            return False
+    return True
+
+
+async def download_pages(
+    download_path: Path,
+    page_urls: List[str],
+    db_chapter: DBChapter,
+    session: AsyncSession,
+    download_service: DownloadService,
+    async_service: AsyncService,
+    crud_service: CRUDService,
+    limit_key: str = None,
+):
+    pages = []
+    async for result in download_service.download_imgs(
+        async_service,
+        download_path=download_path,
+        img_list=[
+            {"url": url, "filename": str(idx), "idx": idx, "total": len(page_urls)}
+            for idx, url in enumerate(page_urls)
+        ],
+        headers={"Referer": db_chapter.page_url},
+        limit_key=limit_key,
+    ):
+        pages.append(result)
+        yield result
+    await save_pages(pages, db_chapter.id, session, crud_service)
@@ -0,0 +1,180 @@
+import asyncio
+
+from collections import OrderedDict
+from logging import getLogger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
+
+from async_service import AsyncService
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.chapter_service import is_listed
+from core.models.manga_index_type_enum import MangaIndexTypeEnum
+from core.models.manga_site_enum import MangaSiteEnum
+from core.page_service import get_chapter_download_path, pages_exist
+from core.scraping_service import ScrapingServiceFactory
+from database import CRUDService, DatabaseService
+from database.models import Chapter as DBChapter, Manga, MangaSite, Page
+from download_service import DownloadService
+
+logger = getLogger(__name__)
+
+
+class PrefetchService:
+    """Download the chapter after the one being read on background workers"""
+
+    def __init__(
+        self,
+        database_service: DatabaseService,
+        crud_service: CRUDService,
+        coordinator: ChapterDownloadCoordinator,
+        ss_factory: ScrapingServiceFactory,
+        download_service: DownloadService,
+        async_service: AsyncService,
+        download_path: str,
+        num_workers: int = 2,
+        max_pending: int = 10,
+        max_chapter_orders: int = 1000,
+    ):
+        self.database_service = database_service
+        self.crud_service = crud_service
+        self.coordinator = coordinator
+        self.ss_factory = ss_factory
+        self.download_service = download_service
+        self.async_service = async_service
+        self.download_path = download_path
+        self.num_workers = num_workers
+        self._queue: asyncio.Queue[int] = asyncio.Queue(max_pending)
+        self._in_flight: set[int] = set()
+        # LRU of the mangas last listed, by manga_id
+        self._chapter_orders: OrderedDict[int, List[List[int]]] = OrderedDict()
+        self.max_chapter_orders = max_chapter_orders
+        self._workers: List[asyncio.Task] = []
+
+    def set_chapter_order(
+        self, manga_id: int, chapters: Dict[MangaIndexTypeEnum, List[DBChapter]]
+    ) -> None:
+        """Remember the order /chapters returned, which the reader pages through"""
+        self._chapter_orders[manga_id] = [
+            [chapter.id for chapter in chap_list] for chap_list in chapters.values()
+        ]
+        self._chapter_orders.move_to_end(manga_id)
+        while len(self._chapter_orders) > self.max_chapter_orders:
+            self._chapter_orders.popitem(last=False)
+
+    async def get_next_chapter_id(
+        self, session: AsyncSession, db_chapter: DBChapter
+    ) -> Optional[int]:
+        chapter_orders = self._chapter_orders.get(db_chapter.manga_id, [])
+        if chapter_orders:
+            self._chapter_orders.move_to_end(db_chapter.manga_id)
+        for chapter_ids in chapter_orders:
+            if db_chapter.id in chapter_ids:
+                idx = chapter_ids.index(db_chapter.id)
+                return chapter_ids[idx + 1] if idx + 1 < len(chapter_ids) else None
+
+        q = (
+            select(DBChapter.id)
+            .join(Manga, DBChapter.manga_id == Manga.id)
+            .where(DBChapter.manga_id == db_chapter.manga_id)
+            .where(DBChapter.type == db_chapter.type)
+            .where(is_listed())
+        )
+        if db_chapter.idx is not None:
+            # idx is the position in the scraped list /chapters returns
+            q = q.where(DBChapter.idx > db_chapter.idx).order_by(DBChapter.idx)
+        else:
+            # chapters are inserted in scraped order, so ids follow /chapters
+            q = q.where(DBChapter.id > db_chapter.id).order_by(DBChapter.id)
+        return (await session.execute(q.limit(1))).scalar_one_or_none()
+
+    async def schedule_next(
+        self, session: AsyncSession, db_chapter: DBChapter
+    ) -> Optional[int]:
+        """Queue the chapter after db_chapter, returns its id if it was queued"""
+        chapter_id = await self.get_next_chapter_id(session, db_chapter)
+        if chapter_id is not None and self.schedule(chapter_id):
+            return chapter_id
+        return None
+
+    def schedule(self, chapter_id: int) -> bool:
+        if chapter_id in self._in_flight:
+            return False
+        self._start_workers()
+        try:
+            self._queue.put_nowait(chapter_id)
+        except asyncio.QueueFull:
+            logger.warning(f"prefetch queue is full, dropping {chapter_id=}")
+            return False
+        self._in_flight.add(chapter_id)
+        return True
+
+    def is_in_flight(self, chapter_id: int) -> bool:
+        return chapter_id in self._in_flight
+
+    def _start_workers(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.num_workers)
+        ]
+
+    async def _worker(self) -> None:
+        while True:
+            chapter_id = await self._queue.get()
+            try:
+                await self.prefetch_chapter(chapter_id)
+            except Exception:
+                logger.exception(f"failed to prefetch {chapter_id=}")
+            finally:
+                self._in_flight.discard(chapter_id)
+                self._queue.task_done()
+
+    async def prefetch_chapter(self, chapter_id: int) -> int:
+        """Download and persist the pages of a chapter, returns no. of new pages"""
+        async with self.database_service.session() as session:
+            async with session.begin():
+                pages = await self.crud_service.get_items_by_same_attr(
+                    session, Page, "chapter_id", chapter_id
+                )
+                if pages_exist(pages):
+                    return 0
+
+                db_chapter = await self.crud_service.get_item_by_id(
+                    session, DBChapter, chapter_id
+                )
+                db_manga = await self.crud_service.get_item_by_id(
+                    session, Manga, db_chapter.manga_id
+                )
+                site_name = await self.crud_service.get_attr_of_item_by_id(
+                    session, MangaSite, db_manga.manga_site_id, "name"
+                )
+                scraping_service = self.ss_factory.get(MangaSiteEnum(site_name))
+                download_path = get_chapter_download_path(
+                    self.download_path,
+                    scraping_service.site.name,
+                    db_manga.name,
+                    db_chapter.title,
+                )
+
+        num_pages = 0
+        async for _ in self.coordinator.stream_pages(
+            db_chapter,
+            scraping_service,
+            self.download_service,
+            self.async_service,
+            download_path,
+        ):
+            num_pages += 1
+        logger.info(f"prefetched {num_pages} pages of {chapter_id=}")
+        return num_pages
+
+    async def join(self) -> None:
+        """Wait until every queued chapter has been processed"""
+        await self._queue.join()
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
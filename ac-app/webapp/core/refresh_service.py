@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from abc import ABCMeta, abstractmethod
+from datetime import datetime, timedelta
+from logging import getLogger
+from redis.asyncio import Redis
+from typing import Dict, Optional
+from uuid import uuid4
+
+from core.chapter_download_coordinator import RELEASE_LOCK_SCRIPT
+from database import CRUDService, DatabaseService
+
+logger = getLogger(__name__)
+
+
+class RefreshService(metaclass=ABCMeta):
+    """Base of services serving scraped data from the db and scraping it again
+    once it is older than max_age seconds.
+
+    Refreshes of a key are single-flight, one task per process and a redis
+    lock across processes. After a refresh of a key fails, background
+    refreshes of it are skipped for retry_after seconds, so a broken site is
+    not scraped again on every request. Subclasses implement _scrape."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        database_service: DatabaseService,
+        crud_service: CRUDService,
+        max_age: int = 3600,
+        prefix: str = "ac_app:refresh",
+        lock_ttl: int = 60,
+        poll_interval: float = 0.1,
+        retry_after: float = 300,
+    ):
+        self.redis = redis
+        self.database_service = database_service
+        self.crud_service = crud_service
+        self.max_age = timedelta(seconds=max_age)
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self.retry_after = retry_after
+        self._refreshes: Dict[int, asyncio.Task] = {}
+        # monotonic time of the last failed refresh, by key
+        self._failed_at: Dict[int, float] = {}
+
+    def _lock_key(self, key: int) -> str:
+        return f"{self.prefix}:{key}:lock"
+
+    def is_stale(self, last_scraped: Optional[datetime]) -> bool:
+        return last_scraped is None or datetime.now() - last_scraped > self.max_age
+
+    async def refresh(self, key: int, *args) -> None:
+        """Scrape key, joining a refresh in progress"""
+        await asyncio.shield(self._refresh_task(key, *args))
+
+    def refresh_in_background(self, key: int, *args) -> None:
+        failed_at = self._failed_at.get(key)
+        if failed_at is not None:
+            if time.monotonic() - failed_at < self.retry_after:
+                return
+            del self._failed_at[key]
+        task = self._refresh_task(key, *args)
+        task.add_done_callback(self._log_failure)
+
+    def _refresh_task(self, key: int, *args) -> asyncio.Task:
+        task = self._refreshes.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(key, *args))
+            self._refreshes[key] = task
+            task.add_done_callback(lambda _: self._refreshes.pop(key, None))
+        return task
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(
+                f"{type(self).__name__} failed to refresh: {task.exception()!r}"
+            )
+
+    async def _refresh(self, key: int, *args) -> None:
+        lock_key = self._lock_key(key)
+        token = uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl):
+            # another process is refreshing it, its result is good enough
+            while await self.redis.exists(lock_key):
+                await asyncio.sleep(self.poll_interval)
+            return
+
+        try:
+            await self._scrape(key, *args)
+        except Exception:
+            self._failed_at[key] = time.monotonic()
+            raise
+        else:
+            self._failed_at.pop(key, None)
+        finally:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+    @abstractmethod
+    async def _scrape(self, key: int, *args) -> None:
+        """Scrape key and store the result in the db"""
+
+    async def join(self) -> None:
+        """Wait until the refreshes in progress are done"""
+        await asyncio.gather(*self._refreshes.values(), return_exceptions=True)
+
+    async def close(self) -> None:
+        tasks = list(self._refreshes.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
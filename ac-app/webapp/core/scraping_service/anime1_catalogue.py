@@ -0,0 +1,72 @@
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Set
+
+from core.models.anime import Anime
+
+ANIME1_SEARCH_RESULT_KEYS = ["name", "eps", "year", "season", "sub"]
+
+
+def to_anime(item: Sequence) -> Anime:
+    """Make an Anime of an item of the anime1 catalogue, [cat, name, eps, ...]"""
+    item_dict = {key: i for key, i in zip(ANIME1_SEARCH_RESULT_KEYS, item[1:])}
+    item_dict["url"] = f"?cat={item[0]}"
+    return Anime(**item_dict)
+
+
+def _grams(text: str) -> Set[str]:
+    """Return the characters and the pairs of adjacent characters of text"""
+    return set(text) | {text[idx : idx + 2] for idx in range(len(text) - 1)}
+
+
+class AnimeCatalogue:
+    """The anime1 catalogue, indexed for substring search of names.
+
+    Items are kept as they came, in catalogue order. Every character and pair
+    of adjacent characters of a casefolded name maps to the numbers of the
+    items containing it, so a keyword is only compared with the names having
+    its rarest pair, which works for CJK names without word boundaries."""
+
+    def __init__(self, items: Iterable[Sequence]):
+        self._items: List[tuple] = []
+        self._names: List[str] = []
+        index: Dict[str, List[int]] = defaultdict(list)
+        for idx, item in enumerate(items):
+            name = str(item[1]).casefold()
+            self._items.append(tuple(item))
+            self._names.append(name)
+            for gram in _grams(name):
+                index[gram].append(idx)
+        self._index: Dict[str, array] = {
+            gram: array("I", ids) for gram, ids in index.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def search(self, keyword: str, limit: int = None) -> List[Anime]:
+        """Return the anime with keyword in their names, best matches first:
+        exact names, then by where keyword is in the name, shorter names and
+        catalogue order"""
+        keyword = keyword.casefold()
+        if not keyword:
+            candidates = range(len(self._items))
+        else:
+            if len(keyword) == 1:
+                grams = [keyword]
+            else:
+                grams = [keyword[idx : idx + 2] for idx in range(len(keyword) - 1)]
+            postings = [self._index.get(gram) for gram in grams]
+            if not all(postings):
+                return []
+            candidates = min(postings, key=len)
+
+        names = self._names
+        matches = []
+        for idx in candidates:
+            pos = names[idx].find(keyword)
+            if pos >= 0:
+                name = names[idx]
+                matches.append((name != keyword, pos, len(name), idx))
+        matches.sort()
+        return [to_anime(self._items[match[-1]]) for match in matches[:limit]]
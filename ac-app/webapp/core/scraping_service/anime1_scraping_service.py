@@ -1,43 +1,152 @@
+import asyncio
+
+from bs4 import BeautifulSoup
 from datetime import datetime
 from logging import getLogger
-from time import time
-from typing import List, Optional
+from time import monotonic, time
+from typing import AsyncIterator, Container, Dict, List, Optional, Tuple
 from urllib.parse import unquote, urljoin
 
 from bs4.element import Tag
 from core.models.site import Site
 from core.models.anime import Anime
 from core.models.episode import Episode
+from core.scraping_service.anime1_catalogue import AnimeCatalogue
 from core.scraping_service.anime_site_scraping_service import AnimeSiteScrapingService
 
 from download_service import DownloadService
 
 logger = getLogger(__name__)
-ANIME1_SEARCH_RESULT_KEYS = ["name", "eps", "year", "season", "sub"]
 
 
 class Anime1ScrapingService(AnimeSiteScrapingService):
-    def __init__(self, download_service: DownloadService):
+    def __init__(
+        self,
+        download_service: DownloadService,
+        catalogue_ttl: int = 3600,
+        retry_after: float = 300,
+    ):
         self.site = Site(id=2, name="anime1", url="https://anime1.me/")
         self._download_service = download_service
+        # page urls of an anime found by its last full crawl, by anime url
+        self._page_urls: Dict[str, List[str]] = {}
+        self.catalogue_ttl = catalogue_ttl
+        self.retry_after = retry_after
+        self._catalogue: Optional[AnimeCatalogue] = None
+        self._catalogue_loaded_at = 0.0
+        # monotonic time of the last failed download, None since a success
+        self._catalogue_failed_at: Optional[float] = None
+        self._catalogue_task: Optional[asyncio.Task] = None
 
     async def search_anime(self, keyword: str) -> List[Anime]:
-        """Search manga with keyword, return a list of manga"""
-
-        def process_item(item) -> Anime:
-            item_dict = {key: i for key, i in zip(ANIME1_SEARCH_RESULT_KEYS, item[1:])}
-            item_dict["url"] = f"?cat={item[0]}"
-            return Anime(**item_dict)
-
+        """Search anime with keyword, return a list of anime, best matches first"""
+        catalogue = await self.get_catalogue()
+        return catalogue.search(keyword)
+
+    async def get_catalogue(self) -> AnimeCatalogue:
+        """Return the catalogue, downloading it the first time. Once it is older
+        than catalogue_ttl seconds it is downloaded again in the background and
+        the old one is returned until then, retry_after seconds after a failed
+        download, like RefreshService"""
+        if self._catalogue is None:
+            await asyncio.shield(self._load_catalogue_task())
+        elif monotonic() - self._catalogue_loaded_at > self.catalogue_ttl and (
+            self._catalogue_failed_at is None
+            or monotonic() - self._catalogue_failed_at >= self.retry_after
+        ):
+            self._load_catalogue_task()
+        return self._catalogue
+
+    def _load_catalogue_task(self) -> asyncio.Task:
+        if self._catalogue_task is None:
+            self._catalogue_task = asyncio.create_task(self._load_catalogue())
+            self._catalogue_task.add_done_callback(self._catalogue_loaded)
+        return self._catalogue_task
+
+    def _catalogue_loaded(self, task: asyncio.Task) -> None:
+        self._catalogue_task = None
+        if not task.cancelled() and task.exception() is not None:
+            self._catalogue_failed_at = monotonic()
+            logger.error(f"failed to load the anime1 catalogue: {task.exception()!r}")
+
+    async def _load_catalogue(self) -> None:
         url = f"https://d1zquzjgwo9yb.cloudfront.net/?_={int(time() * 1000)}"
         data = await self.download_service.get_json(url)
-        anime_list = [process_item(item) for item in data]
+        # indexing takes tens of milliseconds, let the loop run meanwhile
+        self._catalogue = await asyncio.to_thread(AnimeCatalogue, data)
+        self._catalogue_loaded_at = monotonic()
+        self._catalogue_failed_at = None
+        logger.info(f"loaded {len(self._catalogue)} anime from the anime1 catalogue")
+
+    async def get_index_page(
+        self, anime: Anime, known_titles: Container[str] = ()
+    ) -> List[Episode]:
+        """Get the episodes of anime, newest first.
+
+        With known_titles, paging stops at the first episode in it and only the
+        episodes newer than that are returned. Otherwise every page is fetched,
+        the pages found by the last full crawl concurrently."""
+        url = urljoin(str(self.site.url), anime.url)
+        if known_titles:
+            return await self._get_new_episodes(url, known_titles)
+
+        page_urls, soups = [], []
+        cached_urls = self._page_urls.get(anime.url)
+        if cached_urls:
+            try:
+                soups = await asyncio.gather(
+                    *(self._get_page(page_url) for page_url in cached_urls)
+                )
+                page_urls = list(cached_urls)
+                # pages may have been added since
+                url = self._previous_page_url(soups[-1])
+            except Exception as ex:
+                logger.warning(f"cached pages of {anime.url} failed, {ex=}")
+                soups = []
+        if url is not None:
+            async for page_url, soup in self._walk_pages(url):
+                page_urls.append(page_url)
+                soups.append(soup)
+        self._page_urls[anime.url] = page_urls
+
+        eps, titles = [], set()
+        for soup in soups:
+            for ep in self._extract_episodes(soup):
+                # pages shift when an episode is added during the crawl
+                if ep.title not in titles:
+                    titles.add(ep.title)
+                    eps.append(ep)
+        return eps
+
+    async def _get_new_episodes(
+        self, url: str, known_titles: Container[str]
+    ) -> List[Episode]:
+        eps = []
+        async for _, soup in self._walk_pages(url):
+            for ep in self._extract_episodes(soup):
+                if ep.title in known_titles:
+                    return eps
+                eps.append(ep)
+        return eps
+
+    async def _get_page(self, url: str) -> BeautifulSoup:
+        logger.info(f"going to donwload from {url}")
+        return await self.download_service.get_soup(url, follow_redirects=True)
 
-        return [anime for anime in anime_list if keyword in anime.name]
+    async def _walk_pages(self, url: str) -> AsyncIterator[Tuple[str, BeautifulSoup]]:
+        """Yield the pages from url to the oldest one, one at a time"""
+        while url is not None:
+            soup = await self._get_page(url)
+            yield url, soup
+            url = self._previous_page_url(soup)
 
-    async def get_index_page(self, anime: Anime) -> List[Episode]:
-        """Get index page of anime, return a manga with chapters"""
+    @staticmethod
+    def _previous_page_url(soup: BeautifulSoup) -> Optional[str]:
+        div = soup.find("div", {"class": "nav-previous"})
+        return div.find("a").get("href") if div else None
 
+    @staticmethod
+    def _extract_episodes(soup: BeautifulSoup) -> List[Episode]:
         def process_ep(article: Tag):
             title = article.find("h2", {"class": "entry-title"}).get_text()
             last_update = article.find("time", {"class": "updated"}).get_text()
@@ -50,20 +159,7 @@ class Anime1ScrapingService(AnimeSiteScrapingService):
 
             return Episode(**{"title": title, "last_update": last_update, "data": data})
 
-        eps = []
-        url = urljoin(str(self.site.url), anime.url)
-
-        while True:
-            logger.info(f"going to donwload from {url}")
-            soup = await self.download_service.get_soup(url, follow_redirects=True)
-            eps += [process_ep(article) for article in soup.find_all("article")]
-
-            div = soup.find("div", {"class": "nav-previous"})
-            if div:
-                url = div.find("a").get("href")
-            else:
-                break
-        return eps
+        return [process_ep(article) for article in soup.find_all("article")]
 
     async def get_video_url(self, ep: Episode) -> Optional[str]:
         """Get all the urls of a chaper, return a list of strings"""
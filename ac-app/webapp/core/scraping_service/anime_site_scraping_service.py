@@ -1,5 +1,5 @@
 from logging import getLogger
-from typing import List, Protocol
+from typing import Container, List, Protocol
 
 
 from core.models.anime import Anime
@@ -15,8 +15,11 @@ class AnimeSiteScrapingService(Protocol):
     async def search_anime(self, keyword: str) -> List[Anime]:
         """Search manga with keyword, return a list of manga"""
 
-    async def get_index_page(self, anime: Anime) -> List[Episode]:
-        """Get index page of anime, return a list of episodes"""
+    async def get_index_page(
+        self, anime: Anime, known_titles: Container[str] = ()
+    ) -> List[Episode]:
+        """Get index page of anime, return a list of episodes, newest first.
+        Stop at the first episode in known_titles if given"""
 
     async def get_video_url(self, ep: Episode) -> str:
         """Get all the urls of a chaper, return a list of strings"""
@@ -1,12 +1,23 @@
 """Application module."""
 
+import asyncio
+
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from kink import di
+from redis.asyncio import Redis as AsyncRedis
 from logging import config as log_config
 
-from boostrap import bootstrap_di
+from boostrap import bootstrap_di, bootstrap_resources
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.chapter_service import ChapterService
+from core.episode_service import EpisodeService
+from core.meta_service import MetaService
+from core.prefetch_service import PrefetchService
+from database import DatabaseService
+from store_service import CASStoreService
 
 bootstrap_di()
 
@@ -17,7 +28,25 @@ from routers import api, main, auth, user
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     log_config.fileConfig("logging.conf", disable_existing_loggers=False)
+    # pooled connections belong to the loop serving the app
+    bootstrap_resources()
+    database_service = di[DatabaseService]
+    store_service = di["store_service"]
+    gc_interval = di["store_config"].get("gc_interval", 86400)
+    gc_task = None
+    if isinstance(store_service, CASStoreService) and gc_interval:
+        gc_task = asyncio.create_task(store_service.collect_garbage_every(gc_interval))
     yield
+    if gc_task is not None:
+        gc_task.cancel()
+    if di["prefetch_config"].get("enabled", False):
+        await di[PrefetchService].close()
+    await di[ChapterService].close()
+    await di[MetaService].close()
+    await di[EpisodeService].close()
+    await di[ChapterDownloadCoordinator].close()
+    await di[AsyncRedis].close()
+    await database_service.dispose()
 
 
 def create_app() -> FastAPI:
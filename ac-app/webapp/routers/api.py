@@ -1,7 +1,6 @@
 import asyncio
 import json
 
-from collections import defaultdict
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
 from kink import di, inject as kink_inject
@@ -9,7 +8,7 @@ from logging import getLogger
 from pathlib import Path
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Dict, List, Iterable
+from typing import Dict, List, Iterable, Optional
 
 from async_service import AsyncService
 from core.models.chapter import Chapter
@@ -17,9 +16,15 @@ from core.models.anime import AnimeBase, AnimeSimple
 from core.models.episode import Episode
 from core.models.manga import MangaBase, MangaSimple
 from core.models.manga_site_enum import MangaSiteEnum
-from core.models.manga_index_type_enum import MangaIndexTypeEnum, m_types
+from core.models.manga_index_type_enum import MangaIndexTypeEnum
 from core.models.meta import Meta
 from core.models.site import Site
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.chapter_service import ChapterService
+from core.episode_service import EpisodeService
+from core.meta_service import MetaService
+from core.page_service import get_chapter_download_path, pages_exist
+from core.prefetch_service import PrefetchService
 from core.scraping_service import ScrapingServiceFactory
 from core.scraping_service.anime_site_scraping_service import (
     AnimeSiteScrapingService as ASSService,
@@ -49,27 +54,10 @@ router = APIRouter()
 logger = getLogger(__name__)
 
 
-async def save_pages(
-    pages: List[Dict],
-    chapter_id: int,
-    session: AsyncSession,
-    crud_service: CRUDService,
-) -> bool:
-    num_pages = len(pages)
-
-    pages = [
-        {
-            "pic_path": page["pic_path"],
-            "idx": page["idx"],
-            "chapter_id": chapter_id,
-            "total": num_pages,
-        }
-        for page in pages
-    ]
-
-    return await crud_service.bulk_create_objs_with_unique_key(
-        session, Page, pages, "pic_path"
-    )
+def get_prefetch_service() -> Optional[PrefetchService]:
+    if not di["prefetch_config"].get("enabled", False):
+        return None
+    return di[PrefetchService]
 
 
 async def _search_manga(
@@ -198,82 +186,34 @@ async def get_anime(
 
 @router.get("/episodes", response_model=List[Episode])
 async def get_episodes(
-    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
     session: AsyncSession = Depends(get_db_session),
     db_anime: Anime = Depends(db_utils.get_db_anime_from_id),
     scraping_service: ASSService = Depends(db_utils.get_scraping_service_from_anime),
+    episode_service: EpisodeService = Depends(lambda: di[EpisodeService]),
 ) -> List[Episode]:
-    episodes = await scraping_service.get_index_page(db_anime)
-
-    episodes_to_insert = [
-        {
-            "title": ep.title,
-            "last_update": ep.last_update,
-            "data": ep.data,
-            "anime_id": db_anime.id,
-            "manual_key": f"{db_anime.id}:{ep.title}",
-        }
-        for ep in episodes
-    ]
-
-    db_episodes = await crud_service.bulk_create_objs_with_unique_key(
-        session, DBEpisode, episodes_to_insert, "manual_key", update_attrs=["data"]
-    )
-    return db_episodes
+    return await episode_service.get_episodes(session, db_anime, scraping_service)
 
 
 @router.get("/chapters", response_model=Dict[MangaIndexTypeEnum, List[Chapter]])
 async def get_chapters(
     request: Request,
-    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
     session: AsyncSession = Depends(get_db_session),
     db_manga: Manga = Depends(db_utils.get_db_manga_from_id),
     scraping_service: MSSService = Depends(db_utils.get_scraping_service_from_manga),
-    ss_factory: ScrapingServiceFactory = Depends(lambda: di[ScrapingServiceFactory]),
+    chapter_service: ChapterService = Depends(lambda: di[ChapterService]),
+    prefetch_service: Optional[PrefetchService] = Depends(get_prefetch_service),
 ) -> list[Chapter]:
     # if "x-forwarded-for" in request.headers and not is_private(
     #     request.headers["x-forwarded-for"].split(",")[0]
     # ):
     #     db_manga = await db_utils.get_db_manga_from_id(23, session, crud_service)
     #     scraping_service = ss_factory.get(MangaSiteEnum.MangaBat)
-    chapters = await scraping_service.get_chapters(db_manga.url)
-    chapters_to_insert = []
-
-    for m_type, chap_list in chapters.items():
-        for chap in chap_list:
-            chapters_to_insert.append(
-                {
-                    "title": chap.title,
-                    "page_url": str(chap.page_url),
-                    "manga_id": db_manga.id,
-                    "type": m_types.index(m_type),
-                }
-            )
-    db_chapters = await crud_service.bulk_create_objs_with_unique_key(
-        session, DBChapter, chapters_to_insert, "page_url"
-    )
-    result = defaultdict(list)
-    for db_chapter in db_chapters:
-        m_type = m_types[db_chapter.type]
-        result[m_type].append(db_chapter)
+    result = await chapter_service.get_chapters(session, db_manga, scraping_service)
+    if prefetch_service:
+        prefetch_service.set_chapter_order(db_manga.id, result)
     return result
 
 
-async def _download_thum_img(
-    download_service: DownloadService,
-    download_path: str,
-    site_name: str,
-    manga_name: str,
-    thum_img_url: str,
-):
-    download_path = Path(download_path) / site_name / manga_name
-
-    download_result = await download_service.download_img(
-        url=str(thum_img_url), download_path=download_path, filename="thum_img"
-    )
-    return download_result
-
-
 def get_download_service():
     return di[DownloadService]
 
@@ -283,8 +223,8 @@ async def get_meta(
     request: Request,
     db_manga: Manga = Depends(db_utils.get_db_manga_from_id),
     scraping_service: MSSService = Depends(db_utils.get_scraping_service_from_manga),
+    meta_service: MetaService = Depends(lambda: di[MetaService]),
     download_service: DownloadService = Depends(get_download_service),
-    download_path: str = Depends(lambda: di["api"]["download_path"]),
     crud_service: CRUDService = Depends(lambda: di[CRUDService]),
     db_session: AsyncSession = Depends(get_db_session),
     ss_factory: ScrapingServiceFactory = Depends(lambda: di[ScrapingServiceFactory]),
@@ -294,58 +234,16 @@ async def get_meta(
     # ):
     #     db_manga = await db_utils.get_db_manga_from_id(23, db_session, crud_service)
     #     scraping_service = ss_factory.get(MangaSiteEnum.MangaBat)
-    meta = await scraping_service.get_meta(db_manga.url)
-
-    download_result = await _download_thum_img(
-        download_service,
-        download_path,
-        scraping_service.site.name,
-        db_manga.name,
-        str(meta.thum_img),
-    )
-    meta.thum_img = download_result["pic_path"]
-
-    await crud_service.update_object(
-        db_session,
-        Manga,
-        db_manga.id,
-        finished=meta.finished,
-        thum_img=str(meta.thum_img),
-        last_update=meta.last_update,
+    return await meta_service.get_meta(
+        db_session, db_manga, scraping_service, download_service
     )
 
-    return meta
-
 
 async def _create_async_gen_from_pages(pages: Iterable[Page]):
     for db_page in pages:
         yield {"pic_path": db_page.pic_path, "idx": db_page.idx, "total": db_page.total}
 
 
-async def _download_pages(
-    download_path: Path,
-    page_urls: List[str],
-    db_chapter: DBChapter,
-    session: AsyncSession,
-    download_service: DownloadService,
-    async_service: AsyncService,
-    crud_service: CRUDService,
-):
-    pages = []
-    async for result in download_service.download_imgs(
-        async_service,
-        download_path=download_path,
-        img_list=[
-            {"url": url, "filename": str(idx), "idx": idx, "total": len(page_urls)}
-            for idx, url in enumerate(page_urls)
-        ],
-        headers={"Referer": db_chapter.page_url},
-    ):
-        pages.append(result)
-        yield result
-    await save_pages(pages, db_chapter.id, session, crud_service)
-
-
 async def _sse_img_gen(page_list):
     async for page in page_list:
         yield f"data: {json.dumps(page)}\n\n"
@@ -358,6 +256,7 @@ async def get_episode(
     db_anime: Anime = Depends(db_utils.get_anime_from_episode_id),
     scraping_service: ASSService = Depends(db_utils.get_scraping_service_from_episode),
     download_path: str = Depends(lambda: di["api"]["download_path"]),
+    num_segments: int = Depends(lambda: di["download_service"].get("vid_segments", 1)),
 ):
     download_path = (
         Path(download_path)
@@ -371,20 +270,14 @@ async def get_episode(
     download_service: DownloadService = scraping_service.download_service
     logger.info(f"{download_service.client.cookies=}")
     result = await download_service.download_vid(
-        url=vid_url, download_path=download_path, filename=db_episode.title
+        url=vid_url,
+        download_path=download_path,
+        filename=db_episode.title,
+        num_segments=num_segments,
     )
     return result
 
 
-def _check_pages_exist(pages: Page):
-    if not pages:
-        return False
-    for db_page in pages:
-        if not Path(db_page.pic_path).exists():
-            return False
-    return True
-
-
 @router.get("/pages")
 async def get_pages(
     request: Request,
@@ -396,6 +289,10 @@ async def get_pages(
     download_path: str = Depends(lambda: di["api"]["download_path"]),
     download_service: DownloadService = Depends(get_download_service),
     async_service: AsyncService = Depends(lambda: di[AsyncService]),
+    prefetch_service: Optional[PrefetchService] = Depends(get_prefetch_service),
+    coordinator: ChapterDownloadCoordinator = Depends(
+        lambda: di[ChapterDownloadCoordinator]
+    ),
 ):
     if "x-forwarded-for" in request.headers and not is_private(
         request.headers["x-forwarded-for"].split(",")[0]
@@ -407,25 +304,19 @@ async def get_pages(
         pages = await crud_service.get_items_by_same_attr(
             session, Page, "chapter_id", db_chapter.id
         )
-    download_pages = not _check_pages_exist(pages)
-
-    if download_pages:
-        page_urls = await scraping_service.get_page_urls(db_chapter.page_url)
+    if prefetch_service:
+        await prefetch_service.schedule_next(session, db_chapter)
 
-        download_path = (
-            Path(download_path)
-            / scraping_service.site.name
-            / db_manga.name
-            / db_chapter.title
+    if not pages_exist(pages):
+        download_path = get_chapter_download_path(
+            download_path, scraping_service.site.name, db_manga.name, db_chapter.title
         )
-        page_gen = _download_pages(
-            download_path,
-            page_urls,
+        page_gen = coordinator.stream_pages(
             db_chapter,
-            session,
+            scraping_service,
             download_service,
             async_service,
-            crud_service,
+            download_path,
         )
     else:
         page_gen = _create_async_gen_from_pages(pages)
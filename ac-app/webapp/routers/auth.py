@@ -8,8 +8,14 @@ from fastapi_sessions.backends.session_backend import SessionBackend
 from jose import JWTError
 from kink import di
 from logging import getLogger
+from sqlalchemy.ext.asyncio import AsyncSession
+from time import time
+from typing import Optional
 from uuid import uuid4
 
+from database import CRUDService
+from database.models import User
+from routers.utils import get_db_session
 from security_service import SecurityService
 from session import BasicVerifier, SessionData
 
@@ -18,10 +24,20 @@ router = APIRouter()
 
 
 async def create_session(
-    username: str, response: Response, backend: SessionBackend, cookie: SessionFrontend
+    username: str,
+    response: Response,
+    backend: SessionBackend,
+    cookie: SessionFrontend,
+    user_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
 ):
     session = uuid4()
-    data = SessionData(username=username)
+    data = SessionData(
+        username=username,
+        user_id=user_id,
+        is_active=is_active,
+        checked_at=time() if user_id is not None else None,
+    )
 
     await backend.create(session, data)
     cookie.attach_to_response(response, session)
@@ -70,6 +86,8 @@ async def auth(
     security_service: SecurityService = Depends(lambda: di[SecurityService]),
     backend: SessionBackend = Depends(lambda: di["session_backend"]),
     cookie: SessionFrontend = Depends(lambda: di["cookie"]),
+    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
+    db_session: AsyncSession = Depends(get_db_session),
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -83,7 +101,15 @@ async def auth(
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    await create_session(username, response, backend, cookie)
+    db_user = await crud_service.get_item_by_attrs(db_session, User, email=username)
+    await create_session(
+        username,
+        response,
+        backend,
+        cookie,
+        user_id=db_user.id if db_user else None,
+        is_active=db_user.is_active if db_user else None,
+    )
     response.status_code = status.HTTP_307_TEMPORARY_REDIRECT
     response.headers["location"] = "/ac"
     return response
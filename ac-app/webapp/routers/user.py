@@ -1,33 +1,32 @@
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Form
+from fastapi_sessions.backends.session_backend import BackendError, SessionBackend
+from fastapi_sessions.frontends.session_frontend import SessionFrontend
 from kink import di
 from logging import getLogger
 from sqlalchemy import select
 from sqlalchemy.exc import NoResultFound, IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
-
-from typing import List
+from time import time
+from typing import List, Optional
 
 from core.admin_service import update_meta, get_all_mangas_in_history, update_chapters
+from core.history_service import get_anime_history, get_manga_history
 from core.models.anime import AnimeSimple
-from core.models.chapter import Chapter
-from core.models.episode import Episode
 from core.models.history import History
 from core.models.manga import MangaSimple
 from core.scraping_service import ScrapingServiceFactory
-from database import CRUDService
+from database import CRUDService, DatabaseService
 from database.models import (
     User,
     Manga,
     History as DBHistory,
-    Chapter as DBChapter,
     AHistory,
     Anime,
-    Episode as DBEpisode,
 )
 from download_service import DownloadService
 from routers.auth import get_session_data
-from routers.utils import get_db_session, get_redirect_response
+from routers.utils import get_db_session, get_redirect_response, get_database_service
 from session import SessionData
 
 router = APIRouter()
@@ -35,15 +34,54 @@ router = APIRouter()
 logger = getLogger(__name__)
 
 
-async def get_user_id_from_session_data(
+async def get_identity_from_session_data(
+    request: Request,
     session_data: SessionData = Depends(get_session_data),
     crud_service: CRUDService = Depends(lambda: di[CRUDService]),
     db_session: AsyncSession = Depends(get_db_session),
+    cookie: SessionFrontend = Depends(lambda: di["cookie"]),
+    backend: SessionBackend = Depends(lambda: di["session_backend"]),
+    identity_ttl: float = Depends(lambda: di["session_config"].get("identity_ttl", 60)),
+) -> Optional[SessionData]:
+    """Session data with user_id/is_active, cached in the session and read
+    from the db again once older than identity_ttl seconds, so a deactivated
+    user loses access within that"""
+    if session_data is None:
+        return session_data
+    checked_at = session_data.checked_at
+    if (
+        session_data.user_id is not None
+        and checked_at is not None
+        and time() - checked_at < identity_ttl
+    ):
+        return session_data
+
+    if session_data.user_id is not None:
+        db_user = await crud_service.get_item_by_id(
+            db_session, User, session_data.user_id
+        )
+    else:
+        db_user = await crud_service.get_item_by_attrs(
+            db_session, User, email=session_data.username
+        )
+    if db_user is None:
+        session_data.is_active = False
+        return session_data
+    session_data.user_id = db_user.id
+    session_data.is_active = db_user.is_active
+    session_data.checked_at = time()
+    try:
+        await backend.update(cookie(request), session_data)
+    except (BackendError, HTTPException) as ex:
+        logger.warning(f"failed to cache identity in session: {ex}")
+    return session_data
+
+
+async def get_user_id_from_session_data(
+    session_data: SessionData = Depends(get_identity_from_session_data),
 ):
     try:
-        user_id = await crud_service.get_id_by_attr(
-            db_session, User, "email", session_data.username
-        )
+        user_id = session_data.user_id
     except AttributeError as ex:
         logger.error(ex)
         user_id = None
@@ -51,17 +89,10 @@ async def get_user_id_from_session_data(
 
 
 async def get_is_active_from_session_data(
-    session_data: SessionData = Depends(get_session_data),
-    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
-    db_session: AsyncSession = Depends(get_db_session),
+    session_data: SessionData = Depends(get_identity_from_session_data),
 ):
     try:
-        is_active = (
-            await crud_service.get_item_by_attrs(
-                db_session, User, email=session_data.username
-            )
-        ).is_active
-
+        is_active = session_data.is_active
     except AttributeError:
         is_active = None
     return is_active
@@ -69,72 +100,33 @@ async def get_is_active_from_session_data(
 
 @router.get("/a_history", response_model=List[AnimeSimple])
 async def get_a_history(
+    limit: Optional[int] = None,
+    cursor_time: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
     user_id: int = Depends(get_user_id_from_session_data),
     redirect_response=Depends(get_redirect_response),
     db_session: AsyncSession = Depends(get_db_session),
-    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
 ):
     if not user_id:
         return redirect_response
-    history = await crud_service.get_attr_of_item_by_id(
-        db_session, User, user_id, "history_animes", "history_animes"
-    )
-    history = sorted(history, key=lambda item: item.last_added, reverse=True)
-
-    animes = await crud_service.get_items_by_ids(
-        db_session, Anime, [h.anime_id for h in history]
-    )
-    anime_ids = [item.anime_id for item in history]
-    episodes = await crud_service.get_items_by_ids(
-        db_session, DBEpisode, [h.episode_id for h in history]
-    )
-    simple_animes = {anime.id: AnimeSimple.model_validate(anime) for anime in animes}
-    for episode, hist in zip(episodes, history):
-        anime_id = episode.anime_id
-        simple_animes[anime_id].last_read_episode = Episode.model_validate(episode)
-        simple_animes[anime_id].last_added = hist.last_added
-
-    return [simple_animes[anime_id] for anime_id in anime_ids]
+    return await get_anime_history(db_session, user_id, limit, cursor_time, cursor_id)
 
 
 @router.get("/history", response_model=List[MangaSimple])
 async def get_history(
     time_sort: bool = False,
+    limit: Optional[int] = None,
+    cursor_time: Optional[datetime] = None,
+    cursor_id: Optional[int] = None,
     user_id: int = Depends(get_user_id_from_session_data),
     redirect_response=Depends(get_redirect_response),
     db_session: AsyncSession = Depends(get_db_session),
-    crud_service: CRUDService = Depends(lambda: di[CRUDService]),
 ):
     if not user_id:
         return redirect_response
-    history = await crud_service.get_attr_of_item_by_id(
-        db_session, User, user_id, "history_mangas", "history_mangas"
-    )
-    history = sorted(history, key=lambda item: item.last_added, reverse=True)
-
-    mangas = await crud_service.get_items_by_ids(
-        db_session, Manga, [h.manga_id for h in history]
-    )
-    manga_ids = [item.manga_id for item in history]
-    chapters = await crud_service.get_items_by_ids(
-        db_session, DBChapter, [h.chapter_id for h in history]
+    return await get_manga_history(
+        db_session, user_id, time_sort, limit, cursor_time, cursor_id
     )
-    simple_mangas = {manga.id: MangaSimple.model_validate(manga) for manga in mangas}
-    for chapter, hist in zip(chapters, history):
-        manga_id = chapter.manga_id
-        simple_mangas[manga_id].last_read_chapter = Chapter.model_validate(chapter)
-        simple_mangas[manga_id].last_added = hist.last_added
-
-    logger.info("going to return")
-
-    if not time_sort:
-        return [simple_mangas[manga_id] for manga_id in manga_ids]
-    else:
-        return list(
-            sorted(
-                simple_mangas.values(), key=lambda item: item.last_update, reverse=True
-            )
-        )
 
 
 @router.get("/history-page", response_model=History)
@@ -466,3 +458,16 @@ async def admin_update(
     )
     chapters = await update_chapters(mangas, ss_factory, db_engine)
     return True
+
+
+@router.get(
+    "/admin-db-pool",
+)
+async def admin_db_pool(
+    is_active: bool = Depends(get_is_active_from_session_data),
+    redirect_response=Depends(get_redirect_response),
+    database_service: DatabaseService = Depends(get_database_service),
+):
+    if not is_active:
+        return redirect_response
+    return database_service.pool_status()
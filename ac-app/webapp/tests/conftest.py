@@ -1,18 +1,25 @@
 import asyncio
 import pytest
 
+from datetime import datetime, timedelta
 from httpx import AsyncClient
 from kink import di
 from logging import config as log_config
+from redis.asyncio import Redis
 from sqlalchemy import orm
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, AsyncEngine
 
 import main
 
 from boostrap import bootstrap_di
+from core.chapter_service import ChapterService
+from core.episode_service import EpisodeService
+from core.meta_service import MetaService
 from core.scraping_service import ScrapingServiceFactory
 from database import DatabaseService, CRUDService
+from database.models import Anime, Manga, MangaSite
 from download_service import DownloadService
+from tests.helpers import seed
 
 
 from boostrap import bootstrap_di
@@ -93,3 +100,146 @@ async def scraping_service_factory() -> ScrapingServiceFactory:
 @pytest.fixture
 async def download_service() -> DownloadService:
     return di[DownloadService]
+
+
+@pytest.fixture(scope="module")
+def redis_instance() -> Redis:
+    return Redis("default-redis")
+
+
+@pytest.fixture
+async def manga_id(database: DatabaseService) -> int:
+    db_site = MangaSite(name="manhuaren", url="https://www.manhuaren.com/")
+    db_manga = Manga(
+        name="test_manga", url="https://test-manga.com/", manga_site=db_site
+    )
+    await seed(database, db_manga)
+    return db_manga.id
+
+
+@pytest.fixture
+async def anime_id(database: DatabaseService) -> int:
+    db_site = MangaSite(name="anime1", url="https://anime1.me/")
+    db_anime = Anime(
+        name="test_anime",
+        url="?cat=975",
+        eps="",
+        year="",
+        season="",
+        sub="",
+        manga_site=db_site,
+    )
+    await seed(database, db_anime)
+    return db_anime.id
+
+
+@pytest.fixture
+def make_stale(database: DatabaseService, crud_service: CRUDService):
+    async def make_stale(model, item_id: int, last_scraped: str) -> None:
+        """Set last_scraped past the max_age of the service fixtures"""
+        async with database.session() as session:
+            async with session.begin():
+                await crud_service.update_object(
+                    session,
+                    model,
+                    item_id,
+                    auto_commit=False,
+                    **{last_scraped: datetime.now() - timedelta(seconds=61)},
+                )
+
+    return make_stale
+
+
+@pytest.fixture
+def chapter_service(
+    database: DatabaseService, crud_service: CRUDService, redis_instance: Redis
+) -> ChapterService:
+    return ChapterService(
+        redis_instance,
+        database,
+        crud_service,
+        max_age=60,
+        prefix="test_chapter_refresh",
+    )
+
+
+@pytest.fixture
+def meta_service(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    redis_instance: Redis,
+    tmp_path,
+) -> MetaService:
+    return MetaService(
+        redis_instance,
+        database,
+        crud_service,
+        download_path=str(tmp_path),
+        max_age=60,
+        prefix="test_meta_refresh",
+    )
+
+
+@pytest.fixture
+def episode_service(
+    database: DatabaseService, crud_service: CRUDService, redis_instance: Redis
+) -> EpisodeService:
+    return EpisodeService(
+        redis_instance,
+        database,
+        crud_service,
+        max_age=60,
+        prefix="test_episode_refresh",
+    )
+
+
+@pytest.fixture
+def get_chapters(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    chapter_service: ChapterService,
+    manga_id: int,
+):
+    async def get_chapters(scraping_service):
+        async with database.session() as session:
+            db_manga = await crud_service.get_item_by_id(session, Manga, manga_id)
+            return await chapter_service.get_chapters(
+                session, db_manga, scraping_service
+            )
+
+    return get_chapters
+
+
+@pytest.fixture
+def get_meta(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    meta_service: MetaService,
+    manga_id: int,
+):
+    async def get_meta(scraping_service, download_service):
+        async with database.session() as session:
+            db_manga = await crud_service.get_item_by_id(session, Manga, manga_id)
+            return await meta_service.get_meta(
+                session, db_manga, scraping_service, download_service
+            )
+
+    return get_meta
+
+
+@pytest.fixture
+def get_episode_titles(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    episode_service: EpisodeService,
+    anime_id: int,
+):
+    async def get_episode_titles(scraping_service) -> list[str]:
+        async with database.session() as session:
+            db_anime = await crud_service.get_item_by_id(session, Anime, anime_id)
+            episodes = await episode_service.get_episodes(
+                session, db_anime, scraping_service
+            )
+            return [ep.title for ep in episodes]
+
+    return get_episode_titles
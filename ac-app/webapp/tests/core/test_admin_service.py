@@ -12,10 +12,17 @@ from sqlalchemy import (
 )
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 
-from core.admin_service import update_meta, update_chapters, get_all_mangas_in_history
+from core.admin_service import (
+    get_all_mangas_in_history,
+    get_meta_for_manga,
+    update_chapters,
+    update_meta,
+)
+from core.models.mock import MOCK_META
 from core.models.manga_index_type_enum import MangaIndexTypeEnum
 from core.models.manga import MangaWithSite
 from core.scraping_service import ScrapingServiceFactory
+from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
 from database.database_service import DatabaseService
 from database.models import (
     MangaSite,
@@ -205,3 +212,29 @@ async def test_update_meta(
             assert meta.finished == db_meta["finished"]
             assert meta.thum_img == db_meta["thum_img"]
             assert meta.last_update == db_meta["last_update"]
+
+
+async def test_get_meta_for_manga_without_thum_img(download_path: str):
+    class NoThumImgScrapingService(MockMangaScrapingService):
+        async def get_meta(self, manga_url: str):
+            return MOCK_META.model_copy(update={"thum_img": None})
+
+    class FailingDownloadService:
+        async def download_img_if_modified(self, *args, **kwargs):
+            raise AssertionError("there is no thumbnail to download")
+
+    manga = MangaWithSite(
+        url="https://www.test-manga-site.com/manga/",
+        manga_site_name="manhuaren",
+        manga_name="no_thum_img",
+        id=1,
+    )
+    meta, thum_img = await get_meta_for_manga(
+        manga, NoThumImgScrapingService(), FailingDownloadService(), download_path
+    )
+
+    assert thum_img is None
+    assert meta.manga_id == 1
+    assert meta.thum_img is None
+    assert meta.last_update == MOCK_META.last_update
+    assert meta.latest_chapter == MOCK_META.latest_chapter
@@ -0,0 +1,42 @@
+import pytest
+
+from core.scraping_service.anime1_catalogue import AnimeCatalogue
+
+
+@pytest.fixture
+def catalogue() -> AnimeCatalogue:
+    return AnimeCatalogue(
+        [
+            [975, "ORIENT 東方少年", "1-12", "2022", "冬", ""],
+            [978, "東方", "1-12", "2022", "冬", ""],
+            [980, "東京喰種", "1-12", "2014", "夏", ""],
+            [981, "我的東方少年", "1-12", "2023", "春", ""],
+        ]
+    )
+
+
+def test_search_ranks_matches(catalogue: AnimeCatalogue):
+    animes = catalogue.search("東方")
+
+    assert [anime.url for anime in animes] == ["?cat=978", "?cat=981", "?cat=975"]
+    assert animes[0].name == "東方"
+    assert animes[0].year == "2022"
+
+
+def test_search_single_character(catalogue: AnimeCatalogue):
+    assert [anime.url for anime in catalogue.search("京")] == ["?cat=980"]
+
+
+def test_search_needs_the_whole_keyword(catalogue: AnimeCatalogue):
+    # each pair is in a name, but not the keyword
+    assert catalogue.search("東方喰") == []
+    assert catalogue.search("不存在") == []
+
+
+def test_search_ignores_case(catalogue: AnimeCatalogue):
+    assert [anime.url for anime in catalogue.search("orient")] == ["?cat=975"]
+
+
+def test_search_empty_keyword(catalogue: AnimeCatalogue):
+    assert len(catalogue.search("")) == len(catalogue) == 4
+    assert len(catalogue.search("", limit=2)) == 2
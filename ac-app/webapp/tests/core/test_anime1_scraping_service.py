@@ -1,6 +1,8 @@
+import asyncio
 import os
 import pytest
 
+from bs4 import BeautifulSoup
 from datetime import datetime
 from logging import getLogger
 from pathlib import Path
@@ -12,6 +14,10 @@ from core.models.manga_site_enum import MangaSiteEnum
 from core.scraping_service import Anime1ScrapingService, ScrapingServiceFactory
 from core.scraping_service.anime_site_scraping_service import AnimeSiteScrapingService
 
+ANIME_PAGES = ["https://anime1.me/?cat=975"] + [
+    f"https://anime1.me/category/975/page/{idx}" for idx in (2, 3)
+]
+
 
 logger = getLogger(__name__)
 
@@ -23,6 +29,120 @@ def scraping_service(
     return scraping_service_factory.get(MangaSiteEnum.Anime1)
 
 
+class PagesDownloadService:
+    """Serves ANIME_PAGES, two episodes a page, newest first"""
+
+    def __init__(self):
+        self.urls = []
+
+    async def get_soup(self, url: str, follow_redirects: bool = False):
+        self.urls.append(url)
+        idx = ANIME_PAGES.index(url)
+        articles = "".join(
+            f"""<article><h2 class="entry-title">ep {6 - 2 * idx - offset}</h2>
+            <time class="updated">2022-10-0{6 - 2 * idx - offset}</time>
+            <div class="vjscontainer"><video data-apireq="{idx}"></video></div>
+            </article>"""
+            for offset in range(2)
+        )
+        if idx + 1 < len(ANIME_PAGES):
+            articles += (
+                f'<div class="nav-previous"><a href="{ANIME_PAGES[idx + 1]}"></a></div>'
+            )
+        return BeautifulSoup(articles, "html.parser")
+
+
+@pytest.fixture
+def pages_scraping_service() -> Anime1ScrapingService:
+    return Anime1ScrapingService(PagesDownloadService())
+
+
+@pytest.fixture
+def anime() -> Anime:
+    return Anime(name="", eps="", year="", season="", sub="", url="?cat=975")
+
+
+async def test_get_index_page_caches_pages(
+    pages_scraping_service: Anime1ScrapingService, anime: Anime
+):
+    for _ in range(2):
+        eps = await pages_scraping_service.get_index_page(anime)
+        assert [ep.title for ep in eps] == [f"ep {idx}" for idx in range(6, 0, -1)]
+
+    # the second crawl fetches the pages found by the first one concurrently
+    urls = pages_scraping_service.download_service.urls
+    assert urls[:3] == ANIME_PAGES
+    assert sorted(urls[3:]) == sorted(ANIME_PAGES)
+
+
+async def test_get_index_page_stops_at_known_episode(
+    pages_scraping_service: Anime1ScrapingService, anime: Anime
+):
+    eps = await pages_scraping_service.get_index_page(anime, {"ep 4", "ep 3"})
+
+    assert [ep.title for ep in eps] == ["ep 6", "ep 5"]
+    assert pages_scraping_service.download_service.urls == ANIME_PAGES[:2]
+
+
+class CatalogueDownloadService:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_json(self, url: str):
+        self.calls += 1
+        return [[975 + self.calls, "東方少年", "1-12", "2022", "冬", ""]]
+
+
+async def test_search_anime_caches_catalogue():
+    download_service = CatalogueDownloadService()
+    scraping_service = Anime1ScrapingService(download_service)
+    for _ in range(2):
+        animes = await scraping_service.search_anime("東方")
+        assert [anime.url for anime in animes] == ["?cat=976"]
+    assert download_service.calls == 1
+
+    # a stale catalogue is served while it is downloaded again
+    scraping_service.catalogue_ttl = 0
+    animes = await scraping_service.search_anime("東方")
+    assert [anime.url for anime in animes] == ["?cat=976"]
+    await scraping_service._catalogue_task
+    scraping_service.catalogue_ttl = 3600
+    animes = await scraping_service.search_anime("東方")
+    assert [anime.url for anime in animes] == ["?cat=977"]
+    assert download_service.calls == 2
+
+
+async def test_failed_catalogue_refresh_backs_off():
+    class FailingDownloadService(CatalogueDownloadService):
+        fail = False
+
+        async def get_json(self, url: str):
+            if self.fail:
+                self.calls += 1
+                raise RuntimeError("catalogue is down")
+            return await super().get_json(url)
+
+    download_service = FailingDownloadService()
+    scraping_service = Anime1ScrapingService(download_service)
+    await scraping_service.search_anime("東方")
+
+    download_service.fail = True
+    scraping_service.catalogue_ttl = 0
+    for _ in range(3):
+        animes = await scraping_service.search_anime("東方")
+        assert [anime.url for anime in animes] == ["?cat=976"]
+        if scraping_service._catalogue_task is not None:
+            await asyncio.gather(
+                scraping_service._catalogue_task, return_exceptions=True
+            )
+    assert download_service.calls == 2
+
+    scraping_service.retry_after = 0
+    await scraping_service.search_anime("東方")
+    await asyncio.gather(scraping_service._catalogue_task, return_exceptions=True)
+    assert download_service.calls == 3
+
+
 @pytest.mark.parametrize(
     "search_text,name,url_ending", [("東方", "ORIENT 東方少年", "cat=978")]
 )
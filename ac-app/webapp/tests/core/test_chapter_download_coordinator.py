@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+
+from pathlib import Path
+from redis.asyncio import Redis
+
+from async_service import AsyncService
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.models.mock import MOCK_PAGES
+from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
+from database import CRUDService, DatabaseService
+from database.models import Chapter, Manga, Page
+from download_service import MockDownloadService
+from tests.helpers import seed
+
+
+class SlowDownloadService(MockDownloadService):
+    def __init__(self):
+        self.num_calls = 0
+
+    async def download_imgs(self, *args, **kwargs):
+        self.num_calls += 1
+        async for item in super().download_imgs(*args, **kwargs):
+            await asyncio.sleep(0.1)
+            yield item
+
+
+@pytest.fixture(scope="module")
+async def chapter(database: DatabaseService) -> Chapter:
+    db_manga = Manga(name="single_flight", url="https://single-flight.com/")
+    db_chapter = Chapter(
+        title="chap", page_url="https://single-flight.com/1/", manga=db_manga
+    )
+    await seed(database, db_chapter)
+    return db_chapter
+
+
+@pytest.fixture
+def coordinator(
+    database: DatabaseService, crud_service: CRUDService, redis_instance: Redis
+) -> ChapterDownloadCoordinator:
+    return ChapterDownloadCoordinator(
+        redis_instance, database, crud_service, prefix="test_single_flight"
+    )
+
+
+async def _collect(coordinator: ChapterDownloadCoordinator, chapter, download_service):
+    return [
+        page
+        async for page in coordinator.stream_pages(
+            chapter,
+            MockMangaScrapingService(),
+            download_service,
+            AsyncService(2, 0),
+            Path("/tmp/single_flight"),
+        )
+    ]
+
+
+async def test_concurrent_requests_download_once(
+    coordinator: ChapterDownloadCoordinator,
+    chapter: Chapter,
+    database: DatabaseService,
+    crud_service: CRUDService,
+):
+    download_service = SlowDownloadService()
+    first = asyncio.create_task(_collect(coordinator, chapter, download_service))
+    await asyncio.sleep(0.15)
+    second = asyncio.create_task(_collect(coordinator, chapter, download_service))
+    first_pages, second_pages = await asyncio.gather(first, second)
+
+    assert download_service.num_calls == 1
+    assert [page["pic_path"] for page in first_pages] == MOCK_PAGES
+    assert second_pages == first_pages
+
+    async with database.session() as session:
+        pages = await crud_service.get_items_by_same_attr(
+            session, Page, "chapter_id", chapter.id
+        )
+    assert len(pages) == len(MOCK_PAGES)
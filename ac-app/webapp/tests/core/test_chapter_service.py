@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+from core.chapter_service import ChapterService
+from core.models.chapter import Chapter as CoreChapter
+from core.models.manga_index_type_enum import MangaIndexTypeEnum
+from core.models.mock import MOCK_CHAPTER
+from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
+from database import CRUDService, DatabaseService
+from database.models import Manga
+from tests.helpers import GatedScrapingService
+
+
+async def test_get_chapters_scrapes_once(get_chapters):
+    scraping_service = GatedScrapingService()
+    for _ in range(2):
+        chapters = await get_chapters(scraping_service)
+        assert [c.page_url for c in chapters[MangaIndexTypeEnum.CHAPTER]] == [
+            str(MOCK_CHAPTER.page_url)
+        ]
+    assert scraping_service.calls == 1
+
+
+async def test_get_chapters_refreshes_stale_in_background(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    chapter_service: ChapterService,
+    manga_id: int,
+    get_chapters,
+    make_stale,
+):
+    scraping_service = GatedScrapingService()
+    await get_chapters(scraping_service)
+    await make_stale(Manga, manga_id, "chapters_last_scraped")
+
+    # served from the db while the refresh is held up, which all of them share
+    scraping_service.release.clear()
+    for _ in range(3):
+        chapters = await get_chapters(scraping_service)
+        assert len(chapters[MangaIndexTypeEnum.CHAPTER]) == 1
+    scraping_service.release.set()
+    await chapter_service.join()
+    assert scraping_service.calls == 2
+
+    async with database.session() as session:
+        db_manga = await crud_service.get_item_by_id(session, Manga, manga_id)
+    assert datetime.now() - db_manga.chapters_last_scraped < timedelta(seconds=60)
+
+
+async def test_load_chapters_skips_dropped_chapters(
+    chapter_service: ChapterService, manga_id: int, get_chapters
+):
+    dropped = CoreChapter(title="Dropped", page_url="https://test-manga.com/dropped")
+
+    class DroppingScrapingService(MockMangaScrapingService):
+        chapters = [dropped, MOCK_CHAPTER]
+
+        async def get_chapters(self, manga_url: str):
+            return {MangaIndexTypeEnum.CHAPTER: self.chapters}
+
+    scraping_service = DroppingScrapingService()
+    chapters = await get_chapters(scraping_service)
+    assert len(chapters[MangaIndexTypeEnum.CHAPTER]) == 2
+
+    scraping_service.chapters = [MOCK_CHAPTER]
+    await chapter_service.refresh(manga_id, "https://test-manga.com/", scraping_service)
+    chapters = await get_chapters(scraping_service)
+    assert [c.page_url for c in chapters[MangaIndexTypeEnum.CHAPTER]] == [
+        str(MOCK_CHAPTER.page_url)
+    ]
+
+
+async def test_failed_refresh_backs_off(
+    chapter_service: ChapterService, manga_id: int, get_chapters, make_stale
+):
+    await get_chapters(GatedScrapingService())
+
+    class FailingScrapingService(GatedScrapingService):
+        async def get_chapters(self, manga_url: str):
+            self.calls += 1
+            raise RuntimeError("site is down")
+
+    failing = FailingScrapingService()
+    for _ in range(3):
+        await make_stale(Manga, manga_id, "chapters_last_scraped")
+        chapters = await get_chapters(failing)
+        assert len(chapters[MangaIndexTypeEnum.CHAPTER]) == 1
+        await chapter_service.join()
+    assert failing.calls == 1
+
+    chapter_service.retry_after = 0
+    await get_chapters(failing)
+    await chapter_service.join()
+    assert failing.calls == 2
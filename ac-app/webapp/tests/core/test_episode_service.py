@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from core.episode_service import EpisodeService
+from core.models.episode import Episode
+from database.models import Anime
+
+
+class FakeAnimeScrapingService:
+    def __init__(self):
+        self.episodes = [
+            Episode(title=f"ep {idx}", last_update=datetime(2022, 10, idx), data="")
+            for idx in (2, 1)
+        ]
+        self.known_titles = []
+
+    async def get_index_page(self, anime, known_titles=()):
+        self.known_titles.append(set(known_titles))
+        eps = []
+        for ep in self.episodes:
+            if ep.title in known_titles:
+                break
+            eps.append(ep)
+        return eps
+
+
+async def test_get_episodes_crawls_new_pages_only(
+    episode_service: EpisodeService,
+    anime_id: int,
+    get_episode_titles,
+    make_stale,
+):
+    scraping_service = FakeAnimeScrapingService()
+    for _ in range(2):
+        assert await get_episode_titles(scraping_service) == ["ep 2", "ep 1"]
+    assert scraping_service.known_titles == [set()]
+
+    scraping_service.episodes.insert(
+        0, Episode(title="ep 3", last_update=datetime(2022, 10, 3), data="")
+    )
+    await make_stale(Anime, anime_id, "episodes_last_scraped")
+    # served from the db, then refreshed in the background
+    assert await get_episode_titles(scraping_service) == ["ep 2", "ep 1"]
+    await episode_service.join()
+
+    assert scraping_service.known_titles[-1] == {"ep 2", "ep 1"}
+    assert await get_episode_titles(scraping_service) == ["ep 3", "ep 2", "ep 1"]
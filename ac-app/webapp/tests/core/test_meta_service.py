@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from core.meta_service import MetaService
+from core.models.mock import MOCK_META
+from database import CRUDService, DatabaseService
+from database.models import Manga
+from download_service import MockDownloadService
+from tests.helpers import GatedScrapingService
+
+
+class CountingDownloadService(MockDownloadService):
+    def __init__(self):
+        self.headers = []
+
+    async def download_img_if_modified(self, url, download_path, filename, headers):
+        self.headers.append(headers)
+        return await super().download_img_if_modified(
+            url, download_path, filename, headers
+        )
+
+
+async def test_get_meta_scrapes_once(manga_id: int, get_meta):
+    scraping_service = GatedScrapingService()
+    download_service = CountingDownloadService()
+    for _ in range(2):
+        meta = await get_meta(scraping_service, download_service)
+        assert meta.manga_id == manga_id
+        assert meta.finished == MOCK_META.finished
+        assert meta.latest_chapter == MOCK_META.latest_chapter
+        assert str(meta.thum_img) == "test_pic.png"
+    assert scraping_service.calls == 1
+    assert download_service.headers == [{}]
+
+
+async def test_get_meta_refreshes_stale_in_background(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    meta_service: MetaService,
+    manga_id: int,
+    get_meta,
+    make_stale,
+):
+    scraping_service = GatedScrapingService()
+    download_service = CountingDownloadService()
+    await get_meta(scraping_service, download_service)
+    await make_stale(Manga, manga_id, "meta_last_scraped")
+
+    scraping_service.release.clear()
+    for _ in range(3):
+        await get_meta(scraping_service, download_service)
+    scraping_service.release.set()
+    await meta_service.join()
+    assert scraping_service.calls == 2
+
+    async with database.session() as session:
+        db_manga = await crud_service.get_item_by_id(session, Manga, manga_id)
+    assert datetime.now() - db_manga.meta_last_scraped < timedelta(seconds=60)
+
+
+async def test_refresh_revalidates_thum_img(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    meta_service: MetaService,
+    manga_id: int,
+    get_meta,
+    tmp_path,
+):
+    thum_img = tmp_path / "thum_img.png"
+    thum_img.write_bytes(b"png")
+    async with database.session() as session:
+        async with session.begin():
+            await crud_service.update_object(
+                session,
+                Manga,
+                manga_id,
+                auto_commit=False,
+                thum_img=str(thum_img),
+                thum_img_url=str(MOCK_META.thum_img),
+                thum_img_etag='"mock"',
+                meta_last_scraped=datetime.now() - timedelta(seconds=61),
+            )
+
+    download_service = CountingDownloadService()
+    await get_meta(GatedScrapingService(), download_service)
+    await meta_service.join()
+
+    # the mock answers a conditional request with not modified
+    assert download_service.headers == [{"If-None-Match": '"mock"'}]
+    async with database.session() as session:
+        db_manga = await crud_service.get_item_by_id(session, Manga, manga_id)
+    assert db_manga.thum_img == str(thum_img)
+    assert db_manga.thum_img_etag == '"mock"'
@@ -0,0 +1,127 @@
+import pytest
+
+from redis.asyncio import Redis
+
+from async_service import AsyncService
+from core.chapter_download_coordinator import ChapterDownloadCoordinator
+from core.models.manga_index_type_enum import MangaIndexTypeEnum
+from core.models.mock import MOCK_PAGES
+from core.prefetch_service import PrefetchService
+from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
+from database import CRUDService, DatabaseService
+from database.models import Chapter, Manga, MangaSite, Page
+from download_service import MockDownloadService
+from tests.helpers import seed
+
+
+class MockScrapingServiceFactory:
+    def get(self, site):
+        return MockMangaScrapingService()
+
+
+@pytest.fixture(scope="module")
+async def chapter_ids(database: DatabaseService) -> list[int]:
+    db_site = MangaSite(name="manhuaren", url="https://www.manhuaren.com/")
+    db_manga = Manga(
+        name="prefetch_manga", url="https://prefetch.com/", manga_site=db_site
+    )
+    db_chapters = [
+        Chapter(
+            title=f"chap_{idx}",
+            page_url=f"https://prefetch.com/{idx}/",
+            type=0,
+            manga=db_manga,
+        )
+        for idx in range(3)
+    ]
+    await seed(database, *db_chapters)
+    return [db_chapter.id for db_chapter in db_chapters]
+
+
+@pytest.fixture
+def prefetch_service(
+    database: DatabaseService, crud_service: CRUDService, redis_instance: Redis
+) -> PrefetchService:
+    return PrefetchService(
+        database,
+        crud_service,
+        ChapterDownloadCoordinator(
+            redis_instance, database, crud_service, prefix="test_prefetch"
+        ),
+        MockScrapingServiceFactory(),
+        MockDownloadService(),
+        AsyncService(2, 0),
+        "/tmp/prefetch",
+        num_workers=1,
+    )
+
+
+async def test_get_next_chapter_id_from_db_order(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    prefetch_service: PrefetchService,
+    chapter_ids: list[int],
+):
+    async with database.session() as session:
+        db_chapter = await crud_service.get_item_by_id(session, Chapter, chapter_ids[0])
+        assert (
+            await prefetch_service.get_next_chapter_id(session, db_chapter)
+            == chapter_ids[1]
+        )
+        db_chapter = await crud_service.get_item_by_id(
+            session, Chapter, chapter_ids[-1]
+        )
+        assert await prefetch_service.get_next_chapter_id(session, db_chapter) is None
+
+
+async def test_get_next_chapter_id_from_chapter_order(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    prefetch_service: PrefetchService,
+    chapter_ids: list[int],
+):
+    async with database.session() as session:
+        db_chapters = [
+            await crud_service.get_item_by_id(session, Chapter, chapter_id)
+            for chapter_id in reversed(chapter_ids)
+        ]
+        prefetch_service.set_chapter_order(
+            db_chapters[0].manga_id, {MangaIndexTypeEnum.CHAPTER: db_chapters}
+        )
+        assert (
+            await prefetch_service.get_next_chapter_id(session, db_chapters[0])
+            == chapter_ids[1]
+        )
+
+
+def test_chapter_orders_are_bounded(prefetch_service: PrefetchService):
+    prefetch_service.max_chapter_orders = 2
+    for manga_id in range(3):
+        prefetch_service.set_chapter_order(
+            manga_id, {MangaIndexTypeEnum.CHAPTER: [Chapter(id=manga_id)]}
+        )
+    assert list(prefetch_service._chapter_orders) == [1, 2]
+
+
+async def test_schedule_next_downloads_pages(
+    database: DatabaseService,
+    crud_service: CRUDService,
+    prefetch_service: PrefetchService,
+    chapter_ids: list[int],
+):
+    async with database.session() as session:
+        db_chapter = await crud_service.get_item_by_id(session, Chapter, chapter_ids[0])
+        assert (
+            await prefetch_service.schedule_next(session, db_chapter) == chapter_ids[1]
+        )
+    assert not prefetch_service.schedule(chapter_ids[1])
+
+    await prefetch_service.join()
+    await prefetch_service.close()
+    assert not prefetch_service.is_in_flight(chapter_ids[1])
+
+    async with database.session() as session:
+        pages = await crud_service.get_items_by_same_attr(
+            session, Page, "chapter_id", chapter_ids[1], "idx"
+        )
+    assert [page.pic_path for page in pages] == MOCK_PAGES
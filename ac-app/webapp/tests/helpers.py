@@ -0,0 +1,51 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from core.models.mock import MOCK_META
+from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
+from database import DatabaseService
+from database.models import (
+    AHistory,
+    Anime,
+    Chapter,
+    Episode,
+    History,
+    Manga,
+    MangaSite,
+    Page,
+)
+
+# children before the rows they reference
+SEEDED_MODELS = [AHistory, History, Episode, Page, Chapter, Manga, Anime, MangaSite]
+
+
+async def seed(database: DatabaseService, *objects) -> None:
+    """Empty the manga and anime tables, then add objects and commit"""
+    async with database.session() as session:
+        async with session.begin():
+            for model in SEEDED_MODELS:
+                await session.execute(delete(model))
+            session.add_all(objects)
+            await session.commit()
+
+
+class GatedScrapingService(MockMangaScrapingService):
+    """Count the scrapes of meta and chapters, which wait while release is
+    cleared"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def get_meta(self, manga_url: str):
+        self.calls += 1
+        await self.release.wait()
+        return MOCK_META
+
+    async def get_chapters(self, manga_url: str):
+        self.calls += 1
+        await self.release.wait()
+        return await super().get_chapters(manga_url)
@@ -17,6 +17,7 @@ from core.models.mock import (
     Manga as MangaPy,
     Chapter as ChapterPy,
 )
+from core.page_service import save_pages
 from core.scraping_service.mock_manga_scraping_service import MockMangaScrapingService
 from database import CRUDService
 from database import DatabaseService
@@ -33,7 +34,7 @@ from database.models import (
 )
 from download_service import MockDownloadService
 from main import app
-from routers.api import get_download_service, save_pages
+from routers.api import get_download_service
 from routers.db_utils import (
     get_manga_site_id,
     get_scraping_service_from_chapter,
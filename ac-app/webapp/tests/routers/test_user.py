@@ -5,6 +5,7 @@ from httpx import AsyncClient
 from logging import getLogger
 from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from time import time
 
 from core.models.anime import AnimeSimple
 from core.models.history import History
@@ -395,6 +396,40 @@ async def test_get_history(
     assert str(manga.last_read_chapter.page_url) == chapter_url
 
 
+async def test_get_history_keyset_page(history_path: str, client: AsyncClient):
+    resp = await client.get(history_path, params={"limit": 1})
+    mangas = [MangaSimple.model_validate(item) for item in resp.json()]
+    assert len(mangas) == 1
+
+    params = {
+        "limit": 1,
+        "cursor_time": mangas[-1].last_added.isoformat(),
+        "cursor_id": mangas[-1].id,
+    }
+    resp = await client.get(history_path, params=params)
+    assert resp.json() == []
+
+
+async def test_get_history_with_cached_identity(
+    history_path: str, client: AsyncClient, user_id: int, manga_name: str
+):
+    import main
+
+    async def get_cached_session_data() -> SessionData:
+        return SessionData(
+            username="not_in_db", user_id=user_id, is_active=True, checked_at=time()
+        )
+
+    fake_session_data = main.app.dependency_overrides[get_session_data]
+    main.app.dependency_overrides[get_session_data] = get_cached_session_data
+    try:
+        resp = await client.get(history_path)
+    finally:
+        main.app.dependency_overrides[get_session_data] = fake_session_data
+    manga = MangaSimple.model_validate(resp.json()[0])
+    assert manga.name == manga_name
+
+
 async def test_get_history_page(
     history_page_path: str, client: AsyncClient, manga_id: int, page_idx: int
 ):
@@ -458,3 +493,43 @@ async def test_del_history(
         db_session, User, user_id, "history_mangas"
     )
     assert len(history_mangas) == 0
+
+
+async def test_admin_db_pool(client: AsyncClient):
+    resp = await client.get("/user/admin-db-pool")
+    status = resp.json()
+    assert status["pool_class"] == "AsyncAdaptedQueuePool"
+    assert status["checked_out"] >= 1
+    assert "idle" in status
+    assert "overflow" in status
+
+
+async def test_deactivated_user_loses_access(
+    client: AsyncClient,
+    user_id: int,
+    crud_service: CRUDService,
+    database: DatabaseService,
+):
+    import main
+
+    async def set_is_active(is_active: bool):
+        async with database.session() as session:
+            async with session.begin():
+                await crud_service.update_object(
+                    session, User, user_id, auto_commit=False, is_active=is_active
+                )
+
+    async def get_stale_session_data() -> SessionData:
+        return SessionData(
+            username="test_user", user_id=user_id, is_active=True, checked_at=0
+        )
+
+    fake_session_data = main.app.dependency_overrides[get_session_data]
+    main.app.dependency_overrides[get_session_data] = get_stale_session_data
+    await set_is_active(False)
+    try:
+        resp = await client.get("/user/admin-db-pool", follow_redirects=False)
+    finally:
+        main.app.dependency_overrides[get_session_data] = fake_session_data
+        await set_is_active(True)
+    assert resp.is_redirect
@@ -0,0 +1,88 @@
+"""Login throughput, and latency of other requests while logins run.
+
+blocking verifies passwords with bcrypt on the event loop, the way the login
+route did. pooled goes through SecurityService, which verifies them on its
+thread pool and rejects logins past max_pending. Each run fires --logins
+concurrent logins while a cheap request is made every millisecond, and
+reports logins per second, how many were rejected, and the p50/p99 latency
+of the cheap requests. Database and session work are left out.
+
+    PYTHONPATH=.:../../core-repo python benchmarks/password_hashing.py --rounds 10
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import bcrypt
+
+from core.security_service import PasswordHasherBusy, SecurityService
+
+PASSWORD = "correct horse battery staple"
+
+
+class BlockingSecurityService(SecurityService):
+    """The pre pool service: bcrypt runs on the event loop"""
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return self.verify_password_sync(plain_password, hashed_password)
+
+
+async def cheap_requests(latencies: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        latencies.append(time.perf_counter() - start - 0.001)
+
+
+async def login(security_service: SecurityService, hashed_password: str) -> bool:
+    try:
+        return await security_service.verify_password(PASSWORD, hashed_password)
+    except PasswordHasherBusy:
+        return False
+
+
+async def _run(security_service: SecurityService, hashed: str, logins: int):
+    latencies, stop = [], asyncio.Event()
+    requests = asyncio.create_task(cheap_requests(latencies, stop))
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(login(security_service, hashed) for _ in range(logins))
+    )
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await requests
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    return sum(results), elapsed, statistics.median(latencies), p99
+
+
+async def main(rounds: int, logins: int, workers: int, max_pending: int) -> None:
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf8"), bcrypt.gensalt(rounds)).decode()
+    for name, service_cls in (
+        ("blocking", BlockingSecurityService),
+        ("pooled", SecurityService),
+    ):
+        security_service = service_cls(
+            "", "RS256", 10, rounds, max_workers=workers, max_pending=max_pending
+        )
+        ok, elapsed, p50, p99 = await _run(security_service, hashed, logins)
+        print(
+            f"{name:>8}: {ok / elapsed:.1f} logins/s rejected={logins - ok} "
+            f"request p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=16)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.logins, args.workers, args.max_pending))
@@ -4,7 +4,7 @@ import yaml
 from fastapi import HTTPException
 from fastapi_sessions.frontends.implementations import SessionCookie, CookieParameters
 from kink import di
-from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from sqlalchemy import orm
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from urllib.parse import urlparse
@@ -21,12 +21,12 @@ def _load_config_file() -> dict:
         return yaml.safe_load(f)
 
 
-def create_redis(url: str) -> Redis:
+def create_async_redis(url: str) -> AsyncRedis:
     parsed_url = urlparse(url)
     if parsed_url.hostname is None:
-        return Redis(url)
+        return AsyncRedis(url)
     else:
-        return Redis(
+        return AsyncRedis(
             host=parsed_url.hostname,
             port=parsed_url.port,
             password=parsed_url.password,
@@ -53,6 +53,9 @@ def bootstrap_di() -> None:
         private_key=di["private_key"],
         algorithm=di["algorithm"],
         access_token_expire_minutes=di["access_token_expire_minutes"],
+        bcrypt_rounds=di["security_service"].get("bcrypt_rounds", 15),
+        max_workers=di["security_service"].get("password_workers"),
+        max_pending=di["security_service"].get("password_max_pending"),
     )
     di.factories[AsyncEngine] = lambda di: create_async_engine(
         di[SecretService].get_secret("DB_URL"), echo=False
@@ -74,7 +77,9 @@ def bootstrap_di() -> None:
         crud_service=di[CRUDService], security_service=di[SecurityService]
     )
 
-    di[Redis] = lambda di: create_redis(di[SecretService].get_secret("REDIS_URL"))
+    di[AsyncRedis] = lambda di: create_async_redis(
+        di[SecretService].get_secret("REDIS_URL")
+    )
 
     di["identifier"] = "auth_app"
 
@@ -82,7 +87,7 @@ def bootstrap_di() -> None:
 
     di.factories[RedisBackend] = di.factories[
         "session_backend"
-    ] = lambda di: RedisBackend(redis=di[Redis], identifier=di["identifier"])
+    ] = lambda di: RedisBackend(redis=di[AsyncRedis], identifier=di["identifier"])
 
     di.factories["verifier"] = lambda di: BasicVerifier(
         identifier=di["identifier"],
@@ -1,5 +1,9 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 import bcrypt
 from jose import jwt
@@ -10,19 +14,46 @@ from logging import getLogger
 
 logger = getLogger(__name__)
 
+T = TypeVar("T")
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when max_pending password hashes are already queued or running"""
+
 
 class SecurityService:
+    """bcrypt runs on a pool of max_workers threads, it releases the GIL so
+    the event loop keeps serving other requests. At most max_pending hashes
+    are queued or running, more fail fast with PasswordHasherBusy."""
+
     def __init__(
         self,
         private_key: str,
         algorithm: str,
         access_token_expire_minutes: int,
+        bcrypt_rounds: int = 15,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
     ):
         self.secret_key = private_key
         self.algorithm = algorithm
         self.access_token_expire_minutes = access_token_expire_minutes
+        self.bcrypt_rounds = bcrypt_rounds
+        max_workers = max_workers or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self._pending = threading.BoundedSemaphore(max_pending or 4 * max_workers)
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        if not self._pending.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        future = self._executor.submit(func, *args)
+        # released when the hash is done, even if the request was cancelled
+        future.add_done_callback(lambda _: self._pending.release())
+        return await asyncio.wrap_future(future)
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    def verify_password_sync(self, plain_password: str, hashed_password: str) -> bool:
         try:
             return bcrypt.checkpw(
                 plain_password.encode("utf8"), hashed_password.encode("utf8")
@@ -30,10 +61,26 @@ class SecurityService:
         except ValueError:
             return False
 
-    def hash_password(self, password: str) -> str:
-        salt = bcrypt.gensalt(rounds=15)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(
+            self.verify_password_sync, plain_password, hashed_password
+        )
+
+    def hash_password_sync(self, password: str) -> str:
+        salt = bcrypt.gensalt(rounds=self.bcrypt_rounds)
         return bcrypt.hashpw(password.encode("utf8"), salt).decode("utf8")
 
+    async def hash_password(self, password: str) -> str:
+        return await self._run(self.hash_password_sync, password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Return True if hashed_password was hashed with other rounds than
+        bcrypt_rounds, hashes look like $2b$<rounds>$<salt and hash>"""
+        try:
+            return int(hashed_password.split("$")[2]) != self.bcrypt_rounds
+        except (IndexError, ValueError):
+            return False
+
     def create_access_token(
         self, data: dict, expires_delta: Optional[timedelta] = None
     ):
@@ -1,11 +1,14 @@
+from logging import getLogger
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import CRUDService
-from core.security_service import SecurityService
+from core.security_service import PasswordHasherBusy, SecurityService
 from core.models.user import UserInDB
 from database.models import User as DBUser
 
+logger = getLogger(__name__)
+
 
 class UserService:
     def __init__(self, crud_service: CRUDService, security_service: SecurityService):
@@ -36,11 +39,32 @@ class UserService:
     ) -> Optional[DBUser]:
         if await self.get_user(session, username):
             return None
-        hashed_password = self.security_service.hash_password(password)
+        hashed_password = await self.security_service.hash_password(password)
         db_user = await self.crud_service.create_obj(
             session, DBUser, email=username, hashed_password=hashed_password
         )
         return db_user
 
-    def authenticate_user(self, db_user: DBUser, password: str) -> bool:
-        return self.security_service.verify_password(password, db_user.hashed_password)
+    async def authenticate_user(
+        self, session: AsyncSession, db_user: UserInDB, password: str
+    ) -> bool:
+        """Verify password, rehashing it if it was hashed with other rounds"""
+        if not await self.security_service.verify_password(
+            password, db_user.hashed_password
+        ):
+            return False
+        if self.security_service.needs_rehash(db_user.hashed_password):
+            try:
+                hashed_password = await self.security_service.hash_password(password)
+            except PasswordHasherBusy:
+                # the next login rehashes it
+                return True
+            await self.crud_service.update_object(
+                session,
+                DBUser,
+                await self.get_user_id(session, db_user.email),
+                auto_commit=False,
+                hashed_password=hashed_password,
+            )
+            logger.info(f"rehashed password of {db_user.email}")
+        return True
@@ -2,13 +2,15 @@
 from contextlib import asynccontextmanager
 from logging import config
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from boostrap import bootstrap_di
 
 bootstrap_di()
 
+from core.security_service import PasswordHasherBusy
 from routers import main
 
 
@@ -18,6 +20,14 @@ async def lifespan(app: FastAPI):
     yield
 
 
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many logins in progress"},
+        headers={"Retry-After": "1"},
+    )
+
+
 def create_app() -> FastAPI:
     app = FastAPI(lifespan=lifespan)
 
@@ -30,6 +40,7 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_exception_handler(PasswordHasherBusy, password_hasher_busy_handler)
     app.mount("/css", StaticFiles(directory="/client/src/css/"), name="css")
     app.include_router(main.router, prefix="/user")
 
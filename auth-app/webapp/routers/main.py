@@ -134,7 +134,9 @@ async def login_for_access_token(
     db_user = None
     db_user = await user_service.get_user(session, username)
 
-    if not db_user or not user_service.authenticate_user(db_user, password):
+    if not db_user or not await user_service.authenticate_user(
+        session, db_user, password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
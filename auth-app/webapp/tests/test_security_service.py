@@ -1,3 +1,4 @@
+import asyncio
 import os
 import pytest
 
@@ -9,7 +10,7 @@ from logging import getLogger
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
-from core.security_service import SecurityService
+from core.security_service import PasswordHasherBusy, SecurityService
 from database import DatabaseService
 
 logger = getLogger(__name__)
@@ -50,14 +51,38 @@ async def session(db_service: DatabaseService) -> AsyncGenerator[AsyncSession, N
 
 
 async def test_verify_password(security_service: SecurityService, password: str):
-    hashed_password = security_service.hash_password(password)
-    hashed_password2 = security_service.hash_password(password)
-    assert security_service.verify_password(password, hashed_password)
-    assert security_service.verify_password(password, hashed_password2)
+    hashed_password = await security_service.hash_password(password)
+    hashed_password2 = await security_service.hash_password(password)
+    assert await security_service.verify_password(password, hashed_password)
+    assert await security_service.verify_password(password, hashed_password2)
 
 
 async def test_verify_password_failed(security_service: SecurityService, password: str):
-    assert not security_service.verify_password(password, "12345")
+    assert not await security_service.verify_password(password, "12345")
+
+
+async def test_hash_password_rounds(password: str):
+    security_service = SecurityService("", "RS256", 10, bcrypt_rounds=4)
+    hashed_password = await security_service.hash_password(password)
+
+    assert hashed_password.startswith("$2b$04$")
+    assert not security_service.needs_rehash(hashed_password)
+    assert SecurityService("", "RS256", 10, bcrypt_rounds=5).needs_rehash(
+        hashed_password
+    )
+    assert not security_service.needs_rehash("12345")
+
+
+async def test_hash_password_rejects_when_busy(password: str):
+    security_service = SecurityService(
+        "", "RS256", 10, bcrypt_rounds=4, max_workers=1, max_pending=1
+    )
+    first = asyncio.create_task(security_service.hash_password(password))
+    await asyncio.sleep(0)
+    with pytest.raises(PasswordHasherBusy):
+        await security_service.hash_password(password)
+
+    assert await security_service.verify_password(password, await first)
 
 
 async def test_create_access_token(
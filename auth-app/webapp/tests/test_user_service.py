@@ -81,7 +81,7 @@ async def test_create_user(
     username = "test_user2"
     db_user = await user_service.create_user(session, username, password)
     assert db_user.email == username
-    assert security_service.verify_password(password, db_user.hashed_password)
+    assert await security_service.verify_password(password, db_user.hashed_password)
 
 
 async def test_create_user_twice(
@@ -89,3 +89,26 @@ async def test_create_user_twice(
 ):
     db_user = await user_service.create_user(session, username, password)
     assert db_user is None
+
+
+async def test_authenticate_user_rehashes_password(
+    user_service: UserService,
+    security_service: SecurityService,
+    password: str,
+    session: AsyncSession,
+):
+    username = "test_user3"
+    old_hash = SecurityService("", "RS256", 10, bcrypt_rounds=4).hash_password_sync(
+        password
+    )
+    await user_service.crud_service.create_obj(
+        session, DBUser, email=username, hashed_password=old_hash
+    )
+    db_user = await user_service.get_user(session, username)
+
+    assert await user_service.authenticate_user(session, db_user, password)
+    new_hash = (await user_service.get_user(session, username)).hashed_password
+    assert new_hash != old_hash
+    assert not security_service.needs_rehash(new_hash)
+    assert await security_service.verify_password(password, new_hash)
+    assert not await user_service.authenticate_user(session, db_user, "wrong")
@@ -1,41 +1,113 @@
 import asyncio
 
-from itertools import islice
 from logging import getLogger
-from typing import Iterable, Coroutine, AsyncGenerator, TypeVar, Callable, Awaitable
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
 logger = getLogger(__name__)
 
 T = TypeVar("T")
 
 
-def partition(lst, size):
-    for i in range(0, len(lst), size):
-        yield list(islice(lst, i, i + size))
-
-
-def partition(lst, size):
-    for i in range(0, len(lst), size):
-        yield list(islice(lst, i, i + size))
-
-
 class AsyncService:
-    def __init__(self, num_workers: int, delay: float):
+    def __init__(self, num_workers: int, delay: float = 0, launch_interval: float = 0):
+        """num_workers items run at once, and launches are spaced by
+        launch_interval seconds. delay is ignored, as it always was, so configs
+        that set it do not start throttling"""
         self.num_workers = num_workers
         self.delay = delay
+        self.launch_interval = launch_interval
 
     async def work(
-        self, items: Iterable, async_func: Callable[..., Awaitable[T]], **kwargs
+        self,
+        items: Iterable,
+        async_func: Callable[..., Awaitable[T]],
+        ordered: bool = False,
+        retries: int = 0,
+        backoff: float = 0.5,
+        retry_on: Tuple[Type[Exception], ...] = (Exception,),
+        **kwargs,
     ) -> AsyncGenerator[T, None]:
-        semaphore = asyncio.Semaphore(self.num_workers)
-
-        async def sem_coro(coro: Coroutine):
-            async with semaphore:
-                result = await coro
-                return result
-
-        for part in partition(items, 10):
-            tasks = [async_func(**item, **kwargs) for item in part]
-            for item in asyncio.as_completed([sem_coro(c) for c in tasks]):
-                to_return = await item
-                yield to_return
+        """Run async_func(**item, **kwargs) for every item on a sliding window.
+
+        A new item starts as soon as one finishes. Results are yielded as they
+        complete, or in input order if ordered is set. Ordered results waiting
+        for an earlier item count against num_workers, so no more than
+        num_workers are buffered while a slow item holds up the rest. A failing
+        item is retried
+        with exponential backoff, and if it still fails the exception is raised
+        to the consumer. Items still running are cancelled when the consumer
+        stops iterating."""
+        loop = asyncio.get_running_loop()
+        item_iter = enumerate(items)
+        pending: Dict[asyncio.Task, int] = {}
+        finished: Dict[int, Any] = {}
+        next_idx = 0
+        launched = 0
+        next_launch = loop.time()
+        exhausted = False
+
+        async def run(item: Dict) -> T:
+            for attempt in range(retries + 1):
+                try:
+                    return await async_func(**item, **kwargs)
+                except retry_on as ex:
+                    if attempt == retries:
+                        raise
+                    logger.warning(f"retrying {item} after {ex=}")
+                    await asyncio.sleep(backoff * 2**attempt)
+
+        def has_room() -> bool:
+            if ordered:
+                # items running or finished but not yielded yet
+                return launched - next_idx < self.num_workers
+            return len(pending) < self.num_workers
+
+        try:
+            while True:
+                while not exhausted and has_room():
+                    if loop.time() < next_launch:
+                        break
+                    try:
+                        idx, item = next(item_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending[asyncio.create_task(run(item))] = idx
+                    launched += 1
+                    next_launch = loop.time() + self.launch_interval
+
+                can_launch = not exhausted and has_room()
+                if not pending:
+                    if exhausted:
+                        break
+                    await asyncio.sleep(next_launch - loop.time())
+                    continue
+
+                timeout = max(next_launch - loop.time(), 0) if can_launch else None
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in sorted(done, key=pending.get):
+                    idx = pending.pop(task)
+                    if ordered:
+                        finished[idx] = task.result()
+                    else:
+                        yield task.result()
+
+                while next_idx in finished:
+                    yield finished.pop(next_idx)
+                    next_idx += 1
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,165 @@
+import asyncio
+import pytest
+import time
+
+from async_service import AsyncService
+
+
+async def sleep_and_return(duration: float, idx: int) -> int:
+    await asyncio.sleep(duration)
+    return idx
+
+
+async def test_work_does_not_wait_for_slow_item():
+    async_service = AsyncService(2, 0)
+    items = [{"duration": 0.3, "idx": 0}] + [
+        {"duration": 0.01, "idx": idx} for idx in range(1, 11)
+    ]
+    start = time.perf_counter()
+    results = [result async for result in async_service.work(items, sleep_and_return)]
+
+    assert time.perf_counter() - start < 0.4
+    assert results[-1] == 0
+    assert sorted(results) == list(range(11))
+
+
+async def test_work_ordered():
+    async_service = AsyncService(4, 0)
+    items = [{"duration": 0.05 * (5 - idx), "idx": idx} for idx in range(5)]
+    results = [
+        result
+        async for result in async_service.work(items, sleep_and_return, ordered=True)
+    ]
+    assert results == list(range(5))
+
+
+async def test_work_ordered_bounds_buffer_behind_slow_item():
+    started = 0
+    max_buffered = 0
+
+    async def track(duration: float, idx: int) -> int:
+        nonlocal started
+        started += 1
+        await asyncio.sleep(duration)
+        return idx
+
+    async_service = AsyncService(3, 0)
+    items = [{"duration": 0.2, "idx": 0}] + [
+        {"duration": 0.01, "idx": idx} for idx in range(1, 20)
+    ]
+    results = []
+    async for result in async_service.work(items, track, ordered=True):
+        # started but not yielded yet, the slow first item included
+        max_buffered = max(max_buffered, started - len(results))
+        results.append(result)
+
+    assert results == list(range(20))
+    assert max_buffered == 3
+
+
+async def test_work_bounds_in_flight_items():
+    in_flight = 0
+    max_in_flight = 0
+
+    async def track(idx: int) -> int:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return idx
+
+    async_service = AsyncService(3, 0)
+    results = [
+        result
+        async for result in async_service.work(
+            [{"idx": idx} for idx in range(20)], track
+        )
+    ]
+    assert len(results) == 20
+    assert max_in_flight == 3
+
+
+async def test_work_retries_then_succeeds():
+    attempts = {}
+
+    async def flaky(idx: int) -> int:
+        attempts[idx] = attempts.get(idx, 0) + 1
+        if attempts[idx] < 3:
+            raise RuntimeError("flaky")
+        return idx
+
+    async_service = AsyncService(2, 0)
+    results = [
+        result
+        async for result in async_service.work(
+            [{"idx": 0}, {"idx": 1}], flaky, retries=2, backoff=0.01
+        )
+    ]
+    assert sorted(results) == [0, 1]
+    assert attempts == {0: 3, 1: 3}
+
+
+async def test_work_raises_when_retries_run_out():
+    async def fail(idx: int) -> int:
+        raise RuntimeError("failed")
+
+    async_service = AsyncService(2, 0)
+    with pytest.raises(RuntimeError):
+        async for _ in async_service.work([{"idx": 0}], fail, retries=1, backoff=0.01):
+            pass
+
+
+async def test_work_cancels_pending_items_when_consumer_stops():
+    cancelled = []
+
+    async def wait(idx: int) -> int:
+        try:
+            await asyncio.sleep(0 if idx == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled.append(idx)
+            raise
+        return idx
+
+    async_service = AsyncService(3, 0)
+    results = async_service.work([{"idx": idx} for idx in range(3)], wait)
+    async for result in results:
+        assert result == 0
+        break
+    await results.aclose()
+    assert sorted(cancelled) == [1, 2]
+
+
+async def test_work_spaces_launches_by_launch_interval():
+    launches = []
+
+    async def record(idx: int) -> int:
+        launches.append(time.perf_counter())
+        return idx
+
+    async_service = AsyncService(5, launch_interval=0.05)
+    results = [
+        result
+        async for result in async_service.work(
+            [{"idx": idx} for idx in range(4)], record
+        )
+    ]
+    assert len(results) == 4
+    gaps = [later - earlier for earlier, later in zip(launches, launches[1:])]
+    assert min(gaps) >= 0.045
+
+
+async def test_work_ignores_delay():
+    async def identity(idx: int) -> int:
+        return idx
+
+    async_service = AsyncService(4, 10)
+    start = time.perf_counter()
+    results = [
+        result
+        async for result in async_service.work(
+            [{"idx": idx} for idx in range(4)], identity
+        )
+    ]
+    assert sorted(results) == [0, 1, 2, 3]
+    assert time.perf_counter() - start < 1
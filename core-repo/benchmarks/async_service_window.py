@@ -0,0 +1,102 @@
+"""Wall time of AsyncService.work with a few slow items in the mix.
+
+Compares the old chunked implementation, which waits for every chunk of 10 to
+drain before starting the next, against the sliding window. Each item sleeps
+for a fixed latency, and every slow_every-th item takes slow_latency instead,
+the way one slow image holds up a chapter download.
+
+    PYTHONPATH=. python benchmarks/async_service_window.py
+"""
+
+import argparse
+import asyncio
+import time
+from itertools import islice
+from typing import AsyncGenerator, Awaitable, Callable, Coroutine, Iterable, TypeVar
+
+from async_service import AsyncService
+
+T = TypeVar("T")
+
+
+def partition(lst, size):
+    for i in range(0, len(lst), size):
+        yield list(islice(lst, i, i + size))
+
+
+class ChunkedAsyncService:
+    """The pre-sliding-window service: chunks of 10, delay ignored"""
+
+    def __init__(self, num_workers: int, delay: float):
+        self.num_workers = num_workers
+        self.delay = delay
+
+    async def work(
+        self, items: Iterable, async_func: Callable[..., Awaitable[T]], **kwargs
+    ) -> AsyncGenerator[T, None]:
+        semaphore = asyncio.Semaphore(self.num_workers)
+
+        async def sem_coro(coro: Coroutine):
+            async with semaphore:
+                return await coro
+
+        for part in partition(items, 10):
+            tasks = [async_func(**item, **kwargs) for item in part]
+            for item in asyncio.as_completed([sem_coro(c) for c in tasks]):
+                yield await item
+
+
+async def fetch(duration: float, idx: int) -> int:
+    await asyncio.sleep(duration)
+    return idx
+
+
+async def _run(service, items: list, **kwargs) -> tuple[float, float]:
+    start = time.perf_counter()
+    first = None
+    async for _ in service.work(items, fetch, **kwargs):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def main(
+    num_items: int,
+    num_workers: int,
+    latency: float,
+    slow_latency: float,
+    slow_every: int,
+) -> None:
+    items = [
+        {"duration": slow_latency if idx % slow_every == 0 else latency, "idx": idx}
+        for idx in range(num_items)
+    ]
+    for name, service, kwargs in (
+        ("chunked", ChunkedAsyncService(num_workers, 0), {}),
+        ("window", AsyncService(num_workers, 0), {}),
+        ("ordered", AsyncService(num_workers, 0), {"ordered": True}),
+    ):
+        first, elapsed = await _run(service, items, **kwargs)
+        print(
+            f"{name:>8}: first={first * 1000:.0f}ms total={elapsed * 1000:.0f}ms "
+            f"throughput={num_items / elapsed:.1f} items/s"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--slow-every", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            args.items,
+            args.workers,
+            args.latency,
+            args.slow_latency,
+            args.slow_every,
+        )
+    )
@@ -0,0 +1,97 @@
+"""Event loop stalls while FSStoreService stores and stats manga pages.
+
+Compares the old implementation, which writes and checksums on the event loop,
+against FSStoreService. Pages are persisted concurrently in 16 KiB chunks, the
+way a chapter download stores them, then stat_file is called on each. A ticker
+task measures the longest the loop went without running it.
+
+The old implementation hashes a file in stat_file, FSStoreService while it
+writes it, so persist alone is not comparable, compare the totals.
+
+    PYTHONPATH=. python benchmarks/fs_store.py
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator, Dict
+
+from store_service import FSStoreService
+from store_service.fs_store_service import md5sum
+
+CHUNK_SIZE = 16 * 1024
+
+
+class BlockingFSStoreService:
+    """The pre thread pool service: writes and md5 run on the loop"""
+
+    async def persist_file(self, path: str, async_iter: AsyncIterator[bytes]) -> str:
+        Path(path).parent.mkdir(exist_ok=True, parents=True)
+        with open(path, "wb") as f:
+            async for chunk in async_iter:
+                f.write(chunk)
+        return path
+
+    async def stat_file(self, path: str) -> Dict[str, str]:
+        last_modified = Path(path).lstat().st_mtime
+        with open(path, "rb") as f:
+            checksum = md5sum(f)
+        return {"last_modified": last_modified, "checksum": checksum}
+
+
+async def page(data: bytes) -> AsyncIterator[bytes]:
+    for idx in range(0, len(data), CHUNK_SIZE):
+        await asyncio.sleep(0)
+        yield data[idx : idx + CHUNK_SIZE]
+
+
+async def ticker(stalls: list, stop: asyncio.Event) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = time.perf_counter()
+        stalls.append(now - last)
+        last = now
+
+
+async def _run(service, root: str, num_pages: int, data: bytes) -> tuple:
+    stalls, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(stalls, stop))
+    paths = [os.path.join(root, f"{idx}.jpg") for idx in range(num_pages)]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.persist_file(p, page(data)) for p in paths))
+    persisted = time.perf_counter() - start
+    start = time.perf_counter()
+    await asyncio.gather(*(service.stat_file(p) for p in paths))
+    statted = time.perf_counter() - start
+
+    stop.set()
+    await tick
+    return persisted, statted, max(stalls)
+
+
+async def main(num_pages: int, page_size: int) -> None:
+    data = os.urandom(page_size)
+    for name, service in (
+        ("blocking", BlockingFSStoreService()),
+        ("pooled", FSStoreService()),
+    ):
+        with tempfile.TemporaryDirectory() as root:
+            persisted, statted, stall = await _run(service, root, num_pages, data)
+        print(
+            f"{name:>8}: persist={persisted * 1000:.0f}ms stat={statted * 1000:.0f}ms "
+            f"total={(persisted + statted) * 1000:.0f}ms "
+            f"max loop stall={stall * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=2 * 1024 * 1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.pages, args.page_size))
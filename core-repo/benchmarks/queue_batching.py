@@ -0,0 +1,96 @@
+"""Messages per second through RedisQueueService at batch sizes 1, 10 and 100.
+
+Batch size 1 uses add_message_to_queue / get_message_from_queue, one round
+trip per message. Larger batches use add_messages_to_queue and
+get_messages_from_queue. The codec section compares dataclasses_json
+to_json / from_json against queue_service.codec without Redis.
+
+    PYTHONPATH=. python benchmarks/queue_batching.py --host default-redis
+"""
+
+import argparse
+import time
+from redis import Redis
+
+from queue_service import RedisQueueService
+from queue_service.codec import decode_message, encode_message
+from queue_service.messages import EncryptMessage
+
+QUEUE_NAME = "benchmark_queue"
+
+
+def _message(idx: int) -> EncryptMessage:
+    return EncryptMessage(filename=f"file_{idx}.bin", username="benchmark@test.com")
+
+
+def _rate(count: int, elapsed: float) -> str:
+    return f"{count / elapsed:>10.0f} msg/s"
+
+
+def bench_codec(count: int) -> None:
+    messages = [_message(idx) for idx in range(count)]
+    for name, encode, decode in [
+        ("dataclasses_json", lambda m: m.to_json(), EncryptMessage.from_json),
+        ("codec", encode_message, lambda raw: decode_message(EncryptMessage, raw)),
+    ]:
+        start = time.perf_counter()
+        payloads = [encode(message) for message in messages]
+        encoded = time.perf_counter()
+        for payload in payloads:
+            decode(payload)
+        decoded = time.perf_counter()
+        print(
+            f"{name:>16}: encode {_rate(count, encoded - start)}, "
+            f"decode {_rate(count, decoded - encoded)}"
+        )
+
+
+def bench_queue(redis: Redis, count: int, batch_size: int) -> None:
+    queue_service = RedisQueueService(redis, EncryptMessage, timeout=1)
+    messages = [_message(idx) for idx in range(count)]
+    redis.delete(QUEUE_NAME)
+
+    start = time.perf_counter()
+    if batch_size == 1:
+        for message in messages:
+            queue_service.add_message_to_queue(QUEUE_NAME, message)
+    else:
+        for idx in range(0, count, batch_size):
+            queue_service.add_messages_to_queue(
+                QUEUE_NAME, messages[idx : idx + batch_size]
+            )
+    enqueued = time.perf_counter()
+
+    received = 0
+    while received < count:
+        if batch_size == 1:
+            received += queue_service.get_message_from_queue(QUEUE_NAME) is not None
+        else:
+            received += len(
+                queue_service.get_messages_from_queue(QUEUE_NAME, batch_size)
+            )
+    dequeued = time.perf_counter()
+
+    print(
+        f"batch {batch_size:>3}: enqueue {_rate(count, enqueued - start)}, "
+        f"dequeue {_rate(count, dequeued - enqueued)}"
+    )
+
+
+def main(host: str, port: int, count: int) -> None:
+    bench_codec(count)
+    redis = Redis(host, port)
+    try:
+        for batch_size in (1, 10, 100):
+            bench_queue(redis, count, batch_size)
+    finally:
+        redis.delete(QUEUE_NAME)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="default-redis")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--messages", type=int, default=10000)
+    args = parser.parse_args()
+    main(args.host, args.port, args.messages)
@@ -0,0 +1,91 @@
+"""Per-request latency of session reads under concurrent requests.
+
+Compares the blocking redis.Redis client (the old RedisBackend behaviour)
+against the redis.asyncio RedisBackend. Each simulated request does one
+session read plus a bit of awaited work, the way an authenticated
+endpoint does.
+
+    PYTHONPATH=. python benchmarks/redis_session_latency.py --host default-redis
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from uuid import uuid4
+
+from session import RedisBackend, SessionData
+
+IDENTIFIER = "benchmark_session"
+
+
+class SyncRedisBackend:
+    """The pre-asyncio backend: async signature, blocking client"""
+
+    def __init__(self, redis: Redis, identifier: str) -> None:
+        self.redis = redis
+        self.identifier = identifier
+
+    async def read(self, session_id):
+        data = self.redis.hget(self.identifier, str(session_id))
+        if data:
+            return SessionData(username=data.decode("utf8"))
+
+
+async def _request(backend, session_id, latencies: list[float]) -> None:
+    start = time.perf_counter()
+    await backend.read(session_id)
+    await asyncio.sleep(0.001)
+    latencies.append(time.perf_counter() - start)
+
+
+async def _run(backend, session_id, requests: int, concurrency: int) -> list[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded():
+        async with semaphore:
+            await _request(backend, session_id, latencies)
+
+    await asyncio.gather(*(bounded() for _ in range(requests)))
+    return latencies
+
+
+def _report(name: str, latencies: list[float], elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    mean = statistics.mean(latencies) * 1000
+    print(
+        f"{name:>6}: p50={p50:.2f}ms p99={p99:.2f}ms mean={mean:.2f}ms "
+        f"throughput={len(latencies) / elapsed:.0f} req/s"
+    )
+
+
+async def main(host: str, requests: int, concurrency: int) -> None:
+    async_redis = AsyncRedis(host=host, max_connections=concurrency)
+    session_id = uuid4()
+    backend = RedisBackend(async_redis, IDENTIFIER)
+    await backend.create(session_id, SessionData(username="benchmark"))
+
+    for name, backend in (
+        ("sync", SyncRedisBackend(Redis(host=host), IDENTIFIER)),
+        ("async", RedisBackend(async_redis, IDENTIFIER)),
+    ):
+        start = time.perf_counter()
+        latencies = await _run(backend, session_id, requests, concurrency)
+        _report(name, latencies, time.perf_counter() - start)
+
+    await async_redis.delete(IDENTIFIER)
+    await async_redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="default-redis")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.requests, args.concurrency))
@@ -56,6 +56,14 @@ class Manga(Base):
     last_update = Column(DateTime, index=True)
     finished = Column(Boolean)
     thum_img = Column(String, index=True)
+    chapters_last_scraped = Column(DateTime, nullable=True)
+    meta_last_scraped = Column(DateTime, nullable=True)
+    latest_chapter_title = Column(String, nullable=True)
+    latest_chapter_url = Column(String, nullable=True)
+    # source of thum_img and its validators, for conditional re-downloads
+    thum_img_url = Column(String, nullable=True)
+    thum_img_etag = Column(String, nullable=True)
+    thum_img_last_modified = Column(String, nullable=True)
     chapters = relationship("Chapter", back_populates="manga")
     manga_site_id = Column(Integer, ForeignKey("manga_sites.id"))
     manga_site = relationship("MangaSite", back_populates="mangas")
@@ -69,8 +77,10 @@ class Chapter(Base):
     title = Column(String, index=True)
     page_url = Column(String, index=True, unique=True)
     type = Column(Integer, index=True)
+    # position in the scraped list of its type
+    idx = Column(Integer, nullable=True)
 
-    manga_id = Column(Integer, ForeignKey("mangas.id"))
+    manga_id = Column(Integer, ForeignKey("mangas.id"), index=True)
     manga = relationship("Manga", back_populates="chapters")
     pages = relationship("Page", back_populates="chapter")
 
@@ -98,6 +108,7 @@ class Anime(Base):
     sub = Column(String)
     last_update = Column(DateTime, index=True)
     thum_img = Column(String, index=True)
+    episodes_last_scraped = Column(DateTime, nullable=True)
     episodes = relationship("Episode", back_populates="anime")
     manga_site_id = Column(Integer, ForeignKey("manga_sites.id"))
     manga_site = relationship("MangaSite", back_populates="animes")
@@ -116,7 +127,7 @@ class Episode(Base):
     data = Column(String, index=True)
     last_update = Column(DateTime, index=True)
 
-    anime_id = Column(Integer, ForeignKey("animes.id"))
+    anime_id = Column(Integer, ForeignKey("animes.id"), index=True)
     anime = relationship("Anime", back_populates="episodes")
 
     manual_key = Column(String, unique=True)
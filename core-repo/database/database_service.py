@@ -5,6 +5,7 @@ import logging
 from sqlalchemy import orm
 from sqlalchemy.ext.asyncio import AsyncEngine
 from sqlalchemy.orm import Session
+from typing import Dict, Union
 
 from database.models import Base
 
@@ -37,3 +38,20 @@ class DatabaseService:
 
     def new_session(self):
         return self._session_factory()
+
+    async def dispose(self) -> None:
+        await self._engine.dispose()
+
+    def pool_status(self) -> Dict[str, Union[str, int]]:
+        """Return checked-out/idle/overflow counts of the engine's connection pool"""
+        pool = self._engine.pool
+        status = {"pool_class": type(pool).__name__}
+        for key, attr_name in (
+            ("size", "size"),
+            ("checked_out", "checkedout"),
+            ("idle", "checkedin"),
+            ("overflow", "overflow"),
+        ):
+            if hasattr(pool, attr_name):
+                status[key] = getattr(pool, attr_name)()
+        return status
@@ -1 +1,2 @@
 from .download_service import DownloadService, MockDownloadService
+from .host_limiter import HostLimit, HostLimiter
@@ -1,19 +1,34 @@
+import asyncio
 import uuid
 
 
 from bs4 import BeautifulSoup
+from contextlib import asynccontextmanager
 from functools import wraps
-from httpx import AsyncClient, Limits, Timeout, Response
+from httpx import (
+    URL,
+    AsyncClient,
+    HTTPStatusError,
+    Limits,
+    Timeout,
+    TransportError,
+    Response,
+)
 from logging import getLogger
 from pathlib import Path
 from pydantic import HttpUrl
-from typing import Callable, Dict, Union, List
+from typing import AsyncGenerator, Callable, Dict, Optional, Union, List
 
 from store_service.store_service import StoreService
 from async_service import AsyncService
+from .host_limiter import HostLimiter, HostSlot, is_overload_status
 
 logger = getLogger(__name__)
 
+# videos smaller than this per segment are not worth splitting
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+SEGMENT_READ_SIZE = 1024 * 1024
+
 
 def request_resp(method: str = "GET"):
     def outter_wrapped(func: Callable) -> Callable:
@@ -28,20 +43,24 @@ def request_resp(method: str = "GET"):
             )
             data = kwargs.pop("data") if "data" in kwargs else {}
             json = kwargs.pop("json") if "json" in kwargs else {}
+            limit_key = kwargs.pop("limit_key", None)
 
             logger.info(
                 f"going to send a {method} request to {url} with data {data} and {headers=}"
             )
 
             client: AsyncClient = self.client
-            resp = await client.request(
-                method,
-                url,
-                headers=headers,
-                follow_redirects=follow_redirects,
-                data=data,
-                json=json,
-            )
+            async with self._host_slot(url, limit_key) as slot:
+                resp = await client.request(
+                    method,
+                    url,
+                    headers=headers,
+                    follow_redirects=follow_redirects,
+                    data=data,
+                    json=json,
+                )
+                if slot is not None:
+                    slot.record(resp.status_code)
 
             if resp.status_code == 200:
                 return await func(self, resp, **kwargs)
@@ -55,7 +74,9 @@ def request_resp(method: str = "GET"):
     return outter_wrapped
 
 
-def stream_resp(method: str = "GET"):
+def stream_resp(method: str = "GET", not_modified_ok: bool = False):
+    """not_modified_ok passes 304 responses to func too, for conditional requests"""
+
     def outter_wrapped(func: Callable) -> Callable:
         @wraps(func)
         async def wrapped(self, url: HttpUrl, *args, **kwargs):
@@ -68,19 +89,24 @@ def stream_resp(method: str = "GET"):
             data = kwargs.pop("data") if "data" in kwargs else {}
             if "headers" in kwargs:
                 headers.update(kwargs.pop("headers"))
+            limit_key = kwargs.pop("limit_key", None)
 
             logger.info(f"going to send a {method} request to {url}")
 
             client: AsyncClient = self.client
 
-            async with client.stream(
+            async with self._host_slot(url, limit_key) as slot, client.stream(
                 method,
                 url,
                 headers=headers,
                 follow_redirects=follow_redirects,
                 data=data,
             ) as resp:
-                if resp.status_code == 200:
+                if slot is not None:
+                    slot.record(resp.status_code)
+                if resp.status_code == 200 or (
+                    not_modified_ok and resp.status_code == 304
+                ):
                     return await func(self, resp, *args, **kwargs)
                 else:
                     raise RuntimeError(f"response status code: {resp.status_code}")
@@ -99,6 +125,7 @@ class DownloadService:
         max_keepalive_connections: int,
         headers: Dict[str, str],
         store_service: StoreService,
+        host_limiter: HostLimiter = None,
     ) -> None:
         limits = Limits(
             max_connections=max_connections,
@@ -109,6 +136,21 @@ class DownloadService:
 
         self.headers = headers
         self.store_service = store_service
+        self.host_limiter = host_limiter
+        # per video path, the lock of its .part file and the downloads using it
+        self._part_locks: Dict[str, asyncio.Lock] = {}
+        self._part_lock_users: Dict[str, int] = {}
+
+    @asynccontextmanager
+    async def _host_slot(
+        self, url: HttpUrl, limit_key: str = None
+    ) -> AsyncGenerator[Optional[HostSlot], None]:
+        """Hold a slot of the host limiter, keyed by limit_key or the url host"""
+        if self.host_limiter is None:
+            yield None
+            return
+        async with self.host_limiter.slot(limit_key or URL(str(url)).host) as slot:
+            yield slot
 
     @request_resp("POST")
     async def post_json(self, resp: Response) -> Union[List, Dict]:
@@ -163,9 +205,30 @@ class DownloadService:
     @stream_resp("GET")
     async def download_img(
         self, resp: Response, download_path: Path = None, filename: str = None, **kwargs
+    ) -> Dict:
+        return await self._store_img(resp, download_path, filename, **kwargs)
+
+    @stream_resp("GET", not_modified_ok=True)
+    async def download_img_if_modified(
+        self, resp: Response, download_path: Path = None, filename: str = None, **kwargs
+    ) -> Optional[Dict]:
+        """Download an image unless the If-None-Match/If-Modified-Since headers
+        passed get a 304, return None then. The result has the etag and
+        last_modified to pass as those headers next time"""
+        if resp.status_code == 304:
+            return None
+        result = await self._store_img(resp, download_path, filename, **kwargs)
+        result["etag"] = resp.headers.get("etag")
+        result["last_modified"] = resp.headers.get("last-modified")
+        return result
+
+    async def _store_img(
+        self, resp: Response, download_path: Path = None, filename: str = None, **kwargs
     ) -> Dict:
         content_type = resp.headers["content-type"]
-        if not content_type.startswith("image") and not content_type.endswith('octet-stream'):
+        if not content_type.startswith("image") and not content_type.endswith(
+            "octet-stream"
+        ):
             raise RuntimeError("Response is not an image")
 
         file_path = self.generate_file_path(content_type, download_path, filename)
@@ -174,29 +237,184 @@ class DownloadService:
             resp, str(file_path), "pic_path", **kwargs
         )
 
-    @stream_resp("GET")
-    async def _download_vid(self, resp: Response, file_path: str, **kwargs) -> Dict:
-        return await self._store_content_from_resp(
-            resp, file_path, "vid_path", **kwargs
+    async def _download_range(
+        self,
+        url: HttpUrl,
+        path: str,
+        start: int = 0,
+        end: int = None,
+        retries: int = 5,
+        backoff: float = 1.0,
+    ) -> None:
+        """Download bytes start to end (inclusive) of url into path.
+
+        Bytes already in path are kept and the rest is requested with a Range
+        header, so a dropped connection resumes where it stopped."""
+        expected = None if end is None else end - start + 1
+        for attempt in range(retries + 1):
+            offset = await self.store_service.file_size(path)
+            if expected is not None and offset > expected:
+                # left over from a different file, start again
+                offset = 0
+            elif expected is not None and offset == expected:
+                return
+            elif not self.store_service.can_append:
+                # the store only writes whole files, download it again
+                offset = 0
+            headers = dict(self.headers)
+            if start + offset > 0 or end is not None:
+                range_end = "" if end is None else end
+                headers["Range"] = f"bytes={start + offset}-{range_end}"
+            try:
+                async with self._host_slot(url) as slot, self.client.stream(
+                    "GET", url, headers=headers
+                ) as resp:
+                    if slot is not None:
+                        slot.record(resp.status_code)
+                    if resp.status_code not in (200, 206) or (
+                        resp.status_code == 200 and start > 0
+                    ):
+                        raise HTTPStatusError(
+                            f"response status code: {resp.status_code} for {url}",
+                            request=resp.request,
+                            response=resp,
+                        )
+                    if resp.status_code == 200:
+                        # the server ignored the Range header and sent it all
+                        offset = 0
+                    await self.store_service.persist_file(
+                        path, resp.aiter_bytes(), offset=offset
+                    )
+                if expected is None or (
+                    await self.store_service.file_size(path) >= expected
+                ):
+                    return
+                logger.warning(f"{url} ended early, resuming {path}")
+            except (TransportError, HTTPStatusError) as ex:
+                if isinstance(ex, HTTPStatusError) and not is_overload_status(
+                    ex.response.status_code
+                ):
+                    raise RuntimeError(str(ex)) from ex
+                if attempt == retries:
+                    raise
+                logger.warning(f"retrying {url} into {path} after {ex=}")
+            await asyncio.sleep(backoff * 2**attempt)
+        raise RuntimeError(f"failed to download {url} after {retries} retries")
+
+    async def _download_segments(
+        self, url: HttpUrl, path: str, total: int, num_segments: int, **kwargs
+    ) -> None:
+        """Download url in num_segments parallel ranges, then join them in path"""
+        size = -(-total // num_segments)
+        segments = [
+            (f"{path}.{idx}", start, min(start + size, total) - 1)
+            for idx, start in enumerate(range(0, total, size))
+        ]
+        await asyncio.gather(
+            *(
+                self._download_range(url, seg_path, start, end, **kwargs)
+                for seg_path, start, end in segments
+            )
         )
 
+        async def join_segments():
+            for seg_path, _, _ in segments:
+                offset = 0
+                while chunk := await self.store_service.read(
+                    seg_path, SEGMENT_READ_SIZE, offset
+                ):
+                    offset += len(chunk)
+                    yield chunk
+
+        await self.store_service.persist_file(path, join_segments(), is_large=True)
+        for seg_path, _, _ in segments:
+            await self.store_service.remove_file(seg_path)
+
+    @asynccontextmanager
+    async def _part_lock(self, path: str) -> AsyncGenerator[None, None]:
+        """Let one download at a time write the .part file of path"""
+        lock = self._part_locks.setdefault(path, asyncio.Lock())
+        self._part_lock_users[path] = self._part_lock_users.get(path, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._part_lock_users[path] -= 1
+            if not self._part_lock_users[path]:
+                del self._part_locks[path], self._part_lock_users[path]
+
     @request_resp("HEAD")
     async def download_vid(
-        self, resp: Response, download_path: Path = None, filename: str = None, **kwargs
+        self,
+        resp: Response,
+        download_path: Path = None,
+        filename: str = None,
+        num_segments: int = 1,
+        retries: int = 5,
+        backoff: float = 1.0,
+        **kwargs,
     ) -> Dict:
+        """Download a video into a .part file, resuming with Range requests on
+        failure, and move it into place once its length is verified"""
         content_type = resp.headers["content-type"]
         if not content_type.startswith("video"):
             raise RuntimeError("Response is not a video")
         logger.info(f"{content_type=}")
 
         file_path = self.generate_file_path(content_type, download_path, filename)
+        result = {"vid_path": str(file_path)}
+        result.update(kwargs)
 
         if await self.store_service.file_exists(file_path):
-            result = {"vid_path": str(file_path)}
-            result.update(kwargs)
             return result
 
-        return await self._download_vid(resp.url, file_path=str(file_path), **kwargs)
+        async with self._part_lock(str(file_path)):
+            # a download of the same video may have finished while waiting
+            if not await self.store_service.file_exists(file_path):
+                await self._download_part(
+                    resp, file_path, num_segments, retries, backoff
+                )
+        return result
+
+    async def _download_part(
+        self,
+        resp: Response,
+        file_path: Path,
+        num_segments: int,
+        retries: int,
+        backoff: float,
+    ) -> None:
+        total = int(resp.headers.get("content-length", 0)) or None
+        accepts_ranges = resp.headers.get("accept-ranges") == "bytes"
+        part_path = f"{file_path}.part"
+        if (
+            total is not None
+            and accepts_ranges
+            and num_segments > 1
+            and total >= num_segments * MIN_SEGMENT_SIZE
+        ):
+            await self._download_segments(
+                resp.url,
+                part_path,
+                total,
+                num_segments,
+                retries=retries,
+                backoff=backoff,
+            )
+        else:
+            await self._download_range(
+                resp.url,
+                part_path,
+                end=None if total is None else total - 1,
+                retries=retries,
+                backoff=backoff,
+            )
+
+        size = await self.store_service.file_size(part_path)
+        if total is not None and size != total:
+            raise RuntimeError(f"expected {total} bytes from {resp.url}, got {size}")
+
+        await self.store_service.rename_file(part_path, str(file_path))
 
     async def download_imgs(
         self,
@@ -204,10 +422,15 @@ class DownloadService:
         download_path: Path,
         img_list: List[Dict[str, int | str | None]],
         headers: Dict[str, str],
+        limit_key: str = None,
     ):
         """Download multiple images simultaneously"""
         async for item in async_service.work(
-            img_list, self.download_img, headers=headers, download_path=download_path
+            img_list,
+            self.download_img,
+            headers=headers,
+            download_path=download_path,
+            limit_key=limit_key,
         ):
             yield item
 
@@ -218,12 +441,20 @@ class MockDownloadService:
     ) -> Dict:
         return {"pic_path": "test_pic.png"}
 
+    async def download_img_if_modified(
+        self, url: HttpUrl, download_path: Path, filename: str, headers: Dict = None
+    ) -> Optional[Dict]:
+        if headers:
+            return None
+        return {"pic_path": "test_pic.png", "etag": '"mock"', "last_modified": None}
+
     async def download_imgs(
         self,
         async_service: AsyncService,
         download_path: Path,
         img_list: List[Dict[str, int | str | None]],
         headers: Dict[str, str],
+        limit_key: str = None,
     ):
         for item in img_list:
             yield {"pic_path": item["url"], "idx": item["idx"], "total": item["total"]}
@@ -0,0 +1,188 @@
+import asyncio
+import time
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields
+from logging import getLogger
+from typing import AsyncGenerator, Dict, Optional, Union
+
+logger = getLogger(__name__)
+
+
+def is_overload_status(status_code: Optional[int]) -> bool:
+    return status_code is not None and (status_code == 429 or status_code >= 500)
+
+
+@dataclass
+class HostLimit:
+    """
+    Attributes:
+        rate                 Requests per second the token bucket refills at.
+        burst                Size of the token bucket.
+        initial_concurrency  Requests allowed in flight before any feedback.
+        min_concurrency      Floor the concurrency limit is never cut below.
+        max_concurrency      Ceiling the concurrency limit never grows past.
+        latency_target       Seconds to response headers above which the host is
+                             considered overloaded.
+        decrease_factor      Multiplier applied to the limit on overload.
+    """
+
+    rate: float = 10.0
+    burst: int = 10
+    initial_concurrency: int = 4
+    min_concurrency: int = 1
+    max_concurrency: int = 16
+    latency_target: float = 2.0
+    decrease_factor: float = 0.5
+
+    def __post_init__(self):
+        if self.min_concurrency < 1:
+            # a limit of 0 would never let a waiter through again
+            raise ValueError(
+                f"min_concurrency must be at least 1, got {self.min_concurrency}"
+            )
+
+    @classmethod
+    def from_dict(cls, config: Dict, default: "HostLimit" = None) -> "HostLimit":
+        """Build from a config section, missing keys come from default"""
+        default = default or cls()
+        values = {f.name: getattr(default, f.name) for f in fields(cls)}
+        values.update({key: value for key, value in config.items() if key in values})
+        return cls(**values)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.last = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def drain(self) -> None:
+        """Empty the bucket so the next request waits for a full refill"""
+        self._refill()
+        self.tokens = 0
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit.
+
+    The limit grows by one for every limit's worth of fast successful requests
+    and is multiplied by decrease_factor on a slow or overloaded response. Cuts
+    are spaced by latency_target so a burst of failures only counts once."""
+
+    def __init__(self, host_limit: HostLimit):
+        self.host_limit = host_limit
+        self.limit = float(host_limit.initial_concurrency)
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._next_decrease = 0.0
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, overloaded: bool) -> None:
+        host_limit = self.host_limit
+        async with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded or latency > host_limit.latency_target:
+                if now >= self._next_decrease:
+                    self.limit = max(
+                        host_limit.min_concurrency,
+                        self.limit * host_limit.decrease_factor,
+                    )
+                    self._next_decrease = now + host_limit.latency_target
+            else:
+                self.limit = min(
+                    host_limit.max_concurrency, self.limit + 1 / self.limit
+                )
+            self._cond.notify_all()
+
+
+class HostSlot:
+    """Handed to the request while it holds a slot, to report the response"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.latency: Optional[float] = None
+        self.status_code: Optional[int] = None
+
+    def record(self, status_code: int) -> None:
+        self.latency = time.monotonic() - self.start
+        self.status_code = status_code
+
+
+class HostLimiter:
+    """Per-host rate limit and adaptive concurrency, shared by DownloadServices.
+
+    Limits are looked up by key, which is a scraping site name when the caller
+    passes one and the url host otherwise. Keys without a configured limit use
+    the default one, each with its own state."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Union[HostLimit, Dict]] = None,
+        default: Union[HostLimit, Dict] = None,
+    ):
+        if not isinstance(default, HostLimit):
+            default = HostLimit.from_dict(default or {})
+        self.default = default
+        self.limits = {
+            key: limit
+            if isinstance(limit, HostLimit)
+            else HostLimit.from_dict(limit, default)
+            for key, limit in (limits or {}).items()
+        }
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._concurrency: Dict[str, AdaptiveConcurrency] = {}
+
+    def _get_state(self, key: str):
+        if key not in self._concurrency:
+            host_limit = self.limits.get(key, self.default)
+            self._buckets[key] = TokenBucket(host_limit.rate, host_limit.burst)
+            self._concurrency[key] = AdaptiveConcurrency(host_limit)
+        return self._buckets[key], self._concurrency[key]
+
+    def get_limit(self, key: str) -> float:
+        """Current concurrency limit of a key"""
+        return self._get_state(key)[1].limit
+
+    @asynccontextmanager
+    async def slot(self, key: str) -> AsyncGenerator[HostSlot, None]:
+        bucket, concurrency = self._get_state(key)
+        await concurrency.acquire()
+        slot = None
+        overloaded = False
+        try:
+            await bucket.acquire()
+            slot = HostSlot()
+            yield slot
+        except Exception:
+            # a status we raised on is judged below, anything else is a
+            # transport failure
+            overloaded = slot is not None and slot.status_code is None
+            raise
+        finally:
+            if slot is not None and is_overload_status(slot.status_code):
+                overloaded = True
+                bucket.drain()
+            if overloaded:
+                logger.warning(f"{key} is overloaded, {slot.status_code=}")
+            latency = slot.latency if slot and slot.latency is not None else 0.0
+            await concurrency.release(latency, overloaded)
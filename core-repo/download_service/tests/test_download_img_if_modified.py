@@ -0,0 +1,57 @@
+from httpx import AsyncClient, MockTransport, Request, Response
+from pathlib import Path
+
+from download_service import DownloadService
+from store_service import FSStoreService
+
+IMG = b"\x89PNG" + bytes(range(256))
+IMG_URL = "https://example.com/thum_img.png"
+ETAG = '"v1"'
+LAST_MODIFIED = "Wed, 21 Oct 2015 07:28:00 GMT"
+
+
+class ImgServer:
+    def __init__(self):
+        self.requests = []
+
+    def handler(self, request: Request) -> Response:
+        self.requests.append(request)
+        if request.headers.get("if-none-match") == ETAG:
+            return Response(304, headers={"etag": ETAG})
+        headers = {
+            "content-type": "image/png",
+            "etag": ETAG,
+            "last-modified": LAST_MODIFIED,
+        }
+        return Response(200, headers=headers, content=IMG)
+
+
+def create_download_service(server: ImgServer) -> DownloadService:
+    download_service = DownloadService(5, 5, {}, FSStoreService())
+    download_service.client = AsyncClient(transport=MockTransport(server.handler))
+    return download_service
+
+
+async def test_download_img_if_modified(tmp_path: Path):
+    download_service = create_download_service(ImgServer())
+    result = await download_service.download_img_if_modified(
+        IMG_URL, download_path=tmp_path, filename="thum_img"
+    )
+
+    assert result["etag"] == ETAG
+    assert result["last_modified"] == LAST_MODIFIED
+    assert Path(result["pic_path"]).read_bytes() == IMG
+
+
+async def test_download_img_if_modified_not_modified(tmp_path: Path):
+    server = ImgServer()
+    result = await create_download_service(server).download_img_if_modified(
+        IMG_URL,
+        download_path=tmp_path,
+        filename="thum_img",
+        headers={"If-None-Match": ETAG},
+    )
+
+    assert result is None
+    assert server.requests[0].headers["if-none-match"] == ETAG
+    assert list(tmp_path.iterdir()) == []
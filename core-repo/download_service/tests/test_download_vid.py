@@ -0,0 +1,141 @@
+import asyncio
+import pytest
+
+from httpx import AsyncClient, MockTransport, ReadError, Request, Response
+from pathlib import Path
+
+from download_service import DownloadService
+from store_service import FSStoreService
+
+VIDEO = bytes(range(256)) * 400
+VIDEO_URL = "https://example.com/ep1.mp4"
+
+
+class VideoServer:
+    def __init__(self, fail_after: int = None, content_length: int = len(VIDEO)):
+        self.fail_after = fail_after
+        self.content_length = content_length
+        self.ranges = []
+
+    def handler(self, request: Request) -> Response:
+        headers = {"content-type": "video/mp4", "accept-ranges": "bytes"}
+        if request.method == "HEAD":
+            headers["content-length"] = str(self.content_length)
+            return Response(200, headers=headers)
+
+        range_header = request.headers.get("range")
+        self.ranges.append(range_header)
+        if range_header is None:
+            start, end, status_code = 0, len(VIDEO) - 1, 200
+        else:
+            start, end = range_header.removeprefix("bytes=").split("-")
+            start, end = int(start), int(end) if end else len(VIDEO) - 1
+            status_code = 206
+        body = VIDEO[start : end + 1]
+
+        if self.fail_after is not None:
+            fail_after, self.fail_after = self.fail_after, None
+
+            async def broken_stream():
+                yield body[:fail_after]
+                raise ReadError("connection reset")
+
+            return Response(status_code, headers=headers, content=broken_stream())
+        return Response(status_code, headers=headers, content=body)
+
+
+def create_download_service(server: VideoServer) -> DownloadService:
+    download_service = DownloadService(5, 5, {}, FSStoreService())
+    download_service.client = AsyncClient(transport=MockTransport(server.handler))
+    return download_service
+
+
+async def test_download_vid(tmp_path: Path):
+    server = VideoServer()
+    result = await create_download_service(server).download_vid(
+        VIDEO_URL, download_path=tmp_path, filename="ep1"
+    )
+
+    assert result == {"vid_path": str(tmp_path / "ep1.mp4")}
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    assert not (tmp_path / "ep1.mp4.part").exists()
+
+
+async def test_download_vid_resumes_after_disconnect(tmp_path: Path):
+    server = VideoServer(fail_after=1000)
+    await create_download_service(server).download_vid(
+        VIDEO_URL, download_path=tmp_path, filename="ep1", backoff=0
+    )
+
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    last = len(VIDEO) - 1
+    assert server.ranges == [f"bytes=0-{last}", f"bytes=1000-{last}"]
+
+
+async def test_download_vid_resumes_from_part_file(tmp_path: Path):
+    (tmp_path / "ep1.mp4.part").write_bytes(VIDEO[:5000])
+    server = VideoServer()
+    await create_download_service(server).download_vid(
+        VIDEO_URL, download_path=tmp_path, filename="ep1"
+    )
+
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    assert server.ranges == [f"bytes=5000-{len(VIDEO) - 1}"]
+
+
+async def test_download_vid_checks_content_length(tmp_path: Path):
+    server = VideoServer(content_length=len(VIDEO) + 10)
+    with pytest.raises(RuntimeError):
+        await create_download_service(server).download_vid(
+            VIDEO_URL, download_path=tmp_path, filename="ep1", retries=1, backoff=0
+        )
+
+    assert not (tmp_path / "ep1.mp4").exists()
+
+
+async def test_download_vid_in_segments(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("download_service.download_service.MIN_SEGMENT_SIZE", 1)
+    server = VideoServer()
+    await create_download_service(server).download_vid(
+        VIDEO_URL, download_path=tmp_path, filename="ep1", num_segments=4
+    )
+
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    assert len(server.ranges) == 4
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["ep1.mp4"]
+
+
+async def test_download_vid_same_path_concurrently(tmp_path: Path):
+    server = VideoServer()
+    download_service = create_download_service(server)
+    results = await asyncio.gather(
+        *(
+            download_service.download_vid(
+                VIDEO_URL, download_path=tmp_path, filename="ep1"
+            )
+            for _ in range(3)
+        )
+    )
+
+    assert all(result == {"vid_path": str(tmp_path / "ep1.mp4")} for result in results)
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    assert len(server.ranges) == 1
+    assert download_service._part_locks == {}
+
+
+class WholeFileStoreService(FSStoreService):
+    can_append = False
+
+
+async def test_download_vid_restarts_if_store_cannot_append(tmp_path: Path):
+    (tmp_path / "ep1.mp4.part").write_bytes(VIDEO[:5000])
+    server = VideoServer(fail_after=1000)
+    download_service = create_download_service(server)
+    download_service.store_service = WholeFileStoreService()
+    await download_service.download_vid(
+        VIDEO_URL, download_path=tmp_path, filename="ep1", backoff=0
+    )
+
+    assert (tmp_path / "ep1.mp4").read_bytes() == VIDEO
+    last = len(VIDEO) - 1
+    assert server.ranges == [f"bytes=0-{last}", f"bytes=0-{last}"]
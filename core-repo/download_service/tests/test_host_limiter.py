@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+import time
+
+from httpx import AsyncClient, MockTransport, Request, Response
+
+from download_service import DownloadService, HostLimit, HostLimiter
+from store_service import FSStoreService
+
+
+@pytest.fixture
+def host_limiter() -> HostLimiter:
+    return HostLimiter(
+        limits={"slow_site": {"rate": 20, "burst": 1, "initial_concurrency": 2}},
+        default={"rate": 1000, "burst": 1000, "latency_target": 0.05},
+    )
+
+
+def test_limits_fall_back_to_default(host_limiter: HostLimiter):
+    limit = host_limiter.limits["slow_site"]
+    assert limit.rate == 20
+    assert limit.latency_target == 0.05
+    assert host_limiter.default.rate == 1000
+    assert HostLimit.from_dict({"unknown": 1}) == HostLimit()
+
+
+async def test_token_bucket_spaces_requests(host_limiter: HostLimiter):
+    start = time.monotonic()
+    for _ in range(5):
+        async with host_limiter.slot("slow_site") as slot:
+            slot.record(200)
+    # one token up front, then one every 50ms
+    assert time.monotonic() - start >= 0.19
+
+
+async def test_concurrency_is_bounded():
+    host_limiter = HostLimiter(
+        default={"rate": 1000, "burst": 1000, "max_concurrency": 4}
+    )
+    in_flight = 0
+    max_in_flight = 0
+
+    async def request():
+        nonlocal in_flight, max_in_flight
+        async with host_limiter.slot("example.com") as slot:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            slot.record(200)
+
+    await asyncio.gather(*(request() for _ in range(20)))
+    assert max_in_flight == 4
+
+
+async def test_fast_responses_increase_limit(host_limiter: HostLimiter):
+    for _ in range(20):
+        async with host_limiter.slot("example.com") as slot:
+            slot.record(200)
+    assert host_limiter.get_limit("example.com") > 6
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+async def test_overload_halves_limit_once(host_limiter: HostLimiter, status_code):
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            async with host_limiter.slot("example.com") as slot:
+                slot.record(status_code)
+                raise RuntimeError(f"response status code: {status_code}")
+    # the cuts are spaced by latency_target, so the burst counts once
+    assert host_limiter.get_limit("example.com") == 2
+
+
+async def test_slow_responses_decrease_limit(host_limiter: HostLimiter):
+    async with host_limiter.slot("example.com") as slot:
+        await asyncio.sleep(0.06)
+        slot.record(200)
+    assert host_limiter.get_limit("example.com") == 2
+
+
+async def test_transport_error_decreases_limit(host_limiter: HostLimiter):
+    with pytest.raises(ConnectionError):
+        async with host_limiter.slot("example.com"):
+            raise ConnectionError()
+    assert host_limiter.get_limit("example.com") == 2
+
+
+async def test_limit_never_drops_below_min():
+    host_limiter = HostLimiter(default={"initial_concurrency": 1, "latency_target": 0})
+    for _ in range(3):
+        async with host_limiter.slot("example.com") as slot:
+            slot.record(500)
+    assert host_limiter.get_limit("example.com") == 1
+
+
+def test_min_concurrency_must_be_positive():
+    # a bad config fails when the limiter is built, not on the first request
+    with pytest.raises(ValueError):
+        HostLimiter(default={"min_concurrency": 0})
+    with pytest.raises(ValueError):
+        HostLimiter(limits={"example.com": {"min_concurrency": 0}})
+
+
+async def test_download_service_reports_to_limiter(host_limiter: HostLimiter):
+    def handler(request: Request) -> Response:
+        if request.url.path == "/busy":
+            return Response(429)
+        return Response(200, json={"ok": True})
+
+    download_service = DownloadService(5, 5, {}, FSStoreService(), host_limiter)
+    download_service.client = AsyncClient(transport=MockTransport(handler))
+
+    assert await download_service.get_json("https://example.com/") == {"ok": True}
+    assert host_limiter.get_limit("example.com") > 4
+
+    with pytest.raises(RuntimeError):
+        await download_service.get_json("https://cdn.com/busy", limit_key="slow_site")
+    assert host_limiter.get_limit("slow_site") == 1
+    assert host_limiter.get_limit("example.com") > 4
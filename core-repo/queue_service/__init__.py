@@ -1,2 +1,3 @@
 from .redis_queue_service import RedisQueueService
+from .async_redis_queue_service import AsyncRedisQueueService
 from .messages import EncryptMessage
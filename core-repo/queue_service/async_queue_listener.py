@@ -0,0 +1,177 @@
+import asyncio
+import time
+from abc import abstractmethod, ABCMeta
+from concurrent.futures import Executor
+from functools import partial
+from logging import getLogger
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from queue_service.iredis_queue_service import IAsyncRedisQueueService
+from queue_service.messages import Error, Message
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncQueueListener(metaclass=ABCMeta):
+    """Process messages of queue_name concurrently, up to max_concurrency at a
+    time.
+
+    As many messages as there are free slots are popped in one blocking call,
+    so the queue service should pop with a timeout for stop() to be noticed
+    on an empty queue. Finished messages are acked, and their results pushed
+    to out_queue_name, in batches of up to out_batch_size, at least every
+    flush_interval seconds. Messages whose processing raised are nacked. A
+    heartbeat is sent every heartbeat_interval seconds while listening, well
+    below the queue service's visibility_timeout, so messages held longer than
+    that, by slow processing or waiting for a free slot or an ack, are not
+    reclaimed by another worker.
+
+    CPU bound work should go through run_in_executor so it does not block the
+    other messages."""
+
+    def __init__(
+        self,
+        queue_service: IAsyncRedisQueueService,
+        queue_name: str,
+        out_queue_name: Optional[str] = None,
+        max_concurrency: int = 4,
+        executor: Optional[Executor] = None,
+        out_batch_size: int = 100,
+        flush_interval: float = 0.05,
+        reclaim_interval: float = 60,
+        heartbeat_interval: float = 60,
+    ):
+        self.queue_service = queue_service
+        self.queue_name = queue_name
+        self.out_queue_name = out_queue_name
+        self.max_concurrency = max_concurrency
+        self.executor = executor
+        self.out_batch_size = out_batch_size
+        self.flush_interval = flush_interval
+        self.reclaim_interval = reclaim_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self._stopped = False
+        self._done: List[Tuple[Message, Optional[Message]]] = []
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+        }
+
+    def stop(self):
+        """Stop popping messages, listen returns once the messages in flight
+        are processed and acked"""
+        self._stopped = True
+
+    async def run_in_executor(self, func: Callable[..., T], *args: Any) -> T:
+        """Run a blocking function in the executor, the loop's default one if
+        none was given"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args))
+
+    async def listen(self):
+        self._stopped = False
+        if recovered := await self.queue_service.recover_messages(self.queue_name):
+            logger.info(f"recovered {recovered} unacked messages")
+
+        slots = asyncio.Semaphore(self.max_concurrency)
+        tasks: Set[asyncio.Task] = set()
+        flusher = asyncio.create_task(self._flush_periodically())
+        heartbeat = asyncio.create_task(self._heartbeat_periodically())
+        next_reclaim = time.monotonic() + self.reclaim_interval
+        try:
+            while not self._stopped:
+                if time.monotonic() >= next_reclaim:
+                    next_reclaim = time.monotonic() + self.reclaim_interval
+                    await self._reclaim()
+
+                await slots.acquire()
+                free = 1
+                while free < self.max_concurrency and not slots.locked():
+                    await slots.acquire()
+                    free += 1
+                messages = await self.queue_service.get_messages_from_queue(
+                    self.queue_name, free
+                )
+                for _ in range(free - len(messages)):
+                    slots.release()
+                for message in messages:
+                    task = asyncio.create_task(self._handle(message, slots))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            await asyncio.gather(*tasks)
+        finally:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+            try:
+                await self._flush()
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _reclaim(self):
+        if reclaimed := await self.queue_service.reclaim_messages(self.queue_name):
+            logger.info(f"reclaimed {reclaimed} messages of dead workers")
+
+    async def _handle(self, message: Message, slots: asyncio.Semaphore):
+        self.in_flight += 1
+        try:
+            out_message = await self._process_message(message)
+        except Exception as ex:
+            self.failed += 1
+            logger.exception(f"failed to process {message.message_id}")
+            error = Error(message=f"{type(ex).__name__}: {ex}", retry=True)
+            try:
+                await self.queue_service.nack_message(self.queue_name, message, error)
+            except Exception:
+                logger.exception(f"failed to nack {message.message_id}")
+            return
+        finally:
+            self.in_flight -= 1
+            slots.release()
+
+        self.processed += 1
+        self._done.append((message, out_message))
+        if len(self._done) >= self.out_batch_size:
+            await self._flush()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._flush()
+            except Exception:
+                logger.exception("failed to ack processed messages")
+
+    async def _heartbeat_periodically(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.queue_service.heartbeat(self.queue_name)
+            except Exception:
+                logger.exception("failed to send a heartbeat")
+
+    async def _flush(self):
+        if not self._done:
+            return
+        done, self._done = self._done, []
+        out_messages = [out for _, out in done if out]
+        await self.queue_service.ack_messages(
+            self.queue_name,
+            [message for message, _ in done],
+            self.out_queue_name if out_messages else None,
+            out_messages,
+        )
+
+    @abstractmethod
+    async def _process_message(self, message: Message) -> Optional[Message]:
+        """Process a message, return the message to pass to out_queue_name"""
@@ -0,0 +1,219 @@
+import time
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+from typing import Dict, Generic, List, Optional, Type
+from queue_service.iredis_queue_service import IAsyncRedisQueueService
+from queue_service.codec import decode_message, encode_message
+from queue_service.messages import Error, MessageType
+from queue_service.queue_keys import (
+    consumers_key,
+    dead_letter_queue,
+    processing_list,
+)
+
+
+class AsyncRedisQueueService(IAsyncRedisQueueService, Generic[MessageType]):
+    """Async twin of RedisQueueService, see it for the at-least-once mode"""
+
+    def __init__(
+        self,
+        redis: Redis,
+        message_cls: Type[MessageType],
+        timeout: int = 10,
+        consumer: Optional[str] = None,
+        max_retries: int = 3,
+        visibility_timeout: float = 300,
+    ):
+        self.redis = redis
+        self.timeout = timeout
+        self.message_cls = message_cls
+        self.consumer = consumer
+        self.max_retries = max_retries
+        self.visibility_timeout = visibility_timeout
+        # raw payloads of the messages in the processing list, by message_id
+        self._in_flight: Dict = {}
+
+    async def add_message_to_queue(self, queue_name: str, message: MessageType) -> int:
+        """Add a message to queue"""
+        return await self.redis.rpush(queue_name, encode_message(message))
+
+    async def get_message_from_queue(self, queue_name: str) -> MessageType:
+        """Pop a message from queue"""
+        if self.consumer is None:
+            resp = await self.redis.blpop(queue_name, timeout=self.timeout)
+            return decode_message(self.message_cls, resp[1]) if resp else None
+
+        # the heartbeat rides along with the pop, one round trip in total
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(consumers_key(queue_name), {self.consumer: time.time()})
+        pipe.blmove(
+            queue_name,
+            processing_list(queue_name, self.consumer),
+            self.timeout,
+            "LEFT",
+            "RIGHT",
+        )
+        _, raw = await pipe.execute()
+        if raw is None:
+            return None
+        message = decode_message(self.message_cls, raw)
+        self._in_flight[message.message_id] = raw
+        return message
+
+    async def add_messages_to_queue(
+        self, queue_name: str, messages: List[MessageType]
+    ) -> int:
+        """Add messages to queue in one round trip"""
+        if not messages:
+            return await self.redis.llen(queue_name)
+        return await self.redis.rpush(
+            queue_name, *(encode_message(message) for message in messages)
+        )
+
+    async def get_messages_from_queue(
+        self, queue_name: str, count: int
+    ) -> List[MessageType]:
+        """Pop up to count messages from queue in one round trip, waiting up to
+        timeout for the first one"""
+        if self.consumer is None:
+            resp = await self.redis.blmpop(
+                self.timeout, 1, queue_name, direction="LEFT", count=count
+            )
+            if not resp:
+                return []
+            return [decode_message(self.message_cls, raw) for raw in resp[1]]
+
+        processing = processing_list(queue_name, self.consumer)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(consumers_key(queue_name), {self.consumer: time.time()})
+        pipe.blmove(queue_name, processing, self.timeout, "LEFT", "RIGHT")
+        for _ in range(count - 1):
+            pipe.lmove(queue_name, processing, "LEFT", "RIGHT")
+        _, *raws = await pipe.execute()
+        messages = []
+        for raw in raws:
+            if raw is None:
+                continue
+            message = decode_message(self.message_cls, raw)
+            self._in_flight[message.message_id] = raw
+            messages.append(message)
+        return messages
+
+    async def delete_message_from_queue(
+        self, queue_name: str, message: MessageType
+    ) -> int:
+        """Delete a message from queue"""
+        # the message may have been queued by a producer still using to_json
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem(queue_name, count=1, value=encode_message(message))
+        pipe.lrem(queue_name, count=1, value=message.to_json())
+        return sum(await pipe.execute())
+
+    async def ack_message(
+        self,
+        queue_name: str,
+        message: MessageType,
+        out_queue_name: Optional[str] = None,
+        out_message: Optional[MessageType] = None,
+    ) -> None:
+        """Mark a message done, and atomically pass out_message on to
+        out_queue_name if given"""
+        out_messages = [out_message or message] if out_queue_name else None
+        await self.ack_messages(queue_name, [message], out_queue_name, out_messages)
+
+    async def ack_messages(
+        self,
+        queue_name: str,
+        messages: List[MessageType],
+        out_queue_name: Optional[str] = None,
+        out_messages: Optional[List[MessageType]] = None,
+    ) -> None:
+        """Mark messages done, and atomically pass out_messages on to
+        out_queue_name if given, in one round trip"""
+        pipe = self.redis.pipeline()
+        for message in messages:
+            raw = self._in_flight.pop(message.message_id, None)
+            if self.consumer is not None and raw is not None:
+                pipe.lrem(processing_list(queue_name, self.consumer), 1, raw)
+        if out_queue_name is not None and out_messages:
+            pipe.rpush(
+                out_queue_name, *(encode_message(message) for message in out_messages)
+            )
+        await pipe.execute()
+
+    async def nack_message(
+        self, queue_name: str, message: MessageType, error: Optional[Error] = None
+    ) -> bool:
+        """Put a failed message back on the queue with its retry_count
+        increased, return False if it went to the dead letter queue instead"""
+        raw = self._in_flight.pop(message.message_id, None)
+        retry = self._prepare_retry(message, error)
+        pipe = self.redis.pipeline()
+        if self.consumer is not None and raw is not None:
+            pipe.lrem(processing_list(queue_name, self.consumer), 1, raw)
+        target = queue_name if retry else dead_letter_queue(queue_name)
+        pipe.rpush(target, encode_message(message))
+        await pipe.execute()
+        return retry
+
+    async def heartbeat(self, queue_name: str) -> None:
+        """Keep the consumer alive while a message takes long to process"""
+        if self.consumer is not None:
+            await self.redis.zadd(
+                consumers_key(queue_name), {self.consumer: time.time()}
+            )
+
+    async def reclaim_messages(self, queue_name: str) -> int:
+        """Put back the messages of consumers that stopped sending heartbeats,
+        return the number of messages reclaimed"""
+        cutoff = time.time() - self.visibility_timeout
+        stale = await self.redis.zrangebyscore(
+            consumers_key(queue_name), "-inf", cutoff
+        )
+        count = 0
+        for consumer in stale:
+            consumer = consumer.decode() if isinstance(consumer, bytes) else consumer
+            if consumer == self.consumer:
+                continue
+            count += await self._requeue_list(
+                queue_name, processing_list(queue_name, consumer)
+            )
+            await self.redis.zrem(consumers_key(queue_name), consumer)
+        return count
+
+    async def recover_messages(self, queue_name: str) -> int:
+        """Put back the messages this consumer left unacked when it last
+        stopped, call before the first pop"""
+        if self.consumer is None:
+            return 0
+        self._in_flight.clear()
+        return await self._requeue_list(
+            queue_name, processing_list(queue_name, self.consumer)
+        )
+
+    async def _requeue_list(self, queue_name: str, list_name: str) -> int:
+        count = 0
+        async with self.redis.pipeline() as pipe:
+            while True:
+                # see RedisQueueService._requeue_list
+                try:
+                    await pipe.watch(list_name)
+                    raw = await pipe.lindex(list_name, 0)
+                    if raw is None:
+                        return count
+                    message = decode_message(self.message_cls, raw)
+                    retry = self._prepare_retry(message, Error(message="reclaimed"))
+                    target = queue_name if retry else dead_letter_queue(queue_name)
+                    pipe.multi()
+                    pipe.lpop(list_name)
+                    pipe.rpush(target, encode_message(message))
+                    await pipe.execute()
+                    count += 1
+                except WatchError:
+                    continue
+
+    def _prepare_retry(self, message: MessageType, error: Optional[Error]) -> bool:
+        message.retry_count += 1
+        if error is not None:
+            message.error = error
+        return message.retry_count <= self.max_retries
@@ -0,0 +1,70 @@
+import json
+import uuid
+from dataclasses import fields
+from functools import lru_cache
+from typing import Dict, Tuple, Type, Union
+
+from queue_service.messages import Error, Message, MessageType
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - json is the fallback
+    orjson = None
+
+# bump when the payload changes shape, decoders reject newer versions
+CODEC_VERSION = 1
+VERSION_KEY = "_v"
+
+
+@lru_cache(maxsize=None)
+def _field_names(cls: Type) -> Tuple[str, ...]:
+    return tuple(f.name for f in fields(cls))
+
+
+def _dumps(data: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _loads(raw: Union[bytes, str]) -> Dict:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def encode_message(message: Message) -> bytes:
+    """Serialize a message, several times faster than to_json"""
+    data = {name: getattr(message, name) for name in _field_names(type(message))}
+    data[VERSION_KEY] = CODEC_VERSION
+    data["message_id"] = str(message.message_id)
+    error = message.error
+    if isinstance(error, Error):
+        data["error"] = {
+            "message": error.message,
+            "retry": error.retry,
+            "surface": error.surface,
+            "exception_type": error.exception_type,
+        }
+    return _dumps(data)
+
+
+def decode_message(
+    message_cls: Type[MessageType], raw: Union[bytes, str]
+) -> MessageType:
+    """Deserialize a message from encode_message, or from to_json of producers
+    that predate the codec. Fields the class does not know are dropped."""
+    data = _loads(raw)
+    version = data.pop(VERSION_KEY, 0)
+    if version > CODEC_VERSION:
+        raise ValueError(f"message codec version {version} is not supported")
+    names = _field_names(message_cls)
+    kwargs = {key: value for key, value in data.items() if key in names}
+    if "message_id" in kwargs:
+        kwargs["message_id"] = uuid.UUID(kwargs["message_id"])
+    if isinstance(kwargs.get("error"), dict):
+        error = kwargs["error"]
+        kwargs["error"] = Error(
+            **{key: value for key, value in error.items() if key in _field_names(Error)}
+        )
+    return message_cls(**kwargs)
@@ -1,5 +1,5 @@
-from typing import Protocol
-from queue_service.messages import Message
+from typing import List, Optional, Protocol
+from queue_service.messages import Error, Message
 
 
 class IRedisQueueService(Protocol):
@@ -9,5 +9,96 @@ class IRedisQueueService(Protocol):
     def get_message_from_queue(self, queue_name: str) -> Message:
         """Pop a message from queue"""
 
+    def add_messages_to_queue(self, queue_name: str, messages: List[Message]) -> int:
+        """Add messages to queue"""
+
+    def get_messages_from_queue(self, queue_name: str, count: int) -> List[Message]:
+        """Pop up to count messages from queue"""
+
     def delete_message_from_queue(self, queue_name: str, message: Message) -> int:
         """Delete a message from queue"""
+
+    def ack_message(
+        self,
+        queue_name: str,
+        message: Message,
+        out_queue_name: Optional[str] = None,
+        out_message: Optional[Message] = None,
+    ) -> None:
+        """Mark a message done and optionally pass a message on"""
+
+    def ack_messages(
+        self,
+        queue_name: str,
+        messages: List[Message],
+        out_queue_name: Optional[str] = None,
+        out_messages: Optional[List[Message]] = None,
+    ) -> None:
+        """Mark messages done and optionally pass messages on"""
+
+    def nack_message(
+        self, queue_name: str, message: Message, error: Optional[Error] = None
+    ) -> bool:
+        """Retry a failed message or send it to the dead letter queue"""
+
+    def heartbeat(self, queue_name: str) -> None:
+        """Keep the consumer alive"""
+
+    def reclaim_messages(self, queue_name: str) -> int:
+        """Put back the messages of dead consumers"""
+
+    def recover_messages(self, queue_name: str) -> int:
+        """Put back the messages this consumer left unacked"""
+
+
+class IAsyncRedisQueueService(Protocol):
+    async def add_message_to_queue(self, queue_name: str, message: Message) -> int:
+        """Add a message to queue"""
+
+    async def get_message_from_queue(self, queue_name: str) -> Message:
+        """Pop a message from queue"""
+
+    async def add_messages_to_queue(
+        self, queue_name: str, messages: List[Message]
+    ) -> int:
+        """Add messages to queue"""
+
+    async def get_messages_from_queue(
+        self, queue_name: str, count: int
+    ) -> List[Message]:
+        """Pop up to count messages from queue"""
+
+    async def delete_message_from_queue(self, queue_name: str, message: Message) -> int:
+        """Delete a message from queue"""
+
+    async def ack_message(
+        self,
+        queue_name: str,
+        message: Message,
+        out_queue_name: Optional[str] = None,
+        out_message: Optional[Message] = None,
+    ) -> None:
+        """Mark a message done and optionally pass a message on"""
+
+    async def ack_messages(
+        self,
+        queue_name: str,
+        messages: List[Message],
+        out_queue_name: Optional[str] = None,
+        out_messages: Optional[List[Message]] = None,
+    ) -> None:
+        """Mark messages done and optionally pass messages on"""
+
+    async def nack_message(
+        self, queue_name: str, message: Message, error: Optional[Error] = None
+    ) -> bool:
+        """Retry a failed message or send it to the dead letter queue"""
+
+    async def heartbeat(self, queue_name: str) -> None:
+        """Keep the consumer alive"""
+
+    async def reclaim_messages(self, queue_name: str) -> int:
+        """Put back the messages of dead consumers"""
+
+    async def recover_messages(self, queue_name: str) -> int:
+        """Put back the messages this consumer left unacked"""
@@ -2,7 +2,7 @@ from dataclasses import dataclass, field
 from dataclasses_json import DataClassJsonMixin
 import uuid
 from time import time
-from typing import Any, Generic, Optional, TypeVar, Union, Type
+from typing import Any, Generic, Optional, TypeVar, Union
 
 MessageType = TypeVar("MessageType", bound="Message")
 
@@ -15,12 +15,13 @@ class Error:
         message  A message describing the error.
         retry    Whether or not the broker should retry sending this message back to the worker the error came from.
         surface  Whether or not the broker should surface the error message.
+        exception_type  The name of the exception class raised, it crosses the queue as a str.
     """
 
     message: str
     retry: bool = False
     surface: bool = False
-    exception_type: Union[Type[Exception], None] = None
+    exception_type: Optional[str] = None
 
 
 @dataclass
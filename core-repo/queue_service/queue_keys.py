@@ -0,0 +1,13 @@
+def processing_list(queue_name: str, consumer: str) -> str:
+    """List holding the messages a consumer popped but did not ack yet"""
+    return f"{queue_name}:processing:{consumer}"
+
+
+def consumers_key(queue_name: str) -> str:
+    """Sorted set of the consumers of a queue, scored by their last heartbeat"""
+    return f"{queue_name}:consumers"
+
+
+def dead_letter_queue(queue_name: str) -> str:
+    """List of the messages that failed more than max_retries times"""
+    return f"{queue_name}:dead"
@@ -1,32 +1,104 @@
 from abc import abstractmethod, ABCMeta
+from contextlib import contextmanager
+from logging import getLogger
+import threading
 import time
 from typing import Union
 
 from queue_service.iredis_queue_service import IRedisQueueService
-from queue_service.messages import Message
+from queue_service.messages import Error, Message
+
+logger = getLogger(__name__)
 
 
 class QueueListener(metaclass=ABCMeta):
+    """Pop messages from queue_name, process them and pass the result on to
+    out_queue_name. The listener only sleeps when the queue was empty, so a
+    backlog is drained back to back.
+
+    A processed message is acked together with the push to out_queue_name, a
+    message whose processing raised is nacked, so with a queue service in
+    at-least-once mode nothing is lost when a worker dies. Messages of dead
+    workers are reclaimed every reclaim_interval seconds. While listening a
+    thread sends a heartbeat every heartbeat_interval seconds, which should be
+    well below the queue service's visibility_timeout, so a message taking
+    longer than that to process is not reclaimed by another worker."""
+
     def __init__(
         self,
         queue_service: IRedisQueueService,
         queue_name: str,
         out_queue_name: Union[str, None] = None,
         sleep_time: int = 1,
+        reclaim_interval: float = 60,
+        heartbeat_interval: float = 60,
     ):
         self.queue_name = queue_name
         self.queue_service = queue_service
         self.out_queue_name = out_queue_name
         self._sleep_time = sleep_time
+        self._reclaim_interval = reclaim_interval
+        self._heartbeat_interval = heartbeat_interval
+        self._stopped = False
+
+    def stop(self):
+        """Stop listening once the message in hand is processed, safe to call
+        from a signal handler"""
+        self._stopped = True
+
+    @contextmanager
+    def _heartbeat(self):
+        """Send heartbeats from a thread until the block exits"""
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self._heartbeat_interval):
+                try:
+                    self.queue_service.heartbeat(self.queue_name)
+                except Exception:
+                    logger.exception("failed to send a heartbeat")
+
+        thread = threading.Thread(target=beat, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
 
     def listen(self):
-        while True:
+        self._stopped = False
+        if recovered := self.queue_service.recover_messages(self.queue_name):
+            logger.info(f"recovered {recovered} unacked messages")
+        with self._heartbeat():
+            self._listen()
+
+    def _listen(self):
+        next_reclaim = time.monotonic() + self._reclaim_interval
+        while not self._stopped:
+            if time.monotonic() >= next_reclaim:
+                next_reclaim = time.monotonic() + self._reclaim_interval
+                if reclaimed := self.queue_service.reclaim_messages(self.queue_name):
+                    logger.info(f"reclaimed {reclaimed} messages of dead workers")
+
             message = self.queue_service.get_message_from_queue(self.queue_name)
-            if message:
-                message = self._process_message(message)
-            if self.out_queue_name and message:
-                self.queue_service.add_message_to_queue(self.out_queue_name, message)
-            time.sleep(self._sleep_time)
+            if not message:
+                if not self._stopped:
+                    time.sleep(self._sleep_time)
+                continue
+            try:
+                out_message = self._process_message(message)
+            except Exception as ex:
+                logger.exception(f"failed to process {message.message_id}")
+                error = Error(message=f"{type(ex).__name__}: {ex}", retry=True)
+                self.queue_service.nack_message(self.queue_name, message, error)
+                continue
+            self.queue_service.ack_message(
+                self.queue_name,
+                message,
+                self.out_queue_name if out_message else None,
+                out_message,
+            )
 
     @abstractmethod
     def _process_message(self, message: Message):
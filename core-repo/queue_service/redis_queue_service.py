@@ -1,31 +1,221 @@
+import time
 from redis import Redis
-from typing import Generic, Type
+from redis.exceptions import WatchError
+from typing import Dict, Generic, List, Optional, Type
 from queue_service.iredis_queue_service import IRedisQueueService
-from queue_service.messages import MessageType
+from queue_service.codec import decode_message, encode_message
+from queue_service.messages import Error, MessageType
+from queue_service.queue_keys import (
+    consumers_key,
+    dead_letter_queue,
+    processing_list,
+)
 
 
 class RedisQueueService(IRedisQueueService, Generic[MessageType]):
-    def __init__(self, redis: Redis, message_cls: Type[MessageType], timeout: int = 10):
+    """Redis lists as message queues.
+
+    Without a consumer name a popped message is gone, so it is lost if the
+    worker dies while processing it. With one, messages are delivered at least
+    once: a pop moves the message into the consumer's processing list and it
+    stays there until ack_message or nack_message. A consumer whose heartbeat
+    is older than visibility_timeout is considered dead and its messages are
+    put back by reclaim_messages. A message failing more than max_retries
+    times goes to the dead letter queue instead."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        message_cls: Type[MessageType],
+        timeout: int = 10,
+        consumer: Optional[str] = None,
+        max_retries: int = 3,
+        visibility_timeout: float = 300,
+    ):
         self.redis = redis
         self.timeout = timeout
         self.message_cls = message_cls
+        self.consumer = consumer
+        self.max_retries = max_retries
+        self.visibility_timeout = visibility_timeout
+        # raw payloads of the messages in the processing list, by message_id
+        self._in_flight: Dict = {}
 
     def add_message_to_queue(self, queue_name: str, message: MessageType) -> int:
         """Add a message to queue"""
-        return self.redis.rpush(queue_name, message.to_json())
+        return self.redis.rpush(queue_name, encode_message(message))
 
     def get_message_from_queue(self, queue_name: str) -> MessageType:
         """Pop a message from queue"""
-        resp = self.redis.blpop(queue_name, timeout=self.timeout)
+        if self.consumer is None:
+            resp = self.redis.blpop(queue_name, timeout=self.timeout)
+            return decode_message(self.message_cls, resp[1]) if resp else None
+
+        # the heartbeat rides along with the pop, one round trip in total
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(consumers_key(queue_name), {self.consumer: time.time()})
+        pipe.blmove(
+            queue_name,
+            processing_list(queue_name, self.consumer),
+            self.timeout,
+            "LEFT",
+            "RIGHT",
+        )
+        _, raw = pipe.execute()
+        if raw is None:
+            return None
+        message = decode_message(self.message_cls, raw)
+        self._in_flight[message.message_id] = raw
+        return message
 
-        if resp:
-            message = resp[1]
-            return self.message_cls.from_json(message)
-        return None
+    def add_messages_to_queue(
+        self, queue_name: str, messages: List[MessageType]
+    ) -> int:
+        """Add messages to queue in one round trip"""
+        if not messages:
+            return self.redis.llen(queue_name)
+        return self.redis.rpush(
+            queue_name, *(encode_message(message) for message in messages)
+        )
+
+    def get_messages_from_queue(self, queue_name: str, count: int) -> List[MessageType]:
+        """Pop up to count messages from queue in one round trip, waiting up to
+        timeout for the first one"""
+        if self.consumer is None:
+            resp = self.redis.blmpop(
+                self.timeout, 1, queue_name, direction="LEFT", count=count
+            )
+            if not resp:
+                return []
+            return [decode_message(self.message_cls, raw) for raw in resp[1]]
+
+        processing = processing_list(queue_name, self.consumer)
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zadd(consumers_key(queue_name), {self.consumer: time.time()})
+        pipe.blmove(queue_name, processing, self.timeout, "LEFT", "RIGHT")
+        for _ in range(count - 1):
+            pipe.lmove(queue_name, processing, "LEFT", "RIGHT")
+        _, *raws = pipe.execute()
+        messages = []
+        for raw in raws:
+            if raw is None:
+                continue
+            message = decode_message(self.message_cls, raw)
+            self._in_flight[message.message_id] = raw
+            messages.append(message)
+        return messages
 
     def delete_message_from_queue(self, queue_name: str, message: MessageType) -> int:
         """Delete a message from queue"""
-        no_of_ele_removed = self.redis.lrem(
-            queue_name, count=1, value=message.to_json()
+        # the message may have been queued by a producer still using to_json
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem(queue_name, count=1, value=encode_message(message))
+        pipe.lrem(queue_name, count=1, value=message.to_json())
+        return sum(pipe.execute())
+
+    def ack_message(
+        self,
+        queue_name: str,
+        message: MessageType,
+        out_queue_name: Optional[str] = None,
+        out_message: Optional[MessageType] = None,
+    ) -> None:
+        """Mark a message done, and atomically pass out_message on to
+        out_queue_name if given"""
+        out_messages = [out_message or message] if out_queue_name else None
+        self.ack_messages(queue_name, [message], out_queue_name, out_messages)
+
+    def ack_messages(
+        self,
+        queue_name: str,
+        messages: List[MessageType],
+        out_queue_name: Optional[str] = None,
+        out_messages: Optional[List[MessageType]] = None,
+    ) -> None:
+        """Mark messages done, and atomically pass out_messages on to
+        out_queue_name if given, in one round trip"""
+        pipe = self.redis.pipeline()
+        for message in messages:
+            raw = self._in_flight.pop(message.message_id, None)
+            if self.consumer is not None and raw is not None:
+                pipe.lrem(processing_list(queue_name, self.consumer), 1, raw)
+        if out_queue_name is not None and out_messages:
+            pipe.rpush(
+                out_queue_name, *(encode_message(message) for message in out_messages)
+            )
+        pipe.execute()
+
+    def nack_message(
+        self, queue_name: str, message: MessageType, error: Optional[Error] = None
+    ) -> bool:
+        """Put a failed message back on the queue with its retry_count
+        increased, return False if it went to the dead letter queue instead"""
+        raw = self._in_flight.pop(message.message_id, None)
+        retry = self._prepare_retry(message, error)
+        pipe = self.redis.pipeline()
+        if self.consumer is not None and raw is not None:
+            pipe.lrem(processing_list(queue_name, self.consumer), 1, raw)
+        target = queue_name if retry else dead_letter_queue(queue_name)
+        pipe.rpush(target, encode_message(message))
+        pipe.execute()
+        return retry
+
+    def heartbeat(self, queue_name: str) -> None:
+        """Keep the consumer alive while a message takes long to process"""
+        if self.consumer is not None:
+            self.redis.zadd(consumers_key(queue_name), {self.consumer: time.time()})
+
+    def reclaim_messages(self, queue_name: str) -> int:
+        """Put back the messages of consumers that stopped sending heartbeats,
+        return the number of messages reclaimed"""
+        cutoff = time.time() - self.visibility_timeout
+        stale = self.redis.zrangebyscore(consumers_key(queue_name), "-inf", cutoff)
+        count = 0
+        for consumer in stale:
+            consumer = consumer.decode() if isinstance(consumer, bytes) else consumer
+            if consumer == self.consumer:
+                continue
+            count += self._requeue_list(
+                queue_name, processing_list(queue_name, consumer)
+            )
+            self.redis.zrem(consumers_key(queue_name), consumer)
+        return count
+
+    def recover_messages(self, queue_name: str) -> int:
+        """Put back the messages this consumer left unacked when it last
+        stopped, call before the first pop"""
+        if self.consumer is None:
+            return 0
+        self._in_flight.clear()
+        return self._requeue_list(
+            queue_name, processing_list(queue_name, self.consumer)
         )
-        return no_of_ele_removed
+
+    def _requeue_list(self, queue_name: str, list_name: str) -> int:
+        count = 0
+        with self.redis.pipeline() as pipe:
+            while True:
+                # the move is a transaction on the watched list, so a crash
+                # cannot lose the message and concurrent reclaimers cannot
+                # requeue it twice
+                try:
+                    pipe.watch(list_name)
+                    raw = pipe.lindex(list_name, 0)
+                    if raw is None:
+                        return count
+                    message = decode_message(self.message_cls, raw)
+                    retry = self._prepare_retry(message, Error(message="reclaimed"))
+                    target = queue_name if retry else dead_letter_queue(queue_name)
+                    pipe.multi()
+                    pipe.lpop(list_name)
+                    pipe.rpush(target, encode_message(message))
+                    pipe.execute()
+                    count += 1
+                except WatchError:
+                    continue
+
+    def _prepare_retry(self, message: MessageType, error: Optional[Error]) -> bool:
+        message.retry_count += 1
+        if error is not None:
+            message.error = error
+        return message.retry_count <= self.max_retries
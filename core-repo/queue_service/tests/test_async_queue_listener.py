@@ -0,0 +1,160 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from queue_service.async_queue_listener import AsyncQueueListener
+from queue_service.messages import DefaultMessage, Message
+
+
+class FakeAsyncQueueService:
+    def __init__(self, messages, visibility_timeout: float = 300):
+        self.queue = deque(messages)
+        self.visibility_timeout = visibility_timeout
+        self.last_heartbeat = time.time()
+        self.in_flight = []
+        self.acked = []
+        self.out = []
+        self.ack_calls = 0
+        self.nacked = []
+
+    async def get_messages_from_queue(self, queue_name: str, count: int):
+        self.last_heartbeat = time.time()
+        if not self.queue:
+            await asyncio.sleep(0.01)
+            return []
+        messages = [self.queue.popleft() for _ in range(min(count, len(self.queue)))]
+        self.in_flight += messages
+        return messages
+
+    async def ack_messages(
+        self, queue_name, messages, out_queue_name=None, out_messages=None
+    ):
+        self.ack_calls += 1
+        self.acked += messages
+        self.in_flight = [m for m in self.in_flight if m not in messages]
+        if out_queue_name is not None:
+            self.out += out_messages
+
+    async def nack_message(self, queue_name, message, error=None):
+        self.nacked.append(message)
+        self.in_flight.remove(message)
+        return True
+
+    async def recover_messages(self, queue_name: str) -> int:
+        return 0
+
+    async def reclaim_messages(self, queue_name: str) -> int:
+        return 0
+
+    async def heartbeat(self, queue_name: str) -> None:
+        self.last_heartbeat = time.time()
+
+    def reclaim_as_other_worker(self) -> int:
+        """Requeue the messages in flight if the heartbeat is stale, the way
+        another worker's reclaim_messages does"""
+        if time.time() - self.last_heartbeat <= self.visibility_timeout:
+            return 0
+        reclaimed, self.in_flight = self.in_flight, []
+        self.queue.extend(reclaimed)
+        return len(reclaimed)
+
+
+class SleepingListener(AsyncQueueListener):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.peak = 0
+
+    async def _process_message(self, message: Message):
+        self.peak = max(self.peak, self.in_flight)
+        if message.retry_count < 0:
+            raise ValueError("bad message")
+        await asyncio.sleep(0.05)
+        return message
+
+
+async def run_until_drained(listener: AsyncQueueListener, queue_service):
+    task = asyncio.create_task(listener.listen())
+    while queue_service.queue or listener.in_flight:
+        await asyncio.sleep(0.01)
+    listener.stop()
+    await task
+
+
+async def test_messages_are_processed_concurrently():
+    messages = [DefaultMessage() for _ in range(20)]
+    queue_service = FakeAsyncQueueService(messages)
+    listener = SleepingListener(
+        queue_service=queue_service,
+        queue_name="in",
+        out_queue_name="out",
+        max_concurrency=5,
+        flush_interval=10,
+    )
+    start = time.monotonic()
+    await run_until_drained(listener, queue_service)
+
+    # 20 messages of 50ms, 5 at a time
+    assert time.monotonic() - start < 0.5
+    assert listener.peak == 5
+    assert sorted(map(id, queue_service.out)) == sorted(map(id, messages))
+    # acked in batches rather than one by one
+    assert queue_service.ack_calls < 5
+    assert listener.stats == {"in_flight": 0, "processed": 20, "failed": 0}
+
+
+async def test_failed_messages_are_nacked():
+    bad = DefaultMessage(retry_count=-1)
+    queue_service = FakeAsyncQueueService([DefaultMessage(), bad])
+    listener = SleepingListener(queue_service=queue_service, queue_name="in")
+    await run_until_drained(listener, queue_service)
+
+    assert queue_service.nacked == [bad]
+    assert listener.stats == {"in_flight": 0, "processed": 1, "failed": 1}
+
+
+async def test_run_in_executor():
+    class Listener(AsyncQueueListener):
+        async def _process_message(self, message: Message):
+            await self.run_in_executor(time.sleep, 0.05)
+
+    queue_service = FakeAsyncQueueService([DefaultMessage() for _ in range(8)])
+    with ThreadPoolExecutor(8) as executor:
+        listener = Listener(
+            queue_service=queue_service,
+            queue_name="in",
+            max_concurrency=8,
+            executor=executor,
+        )
+        start = time.monotonic()
+        await run_until_drained(listener, queue_service)
+
+    assert time.monotonic() - start < 0.3
+    assert listener.processed == 8
+
+
+async def test_heartbeat_keeps_slow_messages_from_being_reclaimed():
+    class SlowListener(AsyncQueueListener):
+        async def _process_message(self, message: Message):
+            await asyncio.sleep(0.3)
+            return message
+
+    messages = [DefaultMessage() for _ in range(2)]
+    queue_service = FakeAsyncQueueService(messages, visibility_timeout=0.1)
+    listener = SlowListener(
+        queue_service=queue_service,
+        queue_name="in",
+        max_concurrency=1,
+        heartbeat_interval=0.02,
+    )
+    task = asyncio.create_task(listener.listen())
+    # one message is processed while the other waits for the only slot
+    reclaimed = 0
+    while len(queue_service.acked) < 2:
+        await asyncio.sleep(0.05)
+        reclaimed += queue_service.reclaim_as_other_worker()
+    listener.stop()
+    await task
+
+    assert reclaimed == 0
+    assert queue_service.acked == messages
@@ -0,0 +1,221 @@
+import pytest
+from redis.asyncio import Redis
+
+from queue_service import AsyncRedisQueueService
+from queue_service.messages import Message, DefaultMessage
+from queue_service.queue_keys import (
+    consumers_key,
+    dead_letter_queue,
+    processing_list,
+)
+
+
+@pytest.fixture(scope="module")
+def timeout() -> int:
+    return 1
+
+
+@pytest.fixture(scope="module")
+def queue_name() -> str:
+    return "test_async_queue"
+
+
+@pytest.fixture(scope="module")
+def message() -> Message:
+    return DefaultMessage()
+
+
+@pytest.fixture(scope="module")
+def redis_instance() -> Redis:
+    return Redis("default-redis")
+
+
+@pytest.fixture(autouse=True, scope="module")
+async def run_before_and_after_tests(redis_instance: Redis, queue_name: str):
+    yield
+    await redis_instance.delete(queue_name)
+
+
+@pytest.fixture
+def redis_queue_service(redis_instance: Redis, timeout: int) -> AsyncRedisQueueService:
+    return AsyncRedisQueueService(redis_instance, DefaultMessage, timeout)
+
+
+async def test_add_message_to_queue(
+    queue_name: str,
+    message: Message,
+    redis_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    queue_length = await redis_instance.llen(queue_name)
+    new_queue_length = await redis_queue_service.add_message_to_queue(
+        queue_name, message
+    )
+    assert new_queue_length - queue_length == 1
+
+
+async def test_get_message_from_queue(
+    queue_name: str, redis_queue_service: AsyncRedisQueueService, redis_instance: Redis
+):
+    assert await redis_instance.llen(queue_name)
+    message = await redis_queue_service.get_message_from_queue(queue_name)
+    assert message
+    assert isinstance(message, Message)
+
+
+async def test_get_message_from_queue_when_no_message(
+    queue_name: str, redis_queue_service: AsyncRedisQueueService, redis_instance: Redis
+):
+    assert await redis_instance.llen(queue_name) == 0
+    message = await redis_queue_service.get_message_from_queue(queue_name)
+    assert message is None
+
+
+async def test_delete_message_from_queue(
+    queue_name: str, redis_queue_service: AsyncRedisQueueService, redis_instance: Redis
+):
+    messages = [DefaultMessage() for _ in range(10)]
+    for message in messages:
+        await redis_instance.rpush(queue_name, message.to_json())
+
+    assert await redis_instance.llen(queue_name) == 10
+
+    no_of_ele_removed = await redis_queue_service.delete_message_from_queue(
+        queue_name, messages[5]
+    )
+    assert no_of_ele_removed == 1
+
+
+@pytest.fixture
+def reliable_queue_name() -> str:
+    return "test_async_reliable_queue"
+
+
+@pytest.fixture
+async def reliable_queue_service(
+    redis_instance: Redis, reliable_queue_name: str
+) -> AsyncRedisQueueService:
+    await redis_instance.delete(
+        reliable_queue_name,
+        processing_list(reliable_queue_name, "worker"),
+        processing_list(reliable_queue_name, "dead-worker"),
+        consumers_key(reliable_queue_name),
+        dead_letter_queue(reliable_queue_name),
+    )
+    return AsyncRedisQueueService(
+        redis_instance, DefaultMessage, 1, consumer="worker", max_retries=1
+    )
+
+
+async def test_reliable_pop_keeps_message_until_ack(
+    reliable_queue_name: str,
+    reliable_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    processing = processing_list(reliable_queue_name, "worker")
+    message = DefaultMessage()
+    await reliable_queue_service.add_message_to_queue(reliable_queue_name, message)
+
+    popped = await reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert popped.message_id == message.message_id
+    assert await redis_instance.llen(processing) == 1
+    assert await redis_instance.zscore(consumers_key(reliable_queue_name), "worker")
+
+    await reliable_queue_service.ack_message(
+        reliable_queue_name, popped, "test_out_queue", DefaultMessage()
+    )
+    assert await redis_instance.llen(processing) == 0
+    assert await redis_instance.lpop("test_out_queue")
+
+
+async def test_nack_retries_then_dead_letters(
+    reliable_queue_name: str,
+    reliable_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    await reliable_queue_service.add_message_to_queue(
+        reliable_queue_name, DefaultMessage()
+    )
+
+    message = await reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert await reliable_queue_service.nack_message(reliable_queue_name, message)
+    message = await reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert message.retry_count == 1
+    assert not await reliable_queue_service.nack_message(reliable_queue_name, message)
+
+    assert await redis_instance.llen(reliable_queue_name) == 0
+    assert (
+        await redis_instance.llen(processing_list(reliable_queue_name, "worker")) == 0
+    )
+    assert await redis_instance.llen(dead_letter_queue(reliable_queue_name)) == 1
+
+
+async def test_reclaim_messages_of_dead_consumer(
+    reliable_queue_name: str,
+    reliable_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    dead_worker = AsyncRedisQueueService(
+        redis_instance, DefaultMessage, 1, consumer="dead-worker"
+    )
+    await dead_worker.add_message_to_queue(reliable_queue_name, DefaultMessage())
+    assert await dead_worker.get_message_from_queue(reliable_queue_name)
+    await redis_instance.zadd(consumers_key(reliable_queue_name), {"dead-worker": 0})
+
+    assert await reliable_queue_service.reclaim_messages(reliable_queue_name) == 1
+    message = await reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert message.retry_count == 1
+    assert (
+        await redis_instance.zscore(consumers_key(reliable_queue_name), "dead-worker")
+        is None
+    )
+
+
+async def test_recover_messages(
+    reliable_queue_name: str,
+    reliable_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    await reliable_queue_service.add_message_to_queue(
+        reliable_queue_name, DefaultMessage()
+    )
+    assert await reliable_queue_service.get_message_from_queue(reliable_queue_name)
+
+    # a restarted worker of the same name
+    restarted = AsyncRedisQueueService(
+        redis_instance, DefaultMessage, 1, consumer="worker"
+    )
+    assert await restarted.recover_messages(reliable_queue_name) == 1
+    assert await redis_instance.llen(reliable_queue_name) == 1
+
+
+async def test_add_and_get_messages_in_batches(
+    queue_name: str, redis_queue_service: AsyncRedisQueueService, redis_instance: Redis
+):
+    await redis_instance.delete(queue_name)
+    messages = [DefaultMessage() for _ in range(10)]
+    assert await redis_queue_service.add_messages_to_queue(queue_name, messages) == 10
+
+    first = await redis_queue_service.get_messages_from_queue(queue_name, 4)
+    rest = await redis_queue_service.get_messages_from_queue(queue_name, 100)
+    assert first + rest == messages
+    assert await redis_queue_service.get_messages_from_queue(queue_name, 4) == []
+
+
+async def test_reliable_get_messages_in_batches(
+    reliable_queue_name: str,
+    reliable_queue_service: AsyncRedisQueueService,
+    redis_instance: Redis,
+):
+    messages = [DefaultMessage() for _ in range(3)]
+    await reliable_queue_service.add_messages_to_queue(reliable_queue_name, messages)
+
+    popped = await reliable_queue_service.get_messages_from_queue(
+        reliable_queue_name, 5
+    )
+    assert popped == messages
+    processing = processing_list(reliable_queue_name, "worker")
+    assert await redis_instance.llen(processing) == 3
+    for message in popped:
+        await reliable_queue_service.ack_message(reliable_queue_name, message)
+    assert await redis_instance.llen(processing) == 0
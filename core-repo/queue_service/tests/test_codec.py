@@ -0,0 +1,34 @@
+import pytest
+
+from queue_service.codec import CODEC_VERSION, decode_message, encode_message
+from queue_service.messages import EncryptMessage, Error
+
+
+def test_round_trip():
+    message = EncryptMessage(
+        filename="a.txt", username="user", retry_count=2, error=Error("failed")
+    )
+    assert decode_message(EncryptMessage, encode_message(message)) == message
+
+
+def test_round_trip_exception_type():
+    error = Error("failed", exception_type="ValueError")
+    message = EncryptMessage(filename="a.txt", error=error)
+    assert decode_message(EncryptMessage, encode_message(message)) == message
+    assert decode_message(EncryptMessage, message.to_json()) == message
+
+
+def test_decode_to_json_payload():
+    message = EncryptMessage(filename="a.txt", error=Error("failed", retry=True))
+    assert decode_message(EncryptMessage, message.to_json()) == message
+
+
+def test_decode_drops_unknown_fields():
+    raw = b'{"_v": 1, "filename": "a.txt", "added_later": 1}'
+    assert decode_message(EncryptMessage, raw).filename == "a.txt"
+
+
+def test_decode_rejects_newer_version():
+    raw = f'{{"_v": {CODEC_VERSION + 1}}}'
+    with pytest.raises(ValueError):
+        decode_message(EncryptMessage, raw)
@@ -0,0 +1,136 @@
+import time
+from collections import deque
+
+from queue_service.messages import DefaultMessage, Message
+from queue_service.queue_listener import QueueListener
+
+
+class FakeQueueService:
+    def __init__(self, visibility_timeout: float = 300):
+        self.queues = {}
+        self.visibility_timeout = visibility_timeout
+        self.last_heartbeat = time.time()
+        self.in_flight = []
+
+    def add_message_to_queue(self, queue_name: str, message: Message) -> int:
+        queue = self.queues.setdefault(queue_name, deque())
+        queue.append(message)
+        return len(queue)
+
+    def get_message_from_queue(self, queue_name: str) -> Message:
+        self.heartbeat(queue_name)
+        queue = self.queues.get(queue_name)
+        if not queue:
+            return None
+        self.in_flight.append(queue.popleft())
+        return self.in_flight[-1]
+
+    def ack_message(self, queue_name, message, out_queue_name=None, out_message=None):
+        self.in_flight.remove(message)
+        if out_queue_name is not None:
+            self.add_message_to_queue(out_queue_name, out_message or message)
+
+    def nack_message(self, queue_name, message, error=None):
+        self.in_flight.remove(message)
+        message.retry_count += 1
+        message.error = error
+        self.add_message_to_queue(f"{queue_name}:dead", message)
+        return False
+
+    def recover_messages(self, queue_name: str) -> int:
+        return 0
+
+    def reclaim_messages(self, queue_name: str) -> int:
+        return 0
+
+    def heartbeat(self, queue_name: str) -> None:
+        self.last_heartbeat = time.time()
+
+    def reclaim_as_other_worker(self, queue_name: str) -> int:
+        """Requeue the messages in flight if the heartbeat is stale, the way
+        another worker's reclaim_messages does"""
+        if time.time() - self.last_heartbeat <= self.visibility_timeout:
+            return 0
+        reclaimed, self.in_flight = self.in_flight, []
+        for message in reclaimed:
+            self.add_message_to_queue(queue_name, message)
+        return len(reclaimed)
+
+
+class CountingListener(QueueListener):
+    def __init__(self, stop_after: int, **kwargs):
+        super().__init__(**kwargs)
+        self.stop_after = stop_after
+        self.processed = []
+
+    def _process_message(self, message: Message):
+        if message.retry_count < 0:
+            self.stop()
+            raise ValueError("bad message")
+        self.processed.append(message)
+        if len(self.processed) == self.stop_after:
+            self.stop()
+        return message
+
+
+def test_listen_does_not_sleep_between_pending_messages():
+    queue_service = FakeQueueService()
+    messages = [DefaultMessage() for _ in range(5)]
+    for message in messages:
+        queue_service.add_message_to_queue("in", message)
+
+    listener = CountingListener(
+        stop_after=5,
+        queue_service=queue_service,
+        queue_name="in",
+        out_queue_name="out",
+        sleep_time=10,
+    )
+    start = time.monotonic()
+    listener.listen()
+
+    assert time.monotonic() - start < 1
+    assert listener.processed == messages
+    assert list(queue_service.queues["out"]) == messages
+
+
+def test_listen_nacks_failed_message():
+    queue_service = FakeQueueService()
+    message = DefaultMessage(retry_count=-1)
+    queue_service.add_message_to_queue("in", message)
+
+    listener = CountingListener(
+        stop_after=1, queue_service=queue_service, queue_name="in", sleep_time=10
+    )
+    listener.listen()
+
+    assert list(queue_service.queues["in:dead"]) == [message]
+    assert message.retry_count == 0
+    assert "bad message" in message.error.message
+
+
+class SlowListener(QueueListener):
+    def _process_message(self, message: Message):
+        time.sleep(0.3)
+        self.reclaimed = self.queue_service.reclaim_as_other_worker(self.queue_name)
+        self.stop()
+        return message
+
+
+def test_heartbeat_keeps_slow_message_from_being_reclaimed():
+    queue_service = FakeQueueService(visibility_timeout=0.1)
+    message = DefaultMessage()
+    queue_service.add_message_to_queue("in", message)
+
+    listener = SlowListener(
+        queue_service=queue_service,
+        queue_name="in",
+        out_queue_name="out",
+        heartbeat_interval=0.02,
+    )
+    listener.listen()
+
+    # processing took longer than visibility_timeout
+    assert listener.reclaimed == 0
+    assert not queue_service.queues["in"]
+    assert list(queue_service.queues["out"]) == [message]
@@ -3,6 +3,11 @@ from redis import Redis
 
 from queue_service import RedisQueueService
 from queue_service.messages import Message, DefaultMessage
+from queue_service.queue_keys import (
+    consumers_key,
+    dead_letter_queue,
+    processing_list,
+)
 
 
 @pytest.fixture(scope="module")
@@ -33,7 +38,7 @@ def run_before_and_after_tests(redis_instance: Redis, queue_name: str):
 
 @pytest.fixture
 def redis_queue_service(redis_instance: Redis, timeout: int) -> RedisQueueService:
-    return RedisQueueService(redis_instance, timeout)
+    return RedisQueueService(redis_instance, DefaultMessage, timeout)
 
 
 def test_add_message_to_queue(
@@ -86,3 +91,127 @@ def test_delete_non_existent_message_from_queue(
         queue_name, DefaultMessage()
     )
     assert no_of_ele_removed == 0
+
+
+@pytest.fixture
+def reliable_queue_name() -> str:
+    return "test_reliable_queue"
+
+
+@pytest.fixture
+def reliable_queue_service(
+    redis_instance: Redis, reliable_queue_name: str
+) -> RedisQueueService:
+    redis_instance.delete(
+        reliable_queue_name,
+        processing_list(reliable_queue_name, "worker"),
+        processing_list(reliable_queue_name, "dead-worker"),
+        consumers_key(reliable_queue_name),
+        dead_letter_queue(reliable_queue_name),
+    )
+    return RedisQueueService(
+        redis_instance, DefaultMessage, 1, consumer="worker", max_retries=1
+    )
+
+
+def test_reliable_pop_keeps_message_until_ack(
+    reliable_queue_name: str,
+    reliable_queue_service: RedisQueueService,
+    redis_instance: Redis,
+):
+    processing = processing_list(reliable_queue_name, "worker")
+    message = DefaultMessage()
+    reliable_queue_service.add_message_to_queue(reliable_queue_name, message)
+
+    popped = reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert popped.message_id == message.message_id
+    assert redis_instance.llen(processing) == 1
+    assert redis_instance.zscore(consumers_key(reliable_queue_name), "worker")
+
+    reliable_queue_service.ack_message(
+        reliable_queue_name, popped, "test_out_queue", DefaultMessage()
+    )
+    assert redis_instance.llen(processing) == 0
+    assert redis_instance.lpop("test_out_queue")
+
+
+def test_nack_retries_then_dead_letters(
+    reliable_queue_name: str,
+    reliable_queue_service: RedisQueueService,
+    redis_instance: Redis,
+):
+    reliable_queue_service.add_message_to_queue(reliable_queue_name, DefaultMessage())
+
+    message = reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert reliable_queue_service.nack_message(reliable_queue_name, message)
+    message = reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert message.retry_count == 1
+    assert not reliable_queue_service.nack_message(reliable_queue_name, message)
+
+    assert redis_instance.llen(reliable_queue_name) == 0
+    assert redis_instance.llen(processing_list(reliable_queue_name, "worker")) == 0
+    assert redis_instance.llen(dead_letter_queue(reliable_queue_name)) == 1
+
+
+def test_reclaim_messages_of_dead_consumer(
+    reliable_queue_name: str,
+    reliable_queue_service: RedisQueueService,
+    redis_instance: Redis,
+):
+    dead_worker = RedisQueueService(
+        redis_instance, DefaultMessage, 1, consumer="dead-worker"
+    )
+    dead_worker.add_message_to_queue(reliable_queue_name, DefaultMessage())
+    assert dead_worker.get_message_from_queue(reliable_queue_name)
+    redis_instance.zadd(consumers_key(reliable_queue_name), {"dead-worker": 0})
+
+    assert reliable_queue_service.reclaim_messages(reliable_queue_name) == 1
+    message = reliable_queue_service.get_message_from_queue(reliable_queue_name)
+    assert message.retry_count == 1
+    assert (
+        redis_instance.zscore(consumers_key(reliable_queue_name), "dead-worker") is None
+    )
+
+
+def test_recover_messages(
+    reliable_queue_name: str,
+    reliable_queue_service: RedisQueueService,
+    redis_instance: Redis,
+):
+    reliable_queue_service.add_message_to_queue(reliable_queue_name, DefaultMessage())
+    assert reliable_queue_service.get_message_from_queue(reliable_queue_name)
+
+    # a restarted worker of the same name
+    restarted = RedisQueueService(redis_instance, DefaultMessage, 1, consumer="worker")
+    assert restarted.recover_messages(reliable_queue_name) == 1
+    assert redis_instance.llen(reliable_queue_name) == 1
+
+
+def test_add_and_get_messages_in_batches(
+    queue_name: str, redis_queue_service: RedisQueueService, redis_instance: Redis
+):
+    redis_instance.delete(queue_name)
+    messages = [DefaultMessage() for _ in range(10)]
+    assert redis_queue_service.add_messages_to_queue(queue_name, messages) == 10
+
+    first = redis_queue_service.get_messages_from_queue(queue_name, 4)
+    rest = redis_queue_service.get_messages_from_queue(queue_name, 100)
+    assert first + rest == messages
+    assert redis_queue_service.get_messages_from_queue(queue_name, 4) == []
+
+
+def test_reliable_get_messages_in_batches(
+    reliable_queue_name: str,
+    reliable_queue_service: RedisQueueService,
+    redis_instance: Redis,
+):
+    messages = [DefaultMessage() for _ in range(3)]
+    reliable_queue_service.add_messages_to_queue(reliable_queue_name, messages)
+
+    popped = reliable_queue_service.get_messages_from_queue(reliable_queue_name, 5)
+    assert popped == messages
+    processing = processing_list(reliable_queue_name, "worker")
+    assert redis_instance.llen(processing) == 3
+    for message in popped:
+        reliable_queue_service.ack_message(reliable_queue_name, message)
+    assert redis_instance.llen(processing) == 0
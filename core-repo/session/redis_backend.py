@@ -1,3 +1,5 @@
+import json
+
 from fastapi_sessions.backends.session_backend import (
     BackendError,
     SessionBackend,
@@ -5,7 +7,7 @@ from fastapi_sessions.backends.session_backend import (
 )
 from fastapi_sessions.frontends.session_frontend import ID
 from logging import getLogger
-from redis import Redis
+from redis.asyncio import Redis
 from typing import Generic
 
 from session.session_verifier import SessionData
@@ -22,28 +24,46 @@ class RedisBackend(Generic[ID, SessionModel], SessionBackend[ID, SessionModel]):
         self.redis = redis
         self.identifier = identifier
 
+    @staticmethod
+    def _dumps(data: SessionModel) -> str:
+        return json.dumps(
+            {
+                "username": data.username,
+                "user_id": getattr(data, "user_id", None),
+                "is_active": getattr(data, "is_active", None),
+                "checked_at": getattr(data, "checked_at", None),
+            }
+        )
+
+    @staticmethod
+    def _loads(value: str) -> SessionData:
+        """Sessions written before user_id was cached hold the bare username"""
+        if not value.startswith("{"):
+            return SessionData(username=value)
+        return SessionData(**json.loads(value))
+
     async def create(self, session_id: ID, data: SessionModel):
         """Create a new session entry."""
-        if self.redis.hget(self.identifier, str(session_id)):
+        if await self.redis.hget(self.identifier, str(session_id)):
             raise BackendError("create can't overwrite an existing session")
 
-        self.redis.hset(self.identifier, str(session_id), data.username)
+        await self.redis.hset(self.identifier, str(session_id), self._dumps(data))
 
     async def read(self, session_id: ID):
         """Read an existing session data."""
-        data = self.redis.hget(self.identifier, str(session_id))
+        data = await self.redis.hget(self.identifier, str(session_id))
         if not data:
             return
 
-        return SessionData(username=data.decode("utf8"))
+        return self._loads(data.decode("utf8"))
 
     async def update(self, session_id: ID, data: SessionModel) -> None:
         """Update an existing session."""
-        if self.redis.hexists(self.identifier, str(session_id)):
-            self.redis.hset(self.identifier, str(session_id), data.username)
+        if await self.redis.hexists(self.identifier, str(session_id)):
+            await self.redis.hset(self.identifier, str(session_id), self._dumps(data))
         else:
             raise BackendError("session does not exist, cannot update")
 
     async def delete(self, session_id: ID) -> None:
         """Delete an existing session"""
-        self.redis.hdel(self.identifier, str(session_id))
+        await self.redis.hdel(self.identifier, str(session_id))
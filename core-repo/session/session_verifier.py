@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from fastapi import HTTPException
+from typing import Optional
 from uuid import UUID
 
 from fastapi_sessions.backends.implementations import InMemoryBackend
@@ -8,6 +9,10 @@ from fastapi_sessions.session_verifier import SessionVerifier
 
 class SessionData(BaseModel):
     username: str
+    user_id: Optional[int] = None
+    is_active: Optional[bool] = None
+    # time() user_id and is_active were read from the db
+    checked_at: Optional[float] = None
 
 
 class BasicVerifier(SessionVerifier[UUID, SessionData]):
@@ -0,0 +1,55 @@
+import pytest
+from redis.asyncio import Redis
+from uuid import uuid4, UUID
+
+from session import RedisBackend, SessionData
+
+
+@pytest.fixture(scope="module")
+def identifier() -> str:
+    return "test_session"
+
+
+@pytest.fixture(scope="module")
+def redis_instance() -> Redis:
+    return Redis("default-redis")
+
+
+@pytest.fixture(autouse=True, scope="module")
+async def run_before_and_after_tests(redis_instance: Redis, identifier: str):
+    yield
+    await redis_instance.delete(identifier)
+
+
+@pytest.fixture
+def backend(redis_instance: Redis, identifier: str) -> RedisBackend:
+    return RedisBackend(redis_instance, identifier)
+
+
+@pytest.fixture
+def session_id() -> UUID:
+    return uuid4()
+
+
+async def test_create_and_read_session(backend: RedisBackend, session_id: UUID):
+    data = SessionData(
+        username="test_user", user_id=1, is_active=True, checked_at=1700000000.5
+    )
+    await backend.create(session_id, data)
+    assert await backend.read(session_id) == data
+
+
+async def test_update_session(backend: RedisBackend, session_id: UUID):
+    await backend.create(session_id, SessionData(username="test_user"))
+    data = SessionData(username="test_user", user_id=2, is_active=False)
+    await backend.update(session_id, data)
+    assert await backend.read(session_id) == data
+
+
+async def test_read_legacy_session(
+    backend: RedisBackend, redis_instance: Redis, identifier: str, session_id: UUID
+):
+    await redis_instance.hset(identifier, str(session_id), "test_user")
+    data = await backend.read(session_id)
+    assert data.username == "test_user"
+    assert data.user_id is None
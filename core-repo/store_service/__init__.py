@@ -1 +1,2 @@
 from .fs_store_service import FSStoreService
+from .cas_store_service import CASStoreService
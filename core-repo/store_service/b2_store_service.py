@@ -1,55 +1,168 @@
 import asyncio
-from aiob2 import Client, File
+import json
+from urllib.parse import quote
+
+import aiohttp
+from aiob2 import Client
 from b2sdk.v2 import (
     B2Api,
     Bucket,
     InMemoryAccountInfo,
     FileVersion,
-    DownloadVersion,
-    DownloadedFile,
 )
 from b2sdk.exception import FileNotPresent
-from pathlib import Path
-from typing import AsyncIterator, Dict
+from typing import AsyncIterator, Dict, Iterable, Optional, Union
 
+from .b2_uploader import DEFAULT_PART_SIZE, B2Uploader
 from .store_service import StoreService
 
+B2_AUTHORIZE_URL = "https://api.backblazeb2.com/b2api/v2/b2_authorize_account"
+
 
 class B2StoreService(StoreService):
-    __slots__ = ["b2_api", "bucket", "_application_key_id", "_application_key"]
+    """Store files in a B2 bucket.
+
+    The async methods share one aiohttp session. The store authorizes with it
+    on first use, again when the token expires, to list, copy and read files
+    and upload the parts of large files, and the aiob2 Client it is passed to
+    uploads small files and deletes them, keeping a pool of upload urls, so
+    concurrent uploads do not each pay for authorization. The sync methods use b2sdk, authorized the first time they
+    are called."""
+
+    __slots__ = [
+        "bucket_name",
+        "part_size",
+        "max_concurrency",
+        "_application_key_id",
+        "_application_key",
+        "_session",
+        "_account",
+        "_authorize_lock",
+        "_client",
+        "_bucket_id",
+        "_bucket",
+    ]
 
-    def __init__(self, bucket_name: str, application_key_id: str, application_key: str):
-        info = InMemoryAccountInfo()  # store credentials, tokens and cache in memory
-        self.b2_api: B2Api = B2Api(info)
-        self.b2_api.authorize_account("production", application_key_id, application_key)
-        self.bucket: Bucket = self.b2_api.get_bucket_by_name(bucket_name)
+    def __init__(
+        self,
+        bucket_name: str,
+        application_key_id: str,
+        application_key: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = 4,
+    ):
+        self.bucket_name = bucket_name
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
         self._application_key_id = application_key_id
         self._application_key = application_key
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._account: Optional[Dict] = None
+        self._authorize_lock = asyncio.Lock()
+        self._client: Optional[Client] = None
+        self._bucket_id: Optional[str] = None
+        self._bucket: Optional[Bucket] = None
 
-    async def _persist_large_file(
-        self,
-        client: Client,
-        path: str,
-        async_iter: AsyncIterator[bytes] = None,
-    ) -> File:
-        large_file = await client.upload_large_file(self.bucket.id_, path)
-        async for byte in async_iter:
-            await large_file.upload_part(byte)
-        return await large_file.finish()
+    @property
+    def bucket(self) -> Bucket:
+        if self._bucket is None:
+            b2_api = B2Api(InMemoryAccountInfo())
+            b2_api.authorize_account(
+                "production", self._application_key_id, self._application_key
+            )
+            self._bucket = b2_api.get_bucket_by_name(self.bucket_name)
+        return self._bucket
 
-    async def _persist_file(
-        self,
-        client: Client,
-        path: str,
-        async_iter: AsyncIterator[bytes] = None,
-    ) -> File:
-        data = b""
-        async for byte in async_iter:
-            data += byte
-        file = await client.upload_file(
-            file_name=path, content_bytes=data, bucket_id=self.bucket.id_
+    async def _authorize(self, expired_token: str = None) -> Dict:
+        """Return the account authorization, authorizing again if it is missing
+        or its token is expired_token"""
+        async with self._authorize_lock:
+            if self._account is None or (
+                self._account["authorizationToken"] == expired_token
+            ):
+                if self._session is None:
+                    self._session = aiohttp.ClientSession()
+                async with self._session.get(
+                    B2_AUTHORIZE_URL,
+                    auth=aiohttp.BasicAuth(
+                        self._application_key_id, self._application_key
+                    ),
+                ) as resp:
+                    resp.raise_for_status()
+                    self._account = await resp.json()
+            return self._account
+
+    async def _send(
+        self, method: str, url_key: str, path: str, headers: Dict = None, **kwargs
+    ) -> bytes:
+        """Send a request to the account's apiUrl or downloadUrl, authorizing
+        again once if the token expired, return the raw body"""
+        account = await self._authorize()
+        for attempt in range(2):
+            token = account["authorizationToken"]
+            async with self._session.request(
+                method,
+                account[url_key] + path,
+                headers={**(headers or {}), "Authorization": token},
+                **kwargs,
+            ) as resp:
+                if resp.status == 401 and attempt == 0:
+                    account = await self._authorize(expired_token=token)
+                    continue
+                resp.raise_for_status()
+                return await resp.read()
+
+    async def _request(self, api: str, data: Dict) -> Dict:
+        body = await self._send("POST", "apiUrl", f"/b2api/v2/{api}", json=data)
+        return json.loads(body)
+
+    async def _post(self, url: str, headers: Dict, data: bytes) -> Dict:
+        """POST data to an upload url, with the token that came with it"""
+        async with self._session.post(url, headers=headers, data=data) as resp:
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def _get_client(self) -> Client:
+        account = await self._authorize()
+        if self._client is None:
+            self._client = Client(
+                self._application_key_id,
+                self._application_key,
+                session=self._session,
+            )
+        if self._bucket_id is None:
+            resp = await self._request(
+                "b2_list_buckets",
+                {"accountId": account["accountId"], "bucketName": self.bucket_name},
+            )
+            self._bucket_id = resp["buckets"][0]["bucketId"]
+        return self._client
+
+    async def _get_file_info(self, path: str) -> Optional[Dict]:
+        await self._get_client()
+        resp = await self._request(
+            "b2_list_file_names",
+            {
+                "bucketId": self._bucket_id,
+                "startFileName": path,
+                "prefix": path,
+                "maxFileCount": 1,
+            },
         )
-        return file
+        for file in resp["files"]:
+            if file["fileName"] == path and file["action"] == "upload":
+                return file
+        return None
+
+    async def close(self) -> None:
+        if self._client is not None:
+            # closes the session it was given too
+            await self._client.close()
+            self._client = None
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._account = None
 
     async def persist_file(
         self,
@@ -57,39 +170,46 @@ class B2StoreService(StoreService):
         async_iter: AsyncIterator[bytes] = None,
         is_large: bool = False,
         meta: Dict = None,
+        offset: int = None,
     ) -> str:
-        """Save a file to store return path"""
-        async with Client(self._application_key_id, self._application_key) as client:
-            if is_large:
-                result = await self._persist_large_file(client, path, async_iter)
-            else:
-                result = await self._persist_file(client, path, async_iter)
-
-            return result.id
+        """Save a file to store return path. B2 files are uploaded whole, so
+        offset is ignored, can_append is False"""
+        client = await self._get_client()
+        uploader = B2Uploader(
+            client,
+            self._bucket_id,
+            self._request,
+            self._post,
+            self.part_size,
+            self.max_concurrency,
+        )
+        result = await uploader.upload(path, async_iter, is_large)
+        return result.id
 
     def persist_file_sync(
-        self, path: str, data: bytes = None, meta: Dict = None
+        self, path: str, data: Union[bytes, Iterable[bytes]] = None, meta: Dict = None
     ) -> str:
         """Save a file to store return path"""
+        if not isinstance(data, (bytes, bytearray)):
+            data = b"".join(data)
         result: FileVersion = self.bucket.upload_bytes(data, path)
         return result.id_
 
     async def stat_file(self, path) -> Dict[str, str]:
-        """Return stat of a file"""
+        """Return stat of a file, the checksum is B2's sha1. Large files have
+        none, B2 only keeps the sha1 of a large file given when it is started,
+        which an upload streaming it cannot know, so their checksum is None"""
+        file = await self._get_file_info(path)
+        if file is None:
+            return {}
+        checksum = file["contentSha1"]
+        if checksum == "none":
+            checksum = None
+        return {"last_modified": file["uploadTimestamp"] / 1000, "checksum": checksum}
 
     async def file_exists(self, path: str) -> bool:
         """Check if a file exists"""
-        loop = asyncio.get_running_loop()
-        try:
-            await self._get_file_info(path, loop)
-            return True
-        except FileNotPresent:
-            return False
-
-    async def _get_file_info(
-        self, path: str, loop: asyncio.AbstractEventLoop
-    ) -> DownloadVersion:
-        return await loop.run_in_executor(None, self.bucket.get_file_info_by_name, path)
+        return await self._get_file_info(path) is not None
 
     def file_exists_sync(self, path: str) -> bool:
         """Check if a file exists"""
@@ -101,19 +221,46 @@ class B2StoreService(StoreService):
 
     async def remove_file(self, path: str) -> bool:
         """Remove a file if exsits"""
-        loop = asyncio.get_running_loop()
-        file = await self._get_file_info(path, loop)
-        file_id_n_name = await loop.run_in_executor(
-            None, self.bucket.delete_file_version, file.id_, file.file_name
-        )
+        file = await self._get_file_info(path)
+        if file is None:
+            return False
+        await self._client.delete_file(path, file["fileId"])
         return True
 
-    async def read(self, path: str, size: int = -1) -> bytes:
-        """Read a file from the source"""
-        loop = asyncio.get_running_loop()
+    async def file_size(self, path: str) -> int:
+        """Return size of a file in bytes, 0 if it does not exist"""
+        file = await self._get_file_info(path)
+        return 0 if file is None else file["contentLength"]
 
-        range_ = None if size == -1 else (0, size - 1)
-        downloaded_file: DownloadedFile = await loop.run_in_executor(
-            None, self.bucket.download_file_by_name, path, None, range_
+    async def rename_file(self, src: str, dst: str) -> str:
+        """Copy a file to dst and remove src, return dst"""
+        file = await self._get_file_info(src)
+        if file is None:
+            raise FileNotFoundError(src)
+        await self._request(
+            "b2_copy_file", {"sourceFileId": file["fileId"], "fileName": dst}
         )
-        return downloaded_file.response.content
+        await self._client.delete_file(src, file["fileId"])
+        return dst
+
+    async def read(self, path: str, size: int = -1, offset: int = 0) -> bytes:
+        """Read size bytes of a file from offset, -1 to read to the end"""
+        if size == 0:
+            return b""
+        headers = {}
+        if size != -1:
+            headers["Range"] = f"bytes={offset}-{offset + size - 1}"
+        elif offset:
+            headers["Range"] = f"bytes={offset}-"
+        try:
+            return await self._send(
+                "GET",
+                "downloadUrl",
+                f"/file/{quote(self.bucket_name)}/{quote(path)}",
+                headers=headers,
+            )
+        except aiohttp.ClientResponseError as ex:
+            if ex.status == 416:
+                # offset is at or past the end of the file
+                return b""
+            raise
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+
+from aiob2 import Client, File
+from logging import getLogger
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = getLogger(__name__)
+
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+
+
+class B2Uploader:
+    """Upload a byte stream to a bucket.
+
+    Small files are accumulated in a single bytearray. Large files are cut into
+    parts of part_size bytes, each hashed while it fills, and up to
+    max_concurrency parts are uploaded at once. A new part is only buffered
+    while fewer than max_concurrency are in flight, so memory stays bounded by
+    (max_concurrency + 1) * part_size.
+
+    Small files go through the aiob2 client. Large files use B2's native API
+    directly: request makes an authorized call to it and returns the JSON,
+    post sends a part to an upload url with the headers given."""
+
+    def __init__(
+        self,
+        client: Client,
+        bucket_id: str,
+        request: Callable[[str, Dict], Awaitable[Dict]],
+        post: Callable[[str, Dict, bytes], Awaitable[Dict]],
+        part_size: int = DEFAULT_PART_SIZE,
+        max_concurrency: int = 4,
+    ):
+        self.client = client
+        self.bucket_id = bucket_id
+        self.request = request
+        self.post = post
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
+
+    async def upload(
+        self, path: str, async_iter: AsyncIterator[bytes], is_large: bool = False
+    ) -> File:
+        if is_large:
+            return await self._upload_large_file(path, async_iter)
+
+        data = bytearray()
+        async for chunk in async_iter:
+            data += chunk
+        return await self._upload_file(path, data)
+
+    async def _upload_file(self, path: str, data: bytearray) -> File:
+        return await self.client.upload_file(
+            file_name=path, content_bytes=data, bucket_id=self.bucket_id
+        )
+
+    async def _upload_large_file(
+        self, path: str, async_iter: AsyncIterator[bytes]
+    ) -> File:
+        file_id: Optional[str] = None
+        part_number = 0
+        sha1s: Dict[int, str] = {}
+        tasks: List[asyncio.Task] = []
+        slots = asyncio.Semaphore(self.max_concurrency)
+        # an upload url takes one part at a time, free ones are reused
+        upload_urls: List[Dict] = []
+
+        async def upload_part(part_number: int, data: bytearray, sha1: str) -> None:
+            try:
+                if upload_urls:
+                    upload_url = upload_urls.pop()
+                else:
+                    upload_url = await self.request(
+                        "b2_get_upload_part_url", {"fileId": file_id}
+                    )
+                headers = {
+                    "Authorization": upload_url["authorizationToken"],
+                    "X-Bz-Part-Number": str(part_number),
+                    "X-Bz-Content-Sha1": sha1,
+                }
+                # a url whose upload failed is dropped, B2 asks for a new one
+                await self.post(upload_url["uploadUrl"], headers, data)
+                upload_urls.append(upload_url)
+                sha1s[part_number] = sha1
+            finally:
+                slots.release()
+
+        async def flush(data: bytearray, sha1: str) -> None:
+            nonlocal file_id, part_number
+            if file_id is None:
+                large_file = await self.request(
+                    "b2_start_large_file",
+                    {
+                        "bucketId": self.bucket_id,
+                        "fileName": path,
+                        "contentType": "b2/x-auto",
+                    },
+                )
+                file_id = large_file["fileId"]
+            await slots.acquire()
+            for task in [task for task in tasks if task.done()]:
+                tasks.remove(task)
+                # re-raise a failed part before uploading any more
+                task.result()
+            part_number += 1
+            tasks.append(asyncio.create_task(upload_part(part_number, data, sha1)))
+
+        buffer, hasher = bytearray(), hashlib.sha1()
+        try:
+            async for chunk in async_iter:
+                view = memoryview(chunk)
+                while view:
+                    if len(buffer) == self.part_size:
+                        # only flush once there is more data, so the last part
+                        # never ends up empty
+                        await flush(buffer, hasher.hexdigest())
+                        buffer, hasher = bytearray(), hashlib.sha1()
+                    piece = view[: self.part_size - len(buffer)]
+                    buffer += piece
+                    hasher.update(piece)
+                    view = view[len(piece) :]
+
+            if file_id is None:
+                # everything fit in one part, which a large file does not allow
+                return await self._upload_file(path, buffer)
+
+            await flush(buffer, hasher.hexdigest())
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if file_id is not None:
+                logger.warning(f"cancelling large file upload of {path}")
+                try:
+                    await self.request("b2_cancel_large_file", {"fileId": file_id})
+                except Exception:
+                    logger.exception(f"failed to cancel large file {file_id}")
+            raise
+
+        sha1_list: List[str] = [sha1s[idx] for idx in sorted(sha1s)]
+        return File(
+            await self.request(
+                "b2_finish_large_file", {"fileId": file_id, "partSha1Array": sha1_list}
+            )
+        )
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from logging import getLogger
+from pathlib import Path
+from typing import AsyncIterator, Optional
+from uuid import uuid4
+
+from .fs_store_service import FSStoreService, _Writer
+
+logger = getLogger(__name__)
+
+BLOB_READ_SIZE = 1024 * 1024
+
+
+def sha256sum(path: Path) -> str:
+    m = hashlib.sha256()
+    with open(path, "rb") as f:
+        while d := f.read(BLOB_READ_SIZE):
+            m.update(d)
+    return m.hexdigest()
+
+
+class _BlobWriter(_Writer):
+    def __init__(self, path: Path, tmp_dir: Path):
+        super().__init__(path, tmp_dir)
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data: bytes) -> None:
+        super().write(data)
+        self.sha256.update(data)
+
+
+class CASStoreService(FSStoreService):
+    """Store files on the local file system, keeping one copy of each content.
+
+    A file is hashed with sha256 while it is written and stored once as a blob
+    under blob_path, named after its digest. The path it was written to is a
+    hard link to the blob, so it reads like any other file, and the blob's
+    link count less one is the number of paths referencing it. A blob is
+    removed with the last path linked to it. blob_path must be on the same
+    file system as the stored files.
+
+    Files written from an offset, like resumed downloads, are not
+    deduplicated, and a linked file gets its own copy before such a write.
+
+    The digest of each blob written is kept by inode, so finding the blob a
+    path is linked to is a stat, a path is only hashed again if its blob was
+    written by another process or forgotten. Blobs left without a path are
+    removed by collect_garbage, which collect_garbage_every runs
+    periodically."""
+
+    def __init__(self, blob_path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.blob_path = Path(blob_path)
+        self.tmp_path = self.blob_path / "tmp"
+        self.tmp_path.mkdir(exist_ok=True, parents=True)
+        # serialises creating links to a blob with removing it
+        self._lock = threading.Lock()
+        # blob inode to digest, bounded like the stat cache
+        self._digests: "OrderedDict[int, str]" = OrderedDict()
+
+    def blob_of(self, digest: str) -> Path:
+        return self.blob_path / digest[:2] / digest
+
+    def refcount(self, digest: str) -> int:
+        """Return the number of paths linked to the blob of digest"""
+        try:
+            return os.stat(self.blob_of(digest)).st_nlink - 1
+        except FileNotFoundError:
+            return 0
+
+    def _open_writer(self, path: Path) -> _Writer:
+        return _BlobWriter(path, self.tmp_path)
+
+    def _commit(self, writer: _BlobWriter) -> os.stat_result:
+        writer.f.close()
+        blob = self.blob_of(writer.sha256.hexdigest())
+        old_blob = self._blob_linked_to(writer.path)
+        link = writer.path.with_name(f".{writer.path.name}.{uuid4().hex}.tmp")
+        with self._lock:
+            if blob.exists():
+                logger.debug(f"{writer.path} has the content of {blob}")
+                os.remove(writer.tmp_path)
+            else:
+                blob.parent.mkdir(exist_ok=True)
+                os.replace(writer.tmp_path, blob)
+            os.link(blob, link)
+        try:
+            os.replace(link, writer.path)
+        finally:
+            # rename does nothing if both are links to the same blob
+            if os.path.lexists(link):
+                os.remove(link)
+        if old_blob is not None and old_blob != blob:
+            self._release(old_blob)
+        st = os.stat(writer.path)
+        self._remember(st.st_ino, writer.sha256.hexdigest())
+        return st
+
+    def _remember(self, ino: int, digest: str) -> None:
+        with self._lock:
+            self._digests[ino] = digest
+            self._digests.move_to_end(ino)
+            while len(self._digests) > self._stat_cache_size:
+                self._digests.popitem(last=False)
+
+    def _is_linked(self, blob: Path, st: os.stat_result) -> bool:
+        try:
+            return os.stat(blob).st_ino == st.st_ino
+        except FileNotFoundError:
+            return False
+
+    def _blob_linked_to(self, path: Path) -> Optional[Path]:
+        """Return the blob path is linked to, None if it is not linked"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if st.st_nlink < 2:
+            return None
+        digest = self._digests.get(st.st_ino)
+        # the inode may have been freed and reused since it was recorded
+        if digest is None or not self._is_linked(self.blob_of(digest), st):
+            digest = sha256sum(path)
+        blob = self.blob_of(digest)
+        if not self._is_linked(blob, st):
+            return None
+        self._remember(st.st_ino, digest)
+        return blob
+
+    def _release(self, blob: Path) -> None:
+        """Remove blob if no path is linked to it any more"""
+        with self._lock:
+            try:
+                if os.stat(blob).st_nlink == 1:
+                    os.remove(blob)
+            except FileNotFoundError:
+                pass
+
+    def _unshare(self, path: Path) -> None:
+        """Give path its own copy of its blob, so it can be written in place"""
+        blob = self._blob_linked_to(path)
+        if blob is None:
+            return
+        tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        shutil.copyfile(blob, tmp)
+        os.replace(tmp, path)
+        self._release(blob)
+
+    async def _append(
+        self, path: Path, async_iter: AsyncIterator[bytes], offset: int
+    ) -> None:
+        await self._run(self._unshare, path)
+        await super()._append(path, async_iter, offset)
+
+    def _remove_file(self, path: str) -> bool:
+        blob = self._blob_linked_to(Path(path))
+        removed = super()._remove_file(path)
+        if removed and blob is not None:
+            self._release(blob)
+        return removed
+
+    def collect_garbage(self, tmp_max_age: float = 3600) -> int:
+        """Remove blobs no path is linked to and temporary files older than
+        tmp_max_age seconds, return the number of files removed"""
+        removed = 0
+        for blob in self.blob_path.glob("??/*"):
+            with self._lock:
+                if blob.stat().st_nlink == 1:
+                    blob.unlink()
+                    removed += 1
+        for tmp in self.tmp_path.iterdir():
+            if time.time() - tmp.stat().st_mtime > tmp_max_age:
+                tmp.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    async def collect_garbage_every(
+        self, interval: float, tmp_max_age: float = 3600
+    ) -> None:
+        """Run collect_garbage every interval seconds until cancelled. Only
+        one process sharing blob_path should run it, the lock that keeps it
+        from removing a blob being linked is per process."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self._run(self.collect_garbage, tmp_max_age)
+                logger.info(f"collected {removed} files from {self.blob_path}")
+            except Exception:
+                logger.exception(f"failed to collect garbage in {self.blob_path}")
@@ -0,0 +1,107 @@
+"""Measure how much storing a download directory by content would save.
+
+Hashes every file under the directory, hidden ones like a CASStoreService
+blob_path excepted, and reports the bytes stored now against the bytes of
+distinct contents. Files that are already hard links to one another are
+stored once, so the report also works on a directory written by
+CASStoreService:
+
+    PYTHONPATH=. python -m store_service.dedup_report /downloaded
+"""
+
+import argparse
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from .cas_store_service import sha256sum
+
+
+@dataclass
+class DedupReport:
+    """
+    Attributes:
+        files           Number of files found.
+        logical_bytes   Sum of the sizes of all files.
+        stored_bytes    Bytes on disk, counting hard linked files once.
+        unique_bytes    Bytes on disk if every content was stored once.
+        duplicates      Paths of each content found more than once, by digest.
+    """
+
+    files: int = 0
+    logical_bytes: int = 0
+    stored_bytes: int = 0
+    unique_bytes: int = 0
+    duplicates: Dict[str, List[Path]] = field(default_factory=dict)
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.logical_bytes / self.unique_bytes if self.unique_bytes else 1.0
+
+    @property
+    def saving_bytes(self) -> int:
+        return self.stored_bytes - self.unique_bytes
+
+
+def iter_files(root: Path) -> Iterator[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+        for filename in filenames:
+            if not filename.startswith("."):
+                yield Path(dirpath) / filename
+
+
+def scan(root: Path) -> DedupReport:
+    report = DedupReport()
+    digests: Dict[Tuple[int, int], str] = {}
+    paths: Dict[str, List[Path]] = {}
+    for path in iter_files(root):
+        st = path.stat()
+        report.files += 1
+        report.logical_bytes += st.st_size
+        inode = (st.st_dev, st.st_ino)
+        if inode not in digests:
+            report.stored_bytes += st.st_size
+            digests[inode] = sha256sum(path)
+        digest = digests[inode]
+        if digest not in paths:
+            report.unique_bytes += st.st_size
+            paths[digest] = []
+        paths[digest].append(path)
+
+    report.duplicates = {
+        digest: group for digest, group in paths.items() if len(group) > 1
+    }
+    return report
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TiB"
+
+
+def print_report(report: DedupReport, top: int) -> None:
+    print(f"files:        {report.files}")
+    print(f"logical size: {_format_size(report.logical_bytes)}")
+    print(f"stored size:  {_format_size(report.stored_bytes)}")
+    print(f"unique size:  {_format_size(report.unique_bytes)}")
+    print(f"dedup ratio:  {report.dedup_ratio:.2f}")
+    print(f"saving:       {_format_size(report.saving_bytes)}")
+    groups = sorted(report.duplicates.values(), key=len, reverse=True)
+    for group in groups[:top]:
+        print(f"{len(group)} copies of {_format_size(group[0].stat().st_size)}:")
+        for path in group[:3]:
+            print(f"  {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("download_path", type=Path)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    print_report(scan(args.download_path), args.top)
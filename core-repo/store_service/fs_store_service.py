@@ -1,16 +1,37 @@
+import asyncio
 import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from logging import getLogger
 import os
 from pathlib import Path
-from typing import AsyncIterator, Dict
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+    Union,
+)
+from uuid import uuid4
 
 from .store_service import StoreService
 
 
 logger = getLogger(__name__)
 
+T = TypeVar("T")
 
-def md5sum(file):
+# chunks are collected up to this size before a write is handed to a thread,
+# a thread hop costs far less than hashing the batch, and larger batches only
+# make the joins on the event loop longer
+WRITE_BATCH_SIZE = 256 * 1024
+
+
+def md5sum(file, chunk_size: int = 8096):
     """Calculate the md5 checksum of a file-like object without reading its
     whole content in memory.
     >>> from io import BytesIO
@@ -19,22 +40,122 @@ def md5sum(file):
     """
     m = hashlib.md5()
     while True:
-        d = file.read(8096)
+        d = file.read(chunk_size)
         if not d:
             break
         m.update(d)
     return m.hexdigest()
 
 
+async def _batched(async_iter: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Join chunks up to WRITE_BATCH_SIZE, what was received is still yielded
+    when async_iter raises so a resumed write does not lose it"""
+    batch: List[bytes] = []
+    size = 0
+    try:
+        async for chunk in async_iter:
+            batch.append(chunk)
+            size += len(chunk)
+            if size >= WRITE_BATCH_SIZE:
+                yield b"".join(batch)
+                batch, size = [], 0
+    except Exception:
+        if batch:
+            yield b"".join(batch)
+        raise
+    if batch:
+        yield b"".join(batch)
+
+
+class _Writer:
+    """Write a file under a temporary name, hashing it on the way, and move it
+    into place on commit. Used from one thread at a time."""
+
+    def __init__(self, path: Path, tmp_dir: Path = None):
+        self.path = path
+        self.tmp_path = (tmp_dir or path.parent) / f".{path.name}.{uuid4().hex}.tmp"
+        self.md5 = hashlib.md5()
+        self.f = open(self.tmp_path, "wb")
+
+    def write(self, data: bytes) -> None:
+        self.f.write(data)
+        self.md5.update(data)
+
+    def commit(self) -> os.stat_result:
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+        return os.stat(self.path)
+
+    def abort(self) -> None:
+        self.f.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
 class FSStoreService(StoreService):
+    """Store files on the local file system.
+
+    Blocking calls run on a dedicated thread pool. New files are written under
+    a temporary name and renamed into place, so readers never see a partial
+    file, and their md5 is computed while they are written. stat results are
+    cached by path and revalidated against the file's size and mtime, so
+    stat_file only reads a file it did not write or that changed since."""
+
+    can_append = True
+
+    def __init__(self, max_workers: int = 4, stat_cache_size: int = 10000):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="fs_store"
+        )
+        self._stat_cache_size = stat_cache_size
+        self._stat_cache: "OrderedDict[str, Dict]" = OrderedDict()
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args))
+
+    def _cache_stat(self, path: Union[str, Path], st: os.stat_result, checksum: str):
+        key = str(path)
+        self._stat_cache[key] = {
+            "last_modified": st.st_mtime,
+            "checksum": checksum,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+        }
+        self._stat_cache.move_to_end(key)
+        while len(self._stat_cache) > self._stat_cache_size:
+            self._stat_cache.popitem(last=False)
+
+    def _invalidate(self, path: Union[str, Path]) -> None:
+        self._stat_cache.pop(str(path), None)
+
+    def _open_writer(self, path: Path) -> _Writer:
+        return _Writer(path)
+
+    def _commit(self, writer: _Writer) -> os.stat_result:
+        """Move a completely written file into place, return its stat"""
+        return writer.commit()
+
     def persist_file_sync(
-        self, path: str, data: bytes = None, meta: Dict = None
+        self, path: str, data: Union[bytes, Iterable[bytes]] = None, meta: Dict = None
     ) -> str:
-        """Save a file to store return path"""
+        """Save a file, given as bytes or an iterable of chunks, return path"""
         absolute_path = Path(path)
         absolute_path.parent.mkdir(exist_ok=True, parents=True)
-        with open(absolute_path, "wb") as f:
-            f.write(data)
+        writer = self._open_writer(absolute_path)
+        try:
+            if isinstance(data, (bytes, bytearray)):
+                writer.write(data)
+            else:
+                for chunk in data:
+                    writer.write(chunk)
+            st = self._commit(writer)
+        except BaseException:
+            writer.abort()
+            raise
+        self._cache_stat(path, st, writer.md5.hexdigest())
         return str(path)
 
     async def persist_file(
@@ -43,43 +164,122 @@ class FSStoreService(StoreService):
         async_iter: AsyncIterator[bytes] = None,
         is_large: bool = False,
         meta: Dict = None,
+        offset: int = None,
     ) -> str:
-        """Save a file to store return path"""
+        """Save a file to store return path. Without an offset the file is
+        replaced atomically once complete, with an offset, 0 included, it is
+        written in place from there so an interrupted write can be resumed."""
         absolute_path = Path(path)
-        absolute_path.parent.mkdir(exist_ok=True, parents=True)
-        if async_iter is not None:
-            with open(absolute_path, "wb") as f:
-                async for chunk in async_iter:
-                    f.write(chunk)
+        await self._run(absolute_path.parent.mkdir, 0o777, True, True)
+        if async_iter is None:
+            return str(path)
+        if offset is not None:
+            await self._append(absolute_path, async_iter, offset)
+            return str(path)
+
+        writer = await self._run(self._open_writer, absolute_path)
+        try:
+            async for batch in _batched(async_iter):
+                await self._run(writer.write, batch)
+            st = await self._run(self._commit, writer)
+        except BaseException:
+            await asyncio.shield(self._run(writer.abort))
+            raise
+        self._cache_stat(path, st, writer.md5.hexdigest())
         return str(path)
 
+    async def _append(
+        self, path: Path, async_iter: AsyncIterator[bytes], offset: int
+    ) -> None:
+        """Write in place from offset, the way a resumed download continues"""
+        self._invalidate(path)
+        mode = "r+b" if await self._run(path.exists) else "wb"
+        f = await self._run(open, path, mode)
+        try:
+            if mode == "r+b":
+                await self._run(f.seek, offset)
+                await self._run(f.truncate)
+            async for batch in _batched(async_iter):
+                await self._run(f.write, batch)
+        finally:
+            await self._run(f.close)
+
+    def _checksum(self, path: str) -> str:
+        with open(path, "rb") as f:
+            return md5sum(f, 1024 * 1024)
+
     async def stat_file(self, path: str) -> Dict[str, str]:
-        """Return stat of a file"""
-        absolute_path = Path(path)
+        """Return stat of a file, only reading it if it changed since it was
+        last written or checksummed"""
         try:
-            last_modified = absolute_path.lstat().st_mtime
+            st = await self._run(os.stat, path)
         except Exception as ex:
             logger.error(ex)
+            self._invalidate(path)
             return {}
 
-        with open(absolute_path, "rb") as f:
-            checksum = md5sum(f)
-
-        return {"last_modified": last_modified, "checksum": checksum}
+        cached = self._stat_cache.get(str(path))
+        if (
+            cached is None
+            or cached["size"] != st.st_size
+            or cached["mtime_ns"] != st.st_mtime_ns
+        ):
+            checksum = await self._run(self._checksum, path)
+            self._cache_stat(path, st, checksum)
+            cached = self._stat_cache[str(path)]
+        return {
+            "last_modified": cached["last_modified"],
+            "checksum": cached["checksum"],
+        }
 
     async def file_exists(self, path: str) -> bool:
         """Return True if a file with a given path exists"""
-        return self.file_exists_sync(path)
+        return await self._run(self.file_exists_sync, path)
 
     def file_exists_sync(self, path: str) -> bool:
         """Return True if a file with a given path exists"""
         absolute_path = Path(path)
         return absolute_path.exists()
 
-    def remove_file(self, path: str) -> bool:
-        absolute_path = Path(path)
+    def _remove_file(self, path: str) -> bool:
         try:
-            os.remove(absolute_path)
+            os.remove(Path(path))
         except Exception as ex:
             return False
         return True
+
+    async def remove_file(self, path: str) -> bool:
+        """Remove a file if exsits"""
+        self._invalidate(path)
+        return await self._run(self._remove_file, path)
+
+    async def file_size(self, path: str) -> int:
+        """Return size of a file in bytes, 0 if it does not exist"""
+        try:
+            st = await self._run(os.stat, path)
+        except FileNotFoundError:
+            return 0
+        return st.st_size
+
+    def _rename_file(self, src: str, dst: str) -> None:
+        Path(dst).parent.mkdir(exist_ok=True, parents=True)
+        os.replace(src, dst)
+
+    async def rename_file(self, src: str, dst: str) -> str:
+        """Move a file to dst, replacing it if it exists, return dst"""
+        await self._run(self._rename_file, src, dst)
+        cached: Optional[Dict] = self._stat_cache.pop(str(src), None)
+        self._invalidate(dst)
+        if cached is not None:
+            # a rename keeps size and mtime, so the entry stays valid
+            self._stat_cache[str(dst)] = cached
+        return str(dst)
+
+    def _read(self, path: str, size: int, offset: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    async def read(self, path: str, size: int = -1, offset: int = 0) -> bytes:
+        """Read size bytes of a file from offset, -1 to read to the end"""
+        return await self._run(self._read, path, size, offset)
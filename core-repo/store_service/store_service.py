@@ -1,20 +1,25 @@
-from typing import AsyncIterator, Dict, Protocol
+from typing import AsyncIterator, Dict, Iterable, Protocol, Union
 
 
 class StoreService(Protocol):
+    # whether persist_file can write from an offset, so a write can be resumed
+    can_append: bool = False
+
     async def persist_file(
         self,
         path: str,
         async_iter: AsyncIterator[bytes] = None,
         is_large: bool = False,
         meta: Dict = None,
+        offset: int = None,
     ) -> str:
-        """Save a file to store return path"""
+        """Save a file to store return path, writing from offset if given and
+        can_append"""
 
     def persist_file_sync(
-        self, path: str, data: bytes = None, meta: Dict = None
+        self, path: str, data: Union[bytes, Iterable[bytes]] = None, meta: Dict = None
     ) -> str:
-        """Save a file to store return path"""
+        """Save a file, given as bytes or an iterable of chunks, return path"""
 
     async def stat_file(self, path) -> Dict[str, str]:
         """Return stat of a file"""
@@ -27,3 +32,12 @@ class StoreService(Protocol):
 
     async def remove_file(self, path: str) -> bool:
         """Remove a file if exsits"""
+
+    async def file_size(self, path: str) -> int:
+        """Return size of a file in bytes, 0 if it does not exist"""
+
+    async def rename_file(self, src: str, dst: str) -> str:
+        """Move a file to dst, replacing it if it exists, return dst"""
+
+    async def read(self, path: str, size: int = -1, offset: int = 0) -> bytes:
+        """Read size bytes of a file from offset, -1 to read to the end"""
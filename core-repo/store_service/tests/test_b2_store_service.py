@@ -43,6 +43,7 @@ async def run_before_and_after_tests(store_service: StoreService):
         store_service.bucket.delete_file_version(
             file_version.id_, file_version.file_name
         )
+    await store_service.close()
 
 
 def test_persist_file_sync_successful(store_service: StoreService, test_filename: str):
@@ -88,6 +89,39 @@ async def test_store_service_file_exists_not_exist(
     assert await store_service.file_exists("abc") == False
 
 
+async def test_persist_file_reuses_client(
+    store_service: StoreService, test_filename: str
+):
+    async def get_aiter():
+        yield b"test content"
+
+    await store_service.persist_file(test_filename, get_aiter())
+    client = store_service._client
+    await store_service.persist_file(test_filename, get_aiter())
+    assert store_service._client is client
+
+
+async def test_store_service_stat_file(store_service: StoreService, test_filename: str):
+    stat = await store_service.stat_file(test_filename)
+    assert stat["checksum"] == "1eebdf4fdc9fc7bf283031b93f9aef3338de9052"
+    assert await store_service.stat_file("abc") == {}
+
+
+async def test_store_service_read(store_service: StoreService, test_filename: str):
+    assert await store_service.read(test_filename) == b"test content"
+    assert await store_service.read(test_filename, 4, 5) == b"cont"
+    assert await store_service.file_size(test_filename) == len(b"test content")
+
+
+async def test_store_service_read_json_as_bytes(store_service: StoreService):
+    async def get_aiter():
+        yield b'{"a": 1}'
+
+    await store_service.persist_file("test_file.json", get_aiter())
+    assert await store_service.read("test_file.json") == b'{"a": 1}'
+    assert await store_service.read("test_file.json", 4, 8) == b""
+
+
 async def test_store_service_remove_file_successful(
     store_service: StoreService, test_filename: str
 ):
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import pytest
+
+from aiob2 import File
+from typing import Dict, List
+
+from store_service.b2_uploader import B2Uploader
+
+PART_SIZE = 1024
+LARGE_FILE_ID = "large_file_id"
+
+
+def file_payload(name: str, data: bytes) -> Dict:
+    return {
+        "accountId": "account",
+        "action": "upload",
+        "bucketId": "bucket",
+        "contentLength": len(data),
+        "contentSha1": hashlib.sha1(data).hexdigest(),
+        "contentType": "b2/x-auto",
+        "fileId": f"{name}_id",
+        "fileInfo": {},
+        "fileName": name,
+        "uploadTimestamp": 0,
+    }
+
+
+class FakeB2:
+    """B2's native API for large files, and the aiob2 client for small ones"""
+
+    def __init__(self, fail_part: int = None):
+        self.fail_part = fail_part
+        self.parts: Dict[int, bytes] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.upload_urls = 0
+        self.cancelled: List[str] = []
+        self.uploaded: Dict[str, bytes] = {}
+
+    async def request(self, api: str, data: Dict) -> Dict:
+        if api == "b2_start_large_file":
+            assert data["bucketId"] == "bucket"
+            return {"fileId": LARGE_FILE_ID}
+        assert data["fileId"] == LARGE_FILE_ID
+        if api == "b2_get_upload_part_url":
+            self.upload_urls += 1
+            return {
+                "uploadUrl": f"https://upload/{self.upload_urls}",
+                "authorizationToken": "token",
+            }
+        if api == "b2_finish_large_file":
+            parts = [self.parts[idx] for idx in sorted(self.parts)]
+            assert data["partSha1Array"] == [
+                hashlib.sha1(part).hexdigest() for part in parts
+            ]
+            return file_payload("large", b"".join(parts))
+        if api == "b2_cancel_large_file":
+            self.cancelled.append(data["fileId"])
+            return {}
+        raise AssertionError(api)
+
+    async def post(self, url: str, headers: Dict, data: bytes) -> Dict:
+        assert headers["Authorization"] == "token"
+        sha1 = headers["X-Bz-Content-Sha1"]
+        assert hashlib.sha1(data).hexdigest() == sha1
+        part_number = int(headers["X-Bz-Part-Number"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if part_number == self.fail_part:
+            raise RuntimeError("part upload failed")
+        self.parts[part_number] = bytes(data)
+        return {"partNumber": part_number, "contentSha1": sha1}
+
+    async def upload_file(
+        self, file_name: str, content_bytes: bytes, bucket_id: str
+    ) -> File:
+        self.uploaded[file_name] = bytes(content_bytes)
+        return File(file_payload(file_name, content_bytes))
+
+
+def create_uploader(b2: FakeB2, **kwargs) -> B2Uploader:
+    return B2Uploader(b2, "bucket", b2.request, b2.post, **kwargs)
+
+
+async def byte_iter(data: bytes, chunk_size: int):
+    for idx in range(0, len(data), chunk_size):
+        yield data[idx : idx + chunk_size]
+
+
+@pytest.fixture
+def data() -> bytes:
+    return bytes(range(256)) * 40
+
+
+async def test_upload_small_file(data: bytes):
+    b2 = FakeB2()
+    result = await create_uploader(b2).upload("small", byte_iter(data, 7))
+    assert result.name == "small"
+    assert b2.uploaded["small"] == data
+
+
+async def test_upload_large_file_in_parts(data: bytes):
+    b2 = FakeB2()
+    uploader = create_uploader(b2, part_size=PART_SIZE, max_concurrency=3)
+    result = await uploader.upload("large", byte_iter(data, 300), is_large=True)
+
+    assert result.content_length == len(data)
+    assert result.content_sha1 == hashlib.sha1(data).hexdigest()
+    assert [len(b2.parts[idx]) for idx in sorted(b2.parts)] == [1024] * 10
+    assert b2.max_in_flight == 3
+    # upload urls are reused once their part is done
+    assert b2.upload_urls == 3
+
+
+async def test_upload_large_file_last_part_is_never_empty():
+    data = b"0" * (PART_SIZE * 2)
+    b2 = FakeB2()
+    uploader = create_uploader(b2, part_size=PART_SIZE)
+    await uploader.upload("large", byte_iter(data, 5000), is_large=True)
+    assert sorted(b2.parts) == [1, 2]
+
+
+async def test_upload_large_file_with_one_part_falls_back(data: bytes):
+    b2 = FakeB2()
+    uploader = create_uploader(b2, part_size=len(data))
+    await uploader.upload("large", byte_iter(data, 100), is_large=True)
+    assert b2.uploaded["large"] == data
+    assert not b2.parts
+
+
+async def test_upload_large_file_cancels_on_failure(data: bytes):
+    b2 = FakeB2(fail_part=2)
+    uploader = create_uploader(b2, part_size=PART_SIZE, max_concurrency=2)
+    with pytest.raises(RuntimeError):
+        await uploader.upload("large", byte_iter(data, PART_SIZE), is_large=True)
+    assert b2.cancelled == [LARGE_FILE_ID]
+    assert len(b2.parts) < 10
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+from store_service import CASStoreService, cas_store_service
+from store_service.dedup_report import scan
+
+
+async def chunks(*data: bytes):
+    for d in data:
+        yield d
+
+
+def digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def store_service(tmp_path) -> CASStoreService:
+    return CASStoreService(str(tmp_path / ".blobs"))
+
+
+async def test_cas_store_stores_same_content_once(
+    store_service: CASStoreService, tmp_path
+):
+    first, second = tmp_path / "a" / "0.jpg", tmp_path / "b" / "0.jpg"
+    await store_service.persist_file(str(first), chunks(b"page", b" 1"))
+    await store_service.persist_file(str(second), chunks(b"page 1"))
+
+    assert first.read_bytes() == second.read_bytes() == b"page 1"
+    assert first.stat().st_ino == second.stat().st_ino
+    assert store_service.refcount(digest(b"page 1")) == 2
+    assert os.listdir(store_service.tmp_path) == []
+
+
+async def test_cas_store_remove_file_releases_blob(
+    store_service: CASStoreService, tmp_path
+):
+    first, second = str(tmp_path / "0.jpg"), str(tmp_path / "1.jpg")
+    store_service.persist_file_sync(first, b"page")
+    store_service.persist_file_sync(second, b"page")
+
+    assert await store_service.remove_file(first)
+    assert store_service.refcount(digest(b"page")) == 1
+    assert await store_service.remove_file(second)
+    assert not store_service.blob_of(digest(b"page")).exists()
+
+
+async def test_cas_store_overwrite_releases_old_blob(
+    store_service: CASStoreService, tmp_path
+):
+    path = str(tmp_path / "0.jpg")
+    await store_service.persist_file(path, chunks(b"old"))
+    await store_service.persist_file(path, chunks(b"new"))
+    await store_service.persist_file(path, chunks(b"new"))
+
+    assert not store_service.blob_of(digest(b"old")).exists()
+    assert store_service.refcount(digest(b"new")) == 1
+    assert sorted(os.listdir(tmp_path)) == [".blobs", "0.jpg"]
+    stat = await store_service.stat_file(path)
+    assert stat["checksum"] == hashlib.md5(b"new").hexdigest()
+
+
+async def test_cas_store_finds_blob_by_recorded_digest(
+    store_service: CASStoreService, tmp_path, monkeypatch
+):
+    path = str(tmp_path / "0.jpg")
+    await store_service.persist_file(path, chunks(b"old"))
+
+    def fail(path):
+        raise AssertionError(f"{path} was hashed again")
+
+    monkeypatch.setattr(cas_store_service, "sha256sum", fail)
+    await store_service.persist_file(path, chunks(b"new"))
+    assert not store_service.blob_of(digest(b"old")).exists()
+    assert await store_service.remove_file(path)
+    assert not store_service.blob_of(digest(b"new")).exists()
+
+
+async def test_cas_store_hashes_files_it_did_not_write(tmp_path):
+    path = str(tmp_path / "0.jpg")
+    CASStoreService(str(tmp_path / ".blobs")).persist_file_sync(path, b"page")
+    store_service = CASStoreService(str(tmp_path / ".blobs"))
+
+    assert await store_service.remove_file(path)
+    assert not store_service.blob_of(digest(b"page")).exists()
+
+
+async def test_cas_store_write_from_offset_does_not_change_blob(
+    store_service: CASStoreService, tmp_path
+):
+    first, second = str(tmp_path / "0.jpg"), str(tmp_path / "1.jpg")
+    store_service.persist_file_sync(first, b"0123456789")
+    store_service.persist_file_sync(second, b"0123456789")
+    await store_service.persist_file(second, chunks(b"abc"), offset=4)
+
+    assert await store_service.read(first) == b"0123456789"
+    assert await store_service.read(second) == b"0123abc"
+    assert store_service.refcount(digest(b"0123456789")) == 1
+
+
+async def test_cas_store_collect_garbage(store_service: CASStoreService, tmp_path):
+    path = tmp_path / "0.jpg"
+    store_service.persist_file_sync(str(path), b"page")
+    os.remove(path)
+
+    assert store_service.collect_garbage() == 1
+    assert not store_service.blob_of(digest(b"page")).exists()
+
+
+async def test_cas_store_collect_garbage_every(
+    store_service: CASStoreService, tmp_path
+):
+    path = tmp_path / "0.jpg"
+    store_service.persist_file_sync(str(path), b"page")
+    os.remove(path)
+
+    task = asyncio.create_task(store_service.collect_garbage_every(0.01))
+    await asyncio.sleep(0.1)
+    task.cancel()
+    assert not store_service.blob_of(digest(b"page")).exists()
+
+
+async def test_dedup_report_counts_linked_files_once(
+    store_service: CASStoreService, tmp_path
+):
+    store_service.persist_file_sync(str(tmp_path / "a" / "0.jpg"), b"page")
+    store_service.persist_file_sync(str(tmp_path / "b" / "0.jpg"), b"page")
+    (tmp_path / "c").mkdir()
+    (tmp_path / "c" / "0.jpg").write_bytes(b"page")
+    (tmp_path / "c" / "1.jpg").write_bytes(b"other")
+
+    report = scan(tmp_path)
+
+    assert report.files == 4
+    assert report.logical_bytes == 17
+    assert report.stored_bytes == 13
+    assert report.unique_bytes == 9
+    assert report.saving_bytes == 4
+    assert len(report.duplicates[digest(b"page")]) == 3
@@ -1,5 +1,10 @@
+import hashlib
+import os
+from unittest.mock import patch
+
 import pytest
 from store_service import FSStoreService as StoreService
+from store_service.fs_store_service import md5sum
 
 
 @pytest.fixture(scope="module")
@@ -23,14 +28,93 @@ async def test_fs_store_read(store_service: StoreService, test_filename: str):
     assert await store_service.read(test_filename) == b"test content"
 
 
-def test_fs_store_service_remove_file_successful(
+async def test_fs_store_service_remove_file_successful(
     store_service: StoreService, test_filename: str
 ):
-    assert store_service.remove_file(test_filename)
+    assert await store_service.remove_file(test_filename)
     assert store_service.file_exists_sync(test_filename) == False
 
 
-def test_fs_store_service_remove_file_fail(store_service: StoreService):
+async def test_fs_store_service_remove_file_fail(store_service: StoreService):
     test_filename = "123"
     assert store_service.file_exists_sync(test_filename) == False
-    assert store_service.remove_file(test_filename) == False
+    assert await store_service.remove_file(test_filename) == False
+
+
+async def chunks(*data: bytes):
+    for d in data:
+        yield d
+
+
+async def test_fs_store_persist_file_checksums_while_writing(
+    store_service: StoreService, tmp_path
+):
+    path = str(tmp_path / "sub" / "file.bin")
+    await store_service.persist_file(path, chunks(b"a" * 300_000, b"b" * 10))
+
+    with open(path, "rb") as f:
+        assert f.read() == b"a" * 300_000 + b"b" * 10
+    with open(path, "rb") as f:
+        checksum = md5sum(f)
+    assert (await store_service.stat_file(path))["checksum"] == checksum
+    assert os.listdir(tmp_path / "sub") == ["file.bin"]
+
+
+async def test_fs_store_stat_file_is_cached(store_service: StoreService, tmp_path):
+    path = str(tmp_path / "file.txt")
+    store_service.persist_file_sync(path, b"content")
+
+    with patch.object(store_service, "_checksum") as checksum:
+        stat = await store_service.stat_file(path)
+    checksum.assert_not_called()
+    assert stat["checksum"] == hashlib.md5(b"content").hexdigest()
+
+
+async def test_fs_store_stat_file_notices_external_change(
+    store_service: StoreService, tmp_path
+):
+    path = str(tmp_path / "file.txt")
+    store_service.persist_file_sync(path, b"content")
+    with open(path, "wb") as f:
+        f.write(b"changed content")
+
+    stat = await store_service.stat_file(path)
+    assert stat["checksum"] == hashlib.md5(b"changed content").hexdigest()
+
+
+async def test_fs_store_persist_file_failure_keeps_old_file(
+    store_service: StoreService, tmp_path
+):
+    path = str(tmp_path / "file.txt")
+    store_service.persist_file_sync(path, b"old")
+
+    async def failing():
+        yield b"new"
+        raise ValueError()
+
+    with pytest.raises(ValueError):
+        await store_service.persist_file(path, failing())
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(tmp_path) == ["file.txt"]
+
+
+async def test_fs_store_persist_file_from_offset(store_service: StoreService, tmp_path):
+    path = str(tmp_path / "file.txt")
+    await store_service.persist_file(path, chunks(b"0123456789"))
+    await store_service.persist_file(path, chunks(b"abc"), offset=4)
+
+    assert await store_service.read(path) == b"0123abc"
+    stat = await store_service.stat_file(path)
+    assert stat["checksum"] == hashlib.md5(b"0123abc").hexdigest()
+
+
+async def test_fs_store_rename_file_keeps_stat(store_service: StoreService, tmp_path):
+    src, dst = str(tmp_path / "a.txt"), str(tmp_path / "b" / "b.txt")
+    store_service.persist_file_sync(src, b"content")
+    await store_service.rename_file(src, dst)
+
+    assert await store_service.stat_file(src) == {}
+    assert (await store_service.stat_file(dst))["checksum"] == hashlib.md5(
+        b"content"
+    ).hexdigest()
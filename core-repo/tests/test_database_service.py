@@ -0,0 +1,16 @@
+from sqlalchemy import text
+
+from database import DatabaseService
+
+
+async def test_pool_status(database: DatabaseService):
+    async with database.session() as session:
+        async with session.begin():
+            await session.execute(text("SELECT 1"))
+            status = database.pool_status()
+            assert status["checked_out"] >= 1
+
+    status = database.pool_status()
+    assert "pool_class" in status
+    assert status["idle"] >= 1
+    assert status["checked_out"] == 0
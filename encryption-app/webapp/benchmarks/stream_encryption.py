@@ -0,0 +1,82 @@
+"""Peak RSS and throughput of whole-file Fernet versus the framed stream format.
+
+Each mode runs in its own process so its peak RSS is not mixed with the
+other's. whole is the old FernetEncryptService path: read the file, encrypt it
+with one fernet.encrypt call, write the token out.
+
+    PYTHONPATH=.:../../core-repo python benchmarks/stream_encryption.py --size-mb 512
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from cryptography.fernet import Fernet
+from pathlib import Path
+
+from core.stream_encryption import decrypt_iter, encrypt_iter
+
+READ_SIZE = 1024 * 1024
+
+
+def _read_chunks(path: Path):
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_SIZE):
+            yield chunk
+
+
+def _write_chunks(path: Path, chunks) -> None:
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+def run_mode(mode: str, src: Path, key: bytes) -> None:
+    encrypted, decrypted = src.with_suffix(".enc"), src.with_suffix(".dec")
+    start = time.perf_counter()
+    if mode == "whole":
+        fernet = Fernet(key)
+        encrypted.write_bytes(fernet.encrypt(src.read_bytes()))
+        decrypted.write_bytes(fernet.decrypt(encrypted.read_bytes()))
+    else:
+        _write_chunks(encrypted, encrypt_iter(key, _read_chunks(src)))
+        _write_chunks(decrypted, decrypt_iter(key, _read_chunks(encrypted)))
+    elapsed = time.perf_counter() - start
+
+    size_mb = src.stat().st_size / 1024 / 1024
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"{mode:>6}: {2 * size_mb / elapsed:.1f} MB/s (encrypt + decrypt) "
+        f"peak_rss={peak_mb:.0f}MB "
+        f"output={encrypted.stat().st_size / 1024 / 1024:.0f}MB"
+    )
+
+
+def main(size_mb: int) -> None:
+    key = Fernet.generate_key()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src = Path(tmp_dir) / "src.bin"
+        with open(src, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(1024 * 1024))
+        for mode in ("whole", "stream"):
+            subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--src", str(src)],
+                input=key,
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--mode", choices=["whole", "stream"])
+    parser.add_argument("--src", type=Path)
+    args = parser.parse_args()
+    if args.mode:
+        run_mode(args.mode, args.src, sys.stdin.buffer.read())
+    else:
+        main(args.size_mb)
@@ -0,0 +1,115 @@
+"""Latency from upload to B2 availability, with and without encrypt on upload.
+
+job is the path through the encryption job: post_file writes the plaintext
+with blocking writes on the event loop, a worker encrypts it into another
+file, and the uploader reads that whole file into memory to upload it.
+on_upload encrypts while receiving, writes once off the event loop and the
+uploader streams the file. B2 is a sink that consumes the bytes, optionally
+throttled to --upload-mbps. Queue hops are left out.
+
+The largest event loop stall seen during each run is reported too, a stand-in
+for how long other requests to the web app were held up.
+
+    PYTHONPATH=.:../../core-repo python benchmarks/upload_pipeline.py --size-mb 256
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from cryptography.fernet import Fernet
+from pathlib import Path
+from typing import AsyncIterator
+
+from core.fernet_encrypt_service import FernetEncryptService
+from store_service import FSStoreService
+
+REQUEST_CHUNK = 4 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+
+
+async def request_body(data: bytes) -> AsyncIterator[bytes]:
+    for idx in range(0, len(data), REQUEST_CHUNK):
+        yield data[idx : idx + REQUEST_CHUNK]
+        await asyncio.sleep(0)
+
+
+async def b2_sink(chunks: AsyncIterator[bytes], mbps: float) -> int:
+    total = 0
+    async for chunk in chunks:
+        total += len(chunk)
+        if mbps:
+            await asyncio.sleep(len(chunk) / (mbps * 1024 * 1024))
+    return total
+
+
+async def _single(data: bytes) -> AsyncIterator[bytes]:
+    yield data
+
+
+async def read_chunks(path: Path) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, READ_SIZE):
+            yield chunk
+
+
+async def via_job(tmp: Path, data: bytes, key: bytes, mbps: float) -> None:
+    uploaded, encrypted = tmp / "uploaded.bin", tmp / "encrypted.bin"
+    with open(uploaded, "wb") as f:
+        async for chunk in request_body(data):
+            f.write(chunk)
+    encrypt_service = FernetEncryptService(FSStoreService())
+    await asyncio.to_thread(encrypt_service.encrypt_file_sync, key, uploaded, encrypted)
+    await b2_sink(_single(encrypted.read_bytes()), mbps)
+
+
+async def on_upload(tmp: Path, data: bytes, key: bytes, mbps: float) -> None:
+    encrypted = tmp / "encrypted.bin"
+    store_service = FSStoreService()
+    encrypt_service = FernetEncryptService(store_service)
+    await store_service.persist_file(
+        str(encrypted),
+        encrypt_service.encrypt_stream(key, request_body(data)),
+        is_large=True,
+    )
+    await b2_sink(read_chunks(encrypted), mbps)
+
+
+async def run(mode, data: bytes, key: bytes, mbps: float) -> None:
+    max_stall = 0.0
+    running = True
+
+    async def watch_loop():
+        nonlocal max_stall
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            max_stall = max(max_stall, time.perf_counter() - start - 0.001)
+
+    watcher = asyncio.create_task(watch_loop())
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        await mode(Path(tmp_dir), data, key, mbps)
+        elapsed = time.perf_counter() - start
+    running = False
+    await watcher
+    print(
+        f"{mode.__name__:>10}: {elapsed * 1000:8.0f} ms to B2, "
+        f"max loop stall {max_stall * 1000:6.1f} ms"
+    )
+
+
+async def main(size_mb: int, mbps: float) -> None:
+    data = os.urandom(size_mb * 1024 * 1024)
+    key = Fernet.generate_key()
+    for mode in (via_job, on_upload):
+        await run(mode, data, key, mbps)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--upload-mbps", type=float, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.size_mb, args.upload_mbps))
@@ -6,6 +6,7 @@ from fastapi_sessions.frontends.implementations import SessionCookie, CookiePara
 from fastapi_sessions.backends.implementations import InMemoryBackend
 from logging import config as log_config, getLogger
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from sqlalchemy import orm
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from uuid import UUID
@@ -16,7 +17,7 @@ from core.key_management_service import KeyManagementService
 from database import DatabaseService
 from database import CRUDService
 
-from queue_service import RedisQueueService
+from queue_service import AsyncRedisQueueService
 from queue_service.messages import EncryptMessage
 from session import RedisBackend
 from session import BasicVerifier, SessionData
@@ -90,12 +91,14 @@ class Container(containers.DeclarativeContainer):
 
     redis = providers.Singleton(Redis, host=config.redis.url)
 
+    async_redis = providers.Singleton(AsyncRedis, host=config.redis.url)
+
     redis_queue_service = providers.Singleton(
-        RedisQueueService, redis, EncryptMessage, 0
+        AsyncRedisQueueService, async_redis, EncryptMessage, 0
     )
 
     session_backend = providers.Singleton(
-        RedisBackend[UUID, SessionData], redis=redis, identifier="encryption_app"
+        RedisBackend[UUID, SessionData], redis=async_redis, identifier="encryption_app"
     )
 
     auth_http_exception = providers.Singleton(
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Protocol
+from typing import AsyncIterator, Protocol
 
 
 class EncryptService(Protocol):
@@ -20,3 +20,16 @@ class EncryptService(Protocol):
 
     def decrypt_file_sync(self, key: bytes, src_file: Path, dest_file: Path) -> bool:
         """"""
+
+    def encrypt_stream(
+        self, key: bytes, async_iter: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """"""
+
+    def decrypt_stream(
+        self, key: bytes, async_iter: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """"""
+
+    async def decrypt_chunk(self, key: bytes, src_file: Path, index: int) -> bytes:
+        """"""
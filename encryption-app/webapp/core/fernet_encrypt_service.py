@@ -1,80 +1,118 @@
+from logging import getLogger
 from pathlib import Path
-from typing import Callable
+from typing import AsyncIterator, Callable, Iterable, Iterator
 
 from store_service.store_service import StoreService
 from .encrypt_service import EncryptService
+from .stream_encryption import (
+    DEFAULT_CHUNK_SIZE,
+    HEADER,
+    chunk_offset,
+    decrypt_chunk,
+    decrypt_iter,
+    decrypt_stream,
+    encrypt_iter,
+    encrypt_stream,
+)
 from cryptography.fernet import Fernet
 
+logger = getLogger(__name__)
+
+
+def _read_chunks(
+    src_file: Path, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    with open(src_file, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
 
 class FernetEncryptService(EncryptService):
+    """Encrypt files with a user's Fernet key.
+
+    Files are written in the framed format of core.stream_encryption, which is
+    processed chunk by chunk instead of holding the whole file in memory.
+    Decryption still accepts files encrypted as a single Fernet token."""
+
     def __init__(self, store_service: StoreService):
         self.store_service = store_service
 
     async def __process_file(
-        self, src_file: Path, dest_file: Path, process_func: Callable
+        self,
+        src_file: Path,
+        dest_file: Path,
+        process_func: Callable[[bytes, AsyncIterator[bytes]], AsyncIterator[bytes]],
+        key: bytes,
     ) -> bool:
         """"""
         try:
-            # opening the original file to encrypt
-            with open(src_file, "rb") as file:
-                original = file.read()
 
-            # encrypting the file
-            encrypted = process_func(original)
-
-            # opening the file in write mode and
-            # writing the encrypted data
             async def byte_iter():
-                yield encrypted
+                for chunk in _read_chunks(src_file):
+                    yield chunk
 
-            await self.store_service.persist_file(dest_file, byte_iter())
+            await self.store_service.persist_file(
+                str(dest_file), process_func(key, byte_iter()), is_large=True
+            )
 
             return True
         except Exception as ex:
-            print(ex)
+            logger.exception(ex)
             return False
 
     def __process_file_sync(
-        self, src_file: Path, dest_file: Path, process_func: Callable
+        self,
+        src_file: Path,
+        dest_file: Path,
+        process_func: Callable[[bytes, Iterable[bytes]], Iterator[bytes]],
+        key: bytes,
     ) -> bool:
         """"""
         try:
-            # opening the original file to encrypt
-            with open(src_file, "rb") as file:
-                original = file.read()
-
-            # encrypting the file
-            encrypted = process_func(original)
-
-            # opening the file in write mode and
-            # writing the encrypted data
-
-            self.store_service.persist_file_sync(dest_file, encrypted)
+            self.store_service.persist_file_sync(
+                str(dest_file), process_func(key, _read_chunks(src_file))
+            )
 
             return True
         except Exception as ex:
-            print(ex)
+            logger.exception(ex)
             return False
 
     def encrypt_file_sync(self, key: bytes, src_file: Path, dest_file: Path) -> bool:
         """"""
-        fernet = Fernet(key)
-        return self.__process_file_sync(src_file, dest_file, fernet.encrypt)
+        return self.__process_file_sync(src_file, dest_file, encrypt_iter, key)
 
     def decrypt_file_sync(self, key: bytes, src_file: Path, dest_file: Path) -> bool:
         """"""
-        fernet = Fernet(key)
-        return self.__process_file_sync(src_file, dest_file, fernet.decrypt)
+        return self.__process_file_sync(src_file, dest_file, decrypt_iter, key)
 
     async def encrypt_file(self, key: bytes, src_file: Path, dest_file: Path) -> bool:
         """"""
-        fernet = Fernet(key)
-        return await self.__process_file(src_file, dest_file, fernet.encrypt)
+        return await self.__process_file(src_file, dest_file, encrypt_stream, key)
 
     async def decrypt_file(self, key: bytes, src_file: Path, dest_file: Path) -> bool:
         """"""
-        fernet = Fernet(key)
-        return await self.__process_file(src_file, dest_file, fernet.decrypt)
+        return await self.__process_file(src_file, dest_file, decrypt_stream, key)
+
+    def encrypt_stream(
+        self, key: bytes, async_iter: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """Encrypt a stream of plaintext chunks into the framed format"""
+        return encrypt_stream(key, async_iter)
+
+    def decrypt_stream(
+        self, key: bytes, async_iter: AsyncIterator[bytes]
+    ) -> AsyncIterator[bytes]:
+        """Decrypt a stream in the framed format or a legacy Fernet token"""
+        return decrypt_stream(key, async_iter)
+
+    async def decrypt_chunk(self, key: bytes, src_file: Path, index: int) -> bytes:
+        """Decrypt chunk index of a file, reading only its header and that chunk"""
+        header = await self.store_service.read(str(src_file), HEADER.size)
+        offset = chunk_offset(header, index)
+        size = chunk_offset(header, index + 1) - offset
+        frame = await self.store_service.read(str(src_file), size, offset)
+        return decrypt_chunk(key, header, frame, index)
 
     def generate_key(self) -> bytes:
         """"""
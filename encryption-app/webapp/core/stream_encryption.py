@@ -0,0 +1,291 @@
+import base64
+import os
+import struct
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from typing import AsyncIterator, BinaryIO, Iterable, Iterator
+
+# header: magic, version, chunk size, salt of the per-file key
+MAGIC = b"TBSE"
+VERSION = 1
+HEADER = struct.Struct(">4sBI16s")
+# frame: length with the final flag in the top bit, then ciphertext and tag
+FRAME_LENGTH = struct.Struct(">I")
+FINAL_FLAG = 0x80000000
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+# the watchdog job used to write one Fernet token per 4 KiB of plaintext,
+# concatenated, every token but the last one this long
+LEGACY_CHUNK_TOKEN_SIZE = 5560
+
+
+class StreamFormatError(ValueError):
+    pass
+
+
+def is_stream_encrypted(data: bytes) -> bool:
+    """Check whether data starts with the header of the framed format"""
+    return data[: len(MAGIC)] == MAGIC
+
+
+def frame_size(chunk_size: int) -> int:
+    """Size of every frame but the last one, which may be shorter"""
+    return FRAME_LENGTH.size + chunk_size + TAG_SIZE
+
+
+def _parse_header(header: bytes):
+    if len(header) < HEADER.size:
+        raise StreamFormatError("header is truncated")
+    magic, version, chunk_size, salt = HEADER.unpack_from(header)
+    if magic != MAGIC:
+        raise StreamFormatError("not a stream encrypted file")
+    if version != VERSION:
+        raise StreamFormatError(f"unsupported version {version}")
+    return chunk_size, salt
+
+
+def _derive_key(key: bytes, salt: bytes) -> AESGCM:
+    """AES-256-GCM key of one file, derived from the user's Fernet key"""
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b"tb-project stream encryption v1",
+    )
+    return AESGCM(hkdf.derive(base64.urlsafe_b64decode(key)))
+
+
+def _nonce(seq: int, final: bool) -> bytes:
+    # the final flag is part of the nonce so a truncated stream cannot end on a
+    # chunk that was not encrypted as the last one
+    return seq.to_bytes(11, "big") + (b"\x01" if final else b"\x00")
+
+
+class StreamEncryptor:
+    """Encrypt a byte stream into authenticated chunks of chunk_size bytes.
+
+    Every chunk is sealed with AES-GCM under a nonce made of its sequence
+    number and a final flag, with the header as associated data, so chunks
+    cannot be reordered, dropped, or cut off without decryption failing."""
+
+    def __init__(self, key: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        salt = os.urandom(16)
+        self.header = HEADER.pack(MAGIC, VERSION, chunk_size, salt)
+        self._aead = _derive_key(key, salt)
+        self._buffer = bytearray()
+        self._seq = 0
+        self._started = False
+
+    def _seal(self, chunk: bytes, final: bool) -> bytes:
+        ciphertext = self._aead.encrypt(_nonce(self._seq, final), chunk, self.header)
+        self._seq += 1
+        length = len(ciphertext) | (FINAL_FLAG if final else 0)
+        return FRAME_LENGTH.pack(length) + ciphertext
+
+    def _start(self) -> bytes:
+        if self._started:
+            return b""
+        self._started = True
+        return self.header
+
+    def update(self, data: bytes) -> bytes:
+        """Take more plaintext, return the frames completed so far"""
+        out = bytearray(self._start())
+        self._buffer += data
+        # keep the last full chunk back, it may turn out to be the final one
+        while len(self._buffer) > self.chunk_size:
+            out += self._seal(bytes(self._buffer[: self.chunk_size]), False)
+            del self._buffer[: self.chunk_size]
+        return bytes(out)
+
+    def finalize(self) -> bytes:
+        out = self._start() + self._seal(bytes(self._buffer), True)
+        self._buffer = bytearray()
+        return out
+
+
+class StreamDecryptor:
+    def __init__(self, key: bytes):
+        self._key = key
+        self._buffer = bytearray()
+        self._header = None
+        self._aead = None
+        self._max_frame = 0
+        self._seq = 0
+        self._finished = False
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < HEADER.size:
+            return False
+        header = bytes(self._buffer[: HEADER.size])
+        chunk_size, salt = _parse_header(header)
+        del self._buffer[: HEADER.size]
+        self._header = header
+        self._aead = _derive_key(self._key, salt)
+        self._max_frame = chunk_size + TAG_SIZE
+        return True
+
+    def update(self, data: bytes) -> bytes:
+        """Take more ciphertext, return the plaintext of the frames completed"""
+        self._buffer += data
+        if self._header is None and not self._read_header():
+            return b""
+
+        out = bytearray()
+        while len(self._buffer) >= FRAME_LENGTH.size:
+            if self._finished:
+                raise StreamFormatError("data after the final chunk")
+            (length,) = FRAME_LENGTH.unpack_from(self._buffer)
+            final = bool(length & FINAL_FLAG)
+            length &= ~FINAL_FLAG
+            if length > self._max_frame:
+                raise StreamFormatError(f"chunk of {length} bytes is too large")
+            end = FRAME_LENGTH.size + length
+            if len(self._buffer) < end:
+                break
+            ciphertext = bytes(self._buffer[FRAME_LENGTH.size : end])
+            del self._buffer[:end]
+            try:
+                out += self._aead.decrypt(
+                    _nonce(self._seq, final), ciphertext, self._header
+                )
+            except InvalidTag:
+                raise StreamFormatError(f"chunk {self._seq} failed authentication")
+            self._seq += 1
+            self._finished = final
+        return bytes(out)
+
+    def finalize(self) -> bytes:
+        if not self._finished or self._buffer:
+            raise StreamFormatError("stream is truncated")
+        return b""
+
+
+def chunk_offset(header: bytes, index: int) -> int:
+    """Offset of the frame of chunk index, every frame before it is full size"""
+    chunk_size, _ = _parse_header(header)
+    return HEADER.size + index * frame_size(chunk_size)
+
+
+def decrypt_chunk(key: bytes, header: bytes, frame: bytes, index: int) -> bytes:
+    """Decrypt chunk index from its frame, read at chunk_offset(header, index).
+
+    frame may run past the end of the frame, e.g. a read of frame_size bytes.
+    Only the one chunk is authenticated, so this does not detect a file that
+    was truncated after it."""
+    if len(frame) < FRAME_LENGTH.size:
+        raise IndexError(f"chunk {index} is past the end of the file")
+    chunk_size, salt = _parse_header(header)
+    (length,) = FRAME_LENGTH.unpack_from(frame)
+    final = bool(length & FINAL_FLAG)
+    length &= ~FINAL_FLAG
+    if length > chunk_size + TAG_SIZE or len(frame) < FRAME_LENGTH.size + length:
+        raise StreamFormatError(f"chunk {index} is truncated or malformed")
+    ciphertext = frame[FRAME_LENGTH.size : FRAME_LENGTH.size + length]
+    try:
+        return _derive_key(key, salt).decrypt(
+            _nonce(index, final), ciphertext, header[: HEADER.size]
+        )
+    except InvalidTag:
+        raise StreamFormatError(f"chunk {index} failed authentication")
+
+
+def read_chunk(key: bytes, f: BinaryIO, index: int) -> bytes:
+    """Decrypt chunk index of an open file without reading the chunks before it"""
+    f.seek(0)
+    header = f.read(HEADER.size)
+    chunk_size, _ = _parse_header(header)
+    f.seek(chunk_offset(header, index))
+    return decrypt_chunk(key, header, f.read(frame_size(chunk_size)), index)
+
+
+def decrypt_legacy(key: bytes, data: bytes) -> bytes:
+    """Decrypt a whole-file Fernet token, or the concatenated 4 KiB tokens the
+    watchdog job wrote before it used the framed format"""
+    fernet = Fernet(key)
+    if len(data) > LEGACY_CHUNK_TOKEN_SIZE:
+        # try the split first, base64 decoding stops at the padding of the first
+        # token so decrypting concatenated tokens whole returns the first chunk
+        try:
+            return b"".join(
+                fernet.decrypt(data[idx : idx + LEGACY_CHUNK_TOKEN_SIZE])
+                for idx in range(0, len(data), LEGACY_CHUNK_TOKEN_SIZE)
+            )
+        except InvalidToken:
+            pass
+    return fernet.decrypt(data)
+
+
+def encrypt_iter(
+    key: bytes, chunks: Iterable[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    encryptor = StreamEncryptor(key, chunk_size)
+    for chunk in chunks:
+        if out := encryptor.update(chunk):
+            yield out
+    yield encryptor.finalize()
+
+
+def decrypt_iter(key: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Decrypt the framed format, or the Fernet tokens of older files"""
+    chunks = iter(chunks)
+    head = b""
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(MAGIC):
+            break
+
+    if not is_stream_encrypted(head):
+        yield decrypt_legacy(key, head + b"".join(chunks))
+        return
+
+    decryptor = StreamDecryptor(key)
+    if out := decryptor.update(head):
+        yield out
+    for chunk in chunks:
+        if out := decryptor.update(chunk):
+            yield out
+    decryptor.finalize()
+
+
+async def encrypt_stream(
+    key: bytes,
+    async_iter: AsyncIterator[bytes],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    encryptor = StreamEncryptor(key, chunk_size)
+    async for chunk in async_iter:
+        if out := encryptor.update(chunk):
+            yield out
+    yield encryptor.finalize()
+
+
+async def decrypt_stream(
+    key: bytes, async_iter: AsyncIterator[bytes]
+) -> AsyncIterator[bytes]:
+    """Decrypt the framed format, or the Fernet tokens of older files"""
+    head = b""
+    async for chunk in async_iter:
+        head += chunk
+        if len(head) >= len(MAGIC):
+            break
+
+    if not is_stream_encrypted(head):
+        token = bytearray(head)
+        async for chunk in async_iter:
+            token += chunk
+        yield decrypt_legacy(key, bytes(token))
+        return
+
+    decryptor = StreamDecryptor(key)
+    if out := decryptor.update(head):
+        yield out
+    async for chunk in async_iter:
+        if out := decryptor.update(chunk):
+            yield out
+    decryptor.finalize()
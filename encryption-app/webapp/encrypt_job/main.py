@@ -6,27 +6,27 @@ from logging import config, getLogger
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 
-from cryptography.fernet import Fernet
-
 from core.key_management_service import KeyManagementService
+from core.stream_encryption import DEFAULT_CHUNK_SIZE, encrypt_iter
 
 config.fileConfig("logging.conf")
 
 logger = getLogger(__name__)
-CHUNK_SIZE = 1024 * 4
+CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+
+
+def read_chunks(src_path: Path):
+    with open(src_path, "rb") as in_f:
+        while data := in_f.read(CHUNK_SIZE):
+            yield data
 
 
 def encrypt_file(key: str, src_path: Path, desk_path: Path):
     logger.info(f"going to encrypt file from {src_path} to {desk_path}")
-    fernet = Fernet(key)
 
     with open(desk_path, "wb") as out_f:
-        with open(src_path, "rb") as in_f:
-            while True:
-                data = in_f.read(CHUNK_SIZE)
-                if not data:
-                    break
-                out_f.write(fernet.encrypt(data))
+        for data in encrypt_iter(key, read_chunks(src_path), CHUNK_SIZE):
+            out_f.write(data)
 
 
 class FileCreatedEventHandler(FileSystemEventHandler):
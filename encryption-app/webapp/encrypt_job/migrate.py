@@ -0,0 +1,61 @@
+"""Re-encrypt files written before the framed format into it.
+
+Expects the layout the watchdog job writes, encrypted/<username>/<file>, and
+fetches each user's key from the key endpoint:
+
+    python -m encrypt_job.migrate ../data/encrypted
+"""
+
+import argparse
+import os
+from logging import config, getLogger
+from pathlib import Path
+
+from core.key_management_service import KeyManagementService
+from core.stream_encryption import (
+    MAGIC,
+    decrypt_legacy,
+    encrypt_iter,
+    is_stream_encrypted,
+)
+
+logger = getLogger(__name__)
+
+
+def migrate_file(key: bytes, path: Path) -> bool:
+    """Re-encrypt a legacy file in place, return False if it is already framed"""
+    with open(path, "rb") as f:
+        if is_stream_encrypted(f.read(len(MAGIC))):
+            return False
+        f.seek(0)
+        plaintext = decrypt_legacy(key, f.read())
+
+    tmp_path = path.with_name(f"{path.name}.migrating")
+    with open(tmp_path, "wb") as f:
+        for data in encrypt_iter(key, [plaintext]):
+            f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def migrate_dir(
+    encrypted_dir: Path, key_management_service: KeyManagementService
+) -> None:
+    for user_dir in sorted(p for p in encrypted_dir.iterdir() if p.is_dir()):
+        key = key_management_service.get_key(user_dir.name)
+        for path in sorted(p for p in user_dir.iterdir() if p.is_file()):
+            try:
+                if migrate_file(key, path):
+                    logger.info(f"migrated {path}")
+            except Exception:
+                logger.exception(f"failed to migrate {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("encrypted_dir", type=Path)
+    parser.add_argument("--key-url", default="http://localhost:60801/admin/key")
+    args = parser.parse_args()
+
+    config.fileConfig("logging.conf")
+    migrate_dir(args.encrypted_dir, KeyManagementService(args.key_url))
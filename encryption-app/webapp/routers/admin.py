@@ -5,9 +5,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from container import Container
 from core.encrypt_service import EncryptService
 from database import CRUDService
-from database.models import PrivateKey, User
+from database.models import User
 
-from routers.utils import get_db_session
+from routers.utils import get_db_session, get_or_create_key
 
 router = APIRouter()
 
@@ -28,14 +28,6 @@ async def key(
     session: AsyncSession = Depends(get_db_session),
 ):
     user_id = await crud_service.get_id_by_attr(session, User, "email", username)
-    db_private_key = await crud_service.get_item_by_attr(
-        session, PrivateKey, "user_id", user_id
-    )
-    if not db_private_key:
-        key = encrypt_service.generate_key().decode("utf8")
-        db_private_key = await crud_service.create_obj(
-            session, PrivateKey, user_id=user_id, key=str(key)
-        )
-    key = db_private_key.key
+    key = await get_or_create_key(session, crud_service, encrypt_service, user_id)
 
     return {"key": key}
@@ -7,13 +7,20 @@ from time import time
 from typing import List
 
 from container import Container
+from core.encrypt_service import EncryptService
 from core.models import File
 
 from database import CRUDService
 from database.models import User, File as DBFile
 from queue_service.messages import EncryptMessage
-from queue_service import RedisQueueService
-from routers.utils import get_db_session, get_user_id, get_session_data, get_user_name
+from queue_service import AsyncRedisQueueService
+from routers.utils import (
+    get_db_session,
+    get_or_create_key,
+    get_user_id,
+    get_session_data,
+    get_user_name,
+)
 from store_service.store_service import StoreService
 from session import SessionData
 
@@ -22,16 +29,20 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/token")
 
 
-def add_file_to_queue(
-    redis_queue_service: RedisQueueService,
+async def add_file_to_queue(
+    redis_queue_service: AsyncRedisQueueService,
     username: str,
     filename: str,
     queue_name: str,
+    encryption_success: bool = False,
 ) -> int:
     message = EncryptMessage(
-        start=time(), filename=f"{username}/{filename}", username=username
+        start=time(),
+        filename=f"{username}/{filename}",
+        username=username,
+        encryption_success=encryption_success,
     )
-    return redis_queue_service.add_message_to_queue(queue_name, message)
+    return await redis_queue_service.add_message_to_queue(queue_name, message)
 
 
 @router.post("/file")
@@ -42,10 +53,17 @@ async def post_file(
     username: str = Depends(get_user_name),
     user_id: str = Depends(get_user_id),
     crud_service: CRUDService = Depends(Provide[Container.crud_service]),
-    redis_queue_service: RedisQueueService = Depends(
+    redis_queue_service: AsyncRedisQueueService = Depends(
         Provide[Container.redis_queue_service]
     ),
     queue_name: str = Depends(Provide[Container.config.redis.encryption_job_in_queue]),
+    out_queue_name: str = Depends(
+        Provide[Container.config.redis.encryption_job_out_queue]
+    ),
+    encrypt_on_upload: bool = Depends(
+        Provide[Container.config.encrypt_service.encrypt_on_upload]
+    ),
+    encrypt_service: EncryptService = Depends(Provide[Container.encrypt_service]),
     session: AsyncSession = Depends(get_db_session),
 ):
     async def byte_gen():
@@ -54,7 +72,19 @@ async def post_file(
             yield data
             data = await file.read(4 * 1024 * 1024)
 
-    await store_service.persist_file(f"uploaded/{username}/{file.filename}", byte_gen())
+    if encrypt_on_upload:
+        # encrypt while receiving and hand the file straight to the uploader, so
+        # the plaintext never touches the disk and the encryption job is skipped
+        key = await get_or_create_key(session, crud_service, encrypt_service, user_id)
+        await store_service.persist_file(
+            f"encrypted/{username}/{file.filename}",
+            encrypt_service.encrypt_stream(key.encode("utf8"), byte_gen()),
+            is_large=True,
+        )
+    else:
+        await store_service.persist_file(
+            f"uploaded/{username}/{file.filename}", byte_gen()
+        )
     db_file = await crud_service.get_item_by_attrs(
         session, DBFile, user_id=user_id, filename=file.filename
     )
@@ -64,7 +94,18 @@ async def post_file(
             session, DBFile, user_id=user_id, filename=file.filename
         )
 
-    add_file_to_queue(redis_queue_service, username, file.filename, queue_name)
+    if encrypt_on_upload:
+        await add_file_to_queue(
+            redis_queue_service,
+            username,
+            file.filename,
+            out_queue_name,
+            encryption_success=True,
+        )
+    else:
+        await add_file_to_queue(
+            redis_queue_service, username, file.filename, queue_name
+        )
 
     return {"filename": file.filename, "file_id": db_file.id}
 
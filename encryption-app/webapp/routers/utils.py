@@ -7,7 +7,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from container import Container
 from database import CRUDService
 from database import DatabaseService
-from database.models import User
+from core.encrypt_service import EncryptService
+from database.models import PrivateKey, User
 from session import BasicVerifier, SessionData
 
 logger = getLogger(__name__)
@@ -75,3 +76,21 @@ async def get_user_id(
     crud_service: CRUDService = Depends(Provide[Container.crud_service]),
 ) -> int:
     return await crud_service.get_id_by_attr(session, User, "email", username)
+
+
+async def get_or_create_key(
+    session: AsyncSession,
+    crud_service: CRUDService,
+    encrypt_service: EncryptService,
+    user_id: int,
+) -> str:
+    """Return the private key of a user, generating one on first use"""
+    db_private_key = await crud_service.get_item_by_attr(
+        session, PrivateKey, "user_id", user_id
+    )
+    if not db_private_key:
+        key = encrypt_service.generate_key().decode("utf8")
+        db_private_key = await crud_service.create_obj(
+            session, PrivateKey, user_id=user_id, key=str(key)
+        )
+    return db_private_key.key
@@ -27,6 +27,7 @@ def event_loop(request):
 async def container() -> Container:
     container = Container()
     container.config.redis.encryption_job_in_queue.override("test_queue")
+    container.config.redis.encryption_job_out_queue.override("test_out_queue")
     return container
 
 
@@ -6,9 +6,12 @@ from redis import Redis
 from sqlalchemy import delete
 
 from container import Container
+from core.stream_encryption import decrypt_iter
 from database import DatabaseService
 from database import CRUDService
 from database.models import User, File, PrivateKey
+from queue_service.codec import decode_message
+from queue_service.messages import EncryptMessage
 from routers.utils import get_session_data
 from session import SessionData
 from store_service.store_service import StoreService
@@ -76,6 +79,7 @@ async def run_before_and_after_tests(
     yield
     r: Redis = container.redis()
     r.delete(container.config.redis.encryption_job_in_queue())
+    r.delete(container.config.redis.encryption_job_out_queue())
     main.app.dependency_overrides = {}
 
 
@@ -98,6 +102,42 @@ async def test_encrypt(
     assert "file_id" in json_resp
 
 
+@pytest.mark.anyio
+@inject
+async def test_encrypt_on_upload(
+    client: AsyncClient,
+    file_path: Path,
+    encrypt_path: str,
+    username: str,
+    store_service: StoreService,
+    container: Container,
+    database: DatabaseService,
+    crud_service: CRUDService,
+):
+    container.config.encrypt_service.encrypt_on_upload.override(True)
+    try:
+        resp = await client.post(encrypt_path, files={"file": open(file_path, "rb")})
+    finally:
+        container.config.encrypt_service.encrypt_on_upload.reset_override()
+
+    encrypted_file = Path(f"encrypted/{username}/{resp.json()['filename']}")
+    assert await store_service.file_exists(encrypted_file)
+
+    async with database.session() as session:
+        user_id = await crud_service.get_id_by_attr(session, User, "email", username)
+        db_private_key = await crud_service.get_item_by_attr(
+            session, PrivateKey, "user_id", user_id
+        )
+    key = db_private_key.key.encode("utf8")
+    decrypted = b"".join(decrypt_iter(key, [encrypted_file.read_bytes()]))
+    assert decrypted == file_path.read_bytes()
+
+    r: Redis = container.redis()
+    raw = r.lpop(container.config.redis.encryption_job_out_queue())
+    message = decode_message(EncryptMessage, raw)
+    assert message.encryption_success
+
+
 @pytest.mark.anyio
 @inject
 async def test_all_files(client: AsyncClient, all_files_path: str, username: str):
@@ -1,3 +1,4 @@
+from cryptography.fernet import Fernet
 from pathlib import Path
 import pytest
 from core.fernet_encrypt_service import FernetEncryptService
@@ -57,3 +58,46 @@ async def test_decrypt_file(test_file: str):
         decrypted_str = f.read()
 
     assert src_str == decrypted_str
+
+
+async def test_decrypt_legacy_file(test_file: str):
+    src_file = Path(test_file)
+    encrypted_file = Path("./tmp/test_legacy_encrypted.txt")
+    decryptd_file = Path("./tmp/test_legacy_decrypted.txt")
+    store_service = FSStoreService()
+    encrypter = FernetEncryptService(store_service)
+    key = encrypter.generate_key()
+    with open(src_file, "rb") as f:
+        src_bytes = f.read()
+    with open(encrypted_file, "wb") as f:
+        f.write(Fernet(key).encrypt(src_bytes))
+
+    assert await encrypter.decrypt_file(key, encrypted_file, decryptd_file)
+    with open(decryptd_file, "rb") as f:
+        assert f.read() == src_bytes
+
+
+def test_encrypt_file_sync(test_file: str):
+    src_file = Path(test_file)
+    encrypted_file = Path("./tmp/test_encrypted_sync.txt")
+    decryptd_file = Path("./tmp/test_decrypted_sync.txt")
+    store_service = FSStoreService()
+    encrypter = FernetEncryptService(store_service)
+    key = encrypter.generate_key()
+    assert encrypter.encrypt_file_sync(key, src_file, encrypted_file)
+    assert encrypter.decrypt_file_sync(key, encrypted_file, decryptd_file)
+    with open(src_file, "rb") as f, open(decryptd_file, "rb") as g:
+        assert f.read() == g.read()
+
+
+async def test_decrypt_chunk(test_file: str):
+    src_file = Path(test_file)
+    encrypted_file = Path("./tmp/test_encrypted_chunk.txt")
+    store_service = FSStoreService()
+    encrypter = FernetEncryptService(store_service)
+    key = encrypter.generate_key()
+    assert await encrypter.encrypt_file(key, src_file, encrypted_file)
+    with open(src_file, "rb") as f:
+        assert await encrypter.decrypt_chunk(key, encrypted_file, 0) == f.read()
+    with pytest.raises(IndexError):
+        await encrypter.decrypt_chunk(key, encrypted_file, 1)
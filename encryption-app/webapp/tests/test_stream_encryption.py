@@ -0,0 +1,148 @@
+import io
+import os
+import pytest
+
+from cryptography.fernet import Fernet
+
+from core.stream_encryption import (
+    FRAME_LENGTH,
+    HEADER,
+    StreamFormatError,
+    decrypt_iter,
+    read_chunk,
+    decrypt_stream,
+    encrypt_iter,
+    encrypt_stream,
+)
+from encrypt_job.migrate import migrate_file
+
+CHUNK_SIZE = 64
+
+
+@pytest.fixture
+def key() -> bytes:
+    return Fernet.generate_key()
+
+
+def split(data: bytes, size: int):
+    return [data[idx : idx + size] for idx in range(0, len(data), size)]
+
+
+def frames(encrypted: bytes):
+    """Split an encrypted file into its header and raw frames"""
+    header, rest = encrypted[: HEADER.size], encrypted[HEADER.size :]
+    result = []
+    while rest:
+        (length,) = FRAME_LENGTH.unpack_from(rest)
+        end = FRAME_LENGTH.size + (length & 0x7FFFFFFF)
+        result.append(rest[:end])
+        rest = rest[end:]
+    return header, result
+
+
+@pytest.mark.parametrize("size", [0, 1, CHUNK_SIZE, CHUNK_SIZE * 3, CHUNK_SIZE * 3 + 5])
+def test_round_trip(key: bytes, size: int):
+    data = os.urandom(size)
+    encrypted = b"".join(encrypt_iter(key, split(data, 7), CHUNK_SIZE))
+    assert b"".join(decrypt_iter(key, split(encrypted, 13))) == data
+
+
+def test_chunks_are_framed(key: bytes):
+    data = os.urandom(CHUNK_SIZE * 3 + 5)
+    encrypted = b"".join(encrypt_iter(key, [data], CHUNK_SIZE))
+    _, raw_frames = frames(encrypted)
+    assert len(raw_frames) == 4
+
+
+def test_reordered_chunks_fail(key: bytes):
+    encrypted = b"".join(encrypt_iter(key, [os.urandom(CHUNK_SIZE * 3)], CHUNK_SIZE))
+    header, raw_frames = frames(encrypted)
+    raw_frames[0], raw_frames[1] = raw_frames[1], raw_frames[0]
+    with pytest.raises(StreamFormatError):
+        b"".join(decrypt_iter(key, [header + b"".join(raw_frames)]))
+
+
+def test_truncated_stream_fails(key: bytes):
+    encrypted = b"".join(encrypt_iter(key, [os.urandom(CHUNK_SIZE * 3)], CHUNK_SIZE))
+    header, raw_frames = frames(encrypted)
+    with pytest.raises(StreamFormatError):
+        b"".join(decrypt_iter(key, [header + b"".join(raw_frames[:-1])]))
+
+
+def test_tampered_chunk_fails(key: bytes):
+    encrypted = bytearray(b"".join(encrypt_iter(key, [b"secret" * 20], CHUNK_SIZE)))
+    encrypted[HEADER.size + FRAME_LENGTH.size] ^= 1
+    with pytest.raises(StreamFormatError):
+        b"".join(decrypt_iter(key, [bytes(encrypted)]))
+
+
+def test_wrong_key_fails(key: bytes):
+    encrypted = b"".join(encrypt_iter(key, [b"secret"], CHUNK_SIZE))
+    with pytest.raises(StreamFormatError):
+        b"".join(decrypt_iter(Fernet.generate_key(), [encrypted]))
+
+
+@pytest.mark.parametrize("size", [14, 10000])
+def test_decrypt_legacy_fernet_token(key: bytes, size: int):
+    data = os.urandom(size)
+    token = Fernet(key).encrypt(data)
+    assert b"".join(decrypt_iter(key, split(token, 10))) == data
+
+
+def test_decrypt_legacy_chunked_tokens(key: bytes):
+    fernet = Fernet(key)
+    data = os.urandom(4096 * 3 + 100)
+    tokens = b"".join(fernet.encrypt(chunk) for chunk in split(data, 4096))
+    assert b"".join(decrypt_iter(key, split(tokens, 1000))) == data
+
+
+def test_read_chunk(key: bytes):
+    data = os.urandom(CHUNK_SIZE * 3 + 5)
+    f = io.BytesIO(b"".join(encrypt_iter(key, [data], CHUNK_SIZE)))
+    for idx, chunk in enumerate(split(data, CHUNK_SIZE)):
+        assert read_chunk(key, f, idx) == chunk
+    with pytest.raises(IndexError):
+        read_chunk(key, f, 4)
+
+
+def test_read_chunk_of_exact_multiple(key: bytes):
+    data = os.urandom(CHUNK_SIZE * 2)
+    f = io.BytesIO(b"".join(encrypt_iter(key, [data], CHUNK_SIZE)))
+    assert read_chunk(key, f, 1) == data[CHUNK_SIZE:]
+    with pytest.raises(IndexError):
+        read_chunk(key, f, 2)
+
+
+def test_migrate_file(key: bytes, tmp_path):
+    data = os.urandom(4096 * 2 + 10)
+    path = tmp_path / "legacy.bin"
+    path.write_bytes(b"".join(Fernet(key).encrypt(c) for c in split(data, 4096)))
+
+    assert migrate_file(key, path)
+    assert not migrate_file(key, path)
+    assert b"".join(decrypt_iter(key, [path.read_bytes()])) == data
+    assert read_chunk(key, open(path, "rb"), 0) == data
+
+
+async def test_stream_round_trip(key: bytes):
+    data = os.urandom(CHUNK_SIZE * 5 + 3)
+
+    async def async_iter(chunks):
+        for chunk in chunks:
+            yield chunk
+
+    encrypted = b"".join(
+        [chunk async for chunk in encrypt_stream(key, async_iter(split(data, 50)), 64)]
+    )
+    decrypted = b"".join(
+        [chunk async for chunk in decrypt_stream(key, async_iter(split(encrypted, 1)))]
+    )
+    assert decrypted == data
+
+
+async def test_stream_decrypt_legacy_fernet_token(key: bytes):
+    async def async_iter():
+        yield Fernet(key).encrypt(b"legacy content")
+
+    decrypted = [chunk async for chunk in decrypt_stream(key, async_iter())]
+    assert decrypted == [b"legacy content"]
@@ -1,9 +1,11 @@
+import os
 from database_service import DatabaseService
 
 from pathlib import Path
 from encrypt_service.encrypt_service import EncryptService
 from queue_service.messages import Error, EncryptMessage
 from queue_service.queue_listener import QueueListener
+from throughput import Throughput
 
 
 class InQueueListener(QueueListener):
@@ -12,12 +14,14 @@ class InQueueListener(QueueListener):
         database_service: DatabaseService,
         encrypt_service: EncryptService,
         config: dict,
+        throughput: Throughput = None,
         **kwargs,
     ):
         self.database_service = database_service
         self.encrypt_service = encrypt_service
         self.upload_path = config["upload_path"]
         self.encrypted_path = config["encrypted_path"]
+        self.throughput = throughput
         super().__init__(**kwargs)
 
     def _process_message(self, message: EncryptMessage) -> EncryptMessage:
@@ -31,13 +35,16 @@ class InQueueListener(QueueListener):
             else:
                 func = self.encrypt_service.decrypt_file_sync
 
+            src_file = Path(f"{self.upload_path}/{filename}")
             success = func(
                 key=key.encode("utf-8"),
-                src_file=Path(f"{self.upload_path}/{filename}"),
+                src_file=src_file,
                 dest_file=Path(f"{self.encrypted_path}/{filename}"),
             )
             message.encryption_success = success
+            if success and self.throughput is not None:
+                self.throughput.record(os.path.getsize(src_file))
         except Exception as ex:
-            error = Error(message=str(ex), exception_type=type(ex))
+            error = Error(message=str(ex), exception_type=type(ex).__name__)
             message.error = error
         return message
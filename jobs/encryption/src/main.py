@@ -1,7 +1,13 @@
-from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import logging
+import os
+import signal
+import socket
+from multiprocessing import Process
 from dotenv import dotenv_values
 import sqlalchemy
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 
 from database_service import DatabaseService
 from encrypt_service.fernet_encrypt_service import FernetEncryptService
@@ -11,67 +17,132 @@ from store_service import FSStoreService
 from in_queue_listener import InQueueListener
 from out_queue_listener import OutQueueListener
 from queue_service.messages import EncryptMessage
-from queue_service import RedisQueueService
+from queue_service import AsyncRedisQueueService, RedisQueueService
+from throughput import Throughput
 
 
 IN_QUEUE_NAME = "in_queue_name"
 OUT_QUEUE_NAME = "out_queue_name"
 REDIS_URL = "redis_url"
 DB_CONN_STR = "db_conn_str"
+NUM_WORKERS = "num_workers"
+UPLOAD_CONCURRENCY = "upload_concurrency"
+# seconds a pop blocks on an empty queue, also how long a stop can take to notice
+POP_TIMEOUT = 1
 
+logger = logging.getLogger(__name__)
 
-def in_queue_listen(config: dict, in_queue_name: str, out_queue_name: str):
+
+def consumer_name(role: str) -> str:
+    """Stable across restarts, so a restarted worker recovers its own unacked
+    messages"""
+    return f"{socket.gethostname()}:{role}"
+
+
+def in_queue_listen(
+    config: dict, in_queue_name: str, out_queue_name: str, worker_idx: int = 0
+):
     redis_instance = Redis(config[REDIS_URL])
     engine = sqlalchemy.create_engine(config[DB_CONN_STR])
     database_service = DatabaseService(engine)
     fs_store_service = FSStoreService()
     fes = FernetEncryptService(fs_store_service)
     queue_service = RedisQueueService[EncryptMessage](
-        redis=redis_instance, message_cls=EncryptMessage, timeout=0
+        redis=redis_instance,
+        message_cls=EncryptMessage,
+        timeout=POP_TIMEOUT,
+        consumer=consumer_name(f"encrypt-{worker_idx}"),
     )
+    throughput = Throughput(f"encrypt worker {os.getpid()}")
 
     queue_listener = InQueueListener(
         database_service=database_service,
         encrypt_service=fes,
         config=config,
+        throughput=throughput,
         queue_service=queue_service,
         queue_name=in_queue_name,
         out_queue_name=out_queue_name,
     )
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: queue_listener.stop())
     queue_listener.listen()
+    throughput.log()
 
 
-def out_queue_listen(config: dict, in_queue_name: str):
-    redis_instance = Redis(config[REDIS_URL])
-    fs_store_service = B2StoreService(
+async def upload(config: dict, in_queue_name: str):
+    redis_instance = AsyncRedis(config[REDIS_URL])
+    b2_store_service = B2StoreService(
         "tb-project-app", config["application_key_id"], config["application_key"]
     )
-    queue_service = RedisQueueService[EncryptMessage](
-        redis=redis_instance, message_cls=EncryptMessage, timeout=0
+    queue_service = AsyncRedisQueueService[EncryptMessage](
+        redis=redis_instance,
+        message_cls=EncryptMessage,
+        timeout=POP_TIMEOUT,
+        consumer=consumer_name("upload"),
     )
+    throughput = Throughput(f"uploader {os.getpid()}")
 
     queue_listener = OutQueueListener(
-        store_service=fs_store_service,
-        config=config,
+        store_service=b2_store_service,
         queue_service=queue_service,
         queue_name=in_queue_name,
+        config=config,
+        max_concurrency=int(config.get(UPLOAD_CONCURRENCY) or 4),
+        throughput=throughput,
     )
-    queue_listener.listen()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, queue_listener.stop)
+    try:
+        await queue_listener.listen()
+    finally:
+        throughput.log()
+        logger.info(f"uploader {queue_listener.stats}")
+        await b2_store_service.close()
+        await redis_instance.close()
+
+
+def out_queue_listen(config: dict, in_queue_name: str):
+    asyncio.run(upload(config, in_queue_name))
 
 
 def main():
-    print("staring app")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(processName)s %(levelname)s %(message)s",
+    )
+    logger.info("staring app")
     config = dotenv_values(".env")
     in_queue_name = config[IN_QUEUE_NAME]
     out_queue_name = config[OUT_QUEUE_NAME]
-
-    with ProcessPoolExecutor(2) as executor:
-        in_future = executor.submit(
-            in_queue_listen, config, in_queue_name, out_queue_name
+    # encryption is CPU bound, one worker per core by default
+    num_workers = int(config.get(NUM_WORKERS) or os.cpu_count() or 1)
+
+    processes = [
+        Process(
+            target=in_queue_listen,
+            args=(config, in_queue_name, out_queue_name, idx),
+            name=f"encrypt-worker-{idx}",
         )
-        out_future = executor.submit(out_queue_listen, config, out_queue_name)
-
-        out_future.result()
+        for idx in range(num_workers)
+    ]
+    processes.append(
+        Process(target=out_queue_listen, args=(config, out_queue_name), name="uploader")
+    )
+    for process in processes:
+        process.start()
+
+    def shutdown(signum, frame):
+        logger.info(f"received signal {signum}, stopping workers")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for process in processes:
+        process.join()
 
 
 if __name__ == "__main__":
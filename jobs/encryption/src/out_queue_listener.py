@@ -1,23 +1,54 @@
+import asyncio
+import contextlib
 import os
+from logging import getLogger
+from typing import AsyncIterator
 
 from store_service.store_service import StoreService
-from queue_service.queue_listener import QueueListener
+from queue_service.async_queue_listener import AsyncQueueListener
 from queue_service.messages import EncryptMessage
+from throughput import Throughput
 
+logger = getLogger(__name__)
 
-class OutQueueListener(QueueListener):
-    def __init__(self, store_service: StoreService, config: dict, **kwargs):
+READ_SIZE = 1024 * 1024
+
+
+async def read_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        while chunk := await asyncio.to_thread(f.read, READ_SIZE):
+            yield chunk
+
+
+class OutQueueListener(AsyncQueueListener):
+    """Upload encrypted files to the store, up to max_concurrency at a time"""
+
+    def __init__(
+        self,
+        store_service: StoreService,
+        config: dict,
+        throughput: Throughput = None,
+        **kwargs,
+    ):
         self.upload_path = config["upload_path"]
-        self.store_service = store_service
         self.encrypted_path = config["encrypted_path"]
+        self.store_service = store_service
+        self.throughput = throughput
         super().__init__(**kwargs)
 
-    def _process_message(self, message: EncryptMessage) -> EncryptMessage:
-        encryption_success = message.encryption_success
-        if encryption_success:
-            # Remove file if successful
+    async def _process_message(self, message: EncryptMessage) -> None:
+        if not message.encryption_success:
+            logger.warning(f"{message.filename} was not encrypted, {message.error=}")
+            return
+
+        encrypt_file = f"{self.encrypted_path}/{message.filename}"
+        size = os.path.getsize(encrypt_file)
+        result = await self.store_service.persist_file(
+            encrypt_file, read_chunks(encrypt_file), is_large=True
+        )
+        logger.info(f"uploaded {encrypt_file} as {result}")
+        # Remove file once uploaded, a redelivered message may find it gone
+        with contextlib.suppress(FileNotFoundError):
             os.remove(f"{self.upload_path}/{message.filename}")
-            encrypt_file = f"{self.encrypted_path}/{message.filename}"
-            with open(encrypt_file, "rb") as f:
-                result = self.store_service.persist_file_sync(encrypt_file, f.read())
-                print(result)
+        if self.throughput is not None:
+            self.throughput.record(size)
@@ -0,0 +1,32 @@
+import time
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class Throughput:
+    """Count the files and bytes a worker handles and log its rate every
+    log_interval seconds"""
+
+    def __init__(self, name: str, log_interval: float = 30.0):
+        self.name = name
+        self.log_interval = log_interval
+        self.files = 0
+        self.bytes = 0
+        self.start = time.monotonic()
+        self._last_log = self.start
+
+    def record(self, nbytes: int) -> None:
+        self.files += 1
+        self.bytes += nbytes
+        now = time.monotonic()
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            self.log()
+
+    def log(self) -> None:
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        logger.info(
+            f"{self.name}: {self.files} files, {self.files / elapsed:.2f} files/s, "
+            f"{self.bytes / 1024 / 1024 / elapsed:.2f} MB/s"
+        )